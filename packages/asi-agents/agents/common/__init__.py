@@ -0,0 +1,4 @@
+"""
+Shared infrastructure for the MCG.FUN agents
+Upstream clients and runtime utilities used by all four agents
+"""
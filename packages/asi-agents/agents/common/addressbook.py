@@ -0,0 +1,40 @@
+"""
+Local Address Book
+Static agent address -> endpoint routing for co-located deployments
+"""
+
+import os
+from typing import Dict, List, Optional, Tuple
+
+from uagents.resolver import GlobalResolver, Resolver
+
+
+def parse_endpoints(value: str) -> Dict[str, str]:
+    """Parse "agent1q...=http://host:port/submit,..." into a mapping"""
+    rules = {}
+    for entry in value.split(","):
+        address, sep, endpoint = entry.strip().partition("=")
+        if sep and address and endpoint:
+            rules[address.strip()] = endpoint.strip()
+    return rules
+
+
+class LocalFirstResolver(Resolver):
+    """Resolve known addresses from static rules, everything else via the Almanac"""
+    
+    def __init__(self, rules: Dict[str, str]):
+        self.rules = rules
+        self._fallback = GlobalResolver()
+    
+    async def resolve(self, destination: str) -> Tuple[Optional[str], List[str]]:
+        address = destination.split("/")[-1]
+        endpoint = self.rules.get(address)
+        if endpoint:
+            return address, [endpoint]
+        return await self._fallback.resolve(destination)
+
+
+def resolver_from_env() -> Optional[Resolver]:
+    """Resolver honouring AGENT_ENDPOINTS, or None for the uagents default"""
+    rules = parse_endpoints(os.getenv("AGENT_ENDPOINTS", ""))
+    return LocalFirstResolver(rules) if rules else None
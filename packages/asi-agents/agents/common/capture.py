@@ -0,0 +1,239 @@
+"""
+Upstream Capture
+Records OpenSea, GraphQL and RPC traffic to a compact log and replays it offline
+"""
+
+import os
+import re
+import gzip
+import json
+import time
+import atexit
+import hashlib
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from common import metrics
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_CAPTURE = os.getenv("UPSTREAM_CAPTURE", "")  # "", "record" or "replay"
+UPSTREAM_CAPTURE_PATH = os.getenv("UPSTREAM_CAPTURE_PATH", "captures/upstream.jsonl.gz")
+UPSTREAM_REPLAY_SPEED = float(os.getenv("UPSTREAM_REPLAY_SPEED", "1"))  # 2 halves recorded latencies, 0 skips them
+
+FORMAT_VERSION = 1
+FLUSH_INTERVAL = 1.0
+
+OPERATION_NAME = re.compile(r"\b(?:query|mutation)\s+(\w+)")
+
+replayed = metrics.registry.counter(
+    "mcg_capture_replayed_total", "Upstream calls answered from a capture, by how the request matched"
+)
+
+
+class CaptureMiss(Exception):
+    """Raised in replay mode for a call the capture has nothing for"""
+
+
+class ReplayedError(Exception):
+    """An upstream failure, as recorded"""
+
+
+class CapturedResponse:
+    """Just enough of requests.Response to stand in for a recorded HTTP reply"""
+
+    def __init__(self, status_code: int, headers: Dict[str, str], text: str):
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests  # Deferred to keep agent imports cheap
+
+            raise requests.HTTPError(f"{self.status_code} (replayed)", response=self)
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    return str(value)
+
+
+def request_key(upstream: str, request: Any) -> str:
+    """Stable digest of a request, identical when recording and replaying"""
+    canonical = json.dumps([upstream, request], sort_keys=True, separators=(",", ":"), default=_jsonable)
+    return hashlib.blake2b(canonical.encode(), digest_size=12).hexdigest()
+
+
+def graphql_operation(query: str) -> str:
+    match = OPERATION_NAME.search(query)
+    return match.group(1) if match else "anonymous"
+
+
+class Capture:
+    """
+    Opt-in recorder and replayer for outbound calls.
+
+    In record mode every call made through call() or http() is performed
+    as usual and appended to a gzipped JSON-lines log: upstream, operation,
+    request digest, offset into the session, latency, and the response or
+    error. Records are flushed at least every FLUSH_INTERVAL, and a log cut
+    short by a crash stays readable up to the last flush.
+
+    In replay mode nothing goes out. A call is answered with the next
+    recorded response for the same request, cycling when they run out, so
+    a run sees responses in recorded order. Requests that never occurred
+    verbatim (e.g. a query with the current time as a variable) fall back
+    to the next response recorded for the same operation. The recorded
+    latency is slept in the calling thread, divided by
+    UPSTREAM_REPLAY_SPEED. Calls with neither match raise CaptureMiss.
+    """
+
+    def __init__(self, mode: str = UPSTREAM_CAPTURE, path: str = UPSTREAM_CAPTURE_PATH,
+                 speed: float = UPSTREAM_REPLAY_SPEED):
+        if mode not in ("", "record", "replay"):
+            raise ValueError(f"UPSTREAM_CAPTURE must be 'record' or 'replay', not {mode!r}")
+        self.mode = mode
+        self.path = path
+        self.speed = speed
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._file = None
+        self._flushed_at = 0.0
+        # Replay indexes: key -> records, operation -> records, and a cursor per list
+        self._by_key: Optional[Dict[str, List[Dict]]] = None
+        self._by_operation: Dict[Tuple[str, str], List[Dict]] = {}
+        self._cursors: Dict[Any, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.mode)
+
+    def call(self, upstream: str, operation: str, request: Any, send: Callable[[], Any]) -> Any:
+        """Run `send()` (blocking) or answer it from the capture; the result must be JSON-serialisable"""
+        if not self.mode:
+            return send()
+
+        key = request_key(upstream, request)
+        if self.mode == "replay":
+            record = self._replay(upstream, operation, key)
+            if "e" in record:
+                raise ReplayedError(record["e"])
+            return record["r"]
+
+        start = time.perf_counter()
+        try:
+            result = send()
+        except Exception as e:
+            self._record(upstream, operation, key, request, start, {"e": f"{type(e).__name__}: {e}"})
+            raise
+        self._record(upstream, operation, key, request, start, {"r": result})
+        return result
+
+    def http(self, upstream: str, operation: str, request: Any, send: Callable[[], Any]):
+        """Like call(), for `send()` returning a requests.Response"""
+        if not self.mode:
+            return send()
+
+        if self.mode == "replay":
+            reply = self.call(upstream, operation, request, send)
+            return CapturedResponse(reply["status"], reply["headers"], reply["text"])
+
+        holder = []
+
+        def send_and_keep():
+            response = send()
+            holder.append(response)
+            retry_after = response.headers.get("Retry-After")
+            return {
+                "status": response.status_code,
+                "headers": {"Retry-After": retry_after} if retry_after else {},
+                "text": response.text,
+            }
+
+        self.call(upstream, operation, request, send_and_keep)
+        return holder[0]
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _record(self, upstream: str, operation: str, key: str, request: Any, start: float, outcome: Dict):
+        elapsed = time.perf_counter() - start
+        entry = {
+            "u": upstream,
+            "o": operation,
+            "k": key,
+            "t": round(time.time() - self.started - elapsed, 4),
+            "l": round(elapsed, 5),
+            "q": request,
+            **outcome,
+        }
+        line = json.dumps(entry, separators=(",", ":"), default=_jsonable) + "\n"
+
+        with self._lock:
+            if self._file is None:
+                self._open_writer()
+            self._file.write(line)
+            now = time.monotonic()
+            if now - self._flushed_at >= FLUSH_INTERVAL:
+                self._file.flush()
+                self._flushed_at = now
+
+    def _open_writer(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = gzip.open(self.path, "at", encoding="utf-8")
+        self._file.write(json.dumps({"capture": FORMAT_VERSION, "started": self.started}) + "\n")
+        atexit.register(self.close)
+        logger.info(f"Recording upstream traffic to {self.path}")
+
+    def _load(self):
+        by_key: Dict[str, List[Dict]] = {}
+        count = 0
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if "capture" in entry:
+                        continue
+                    by_key.setdefault(entry["k"], []).append(entry)
+                    self._by_operation.setdefault((entry["u"], entry["o"]), []).append(entry)
+                    count += 1
+        except (EOFError, json.JSONDecodeError):
+            logger.warning(f"Capture {self.path} ends in a partial record; replaying what precedes it")
+        self._by_key = by_key
+        logger.info(f"Replaying {count} upstream calls from {self.path} at {self.speed:g}x")
+
+    def _replay(self, upstream: str, operation: str, key: str) -> Dict:
+        with self._lock:
+            if self._by_key is None:
+                self._load()
+
+            records, cursor, match = self._by_key.get(key), key, "exact"
+            if records is None:
+                records, cursor, match = self._by_operation.get((upstream, operation)), (upstream, operation), "operation"
+            if records is None:
+                replayed.inc(upstream=upstream, match="miss")
+                raise CaptureMiss(f"No {upstream} {operation} call in {self.path}")
+
+            position = self._cursors.get(cursor, 0)
+            self._cursors[cursor] = position + 1
+            record = records[position % len(records)]
+
+        replayed.inc(upstream=upstream, match=match)
+        if self.speed > 0:
+            time.sleep(record["l"] / self.speed)
+        return record
+
+
+# Process-wide capture, configured from the environment
+session = Capture()
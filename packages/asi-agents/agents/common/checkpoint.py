@@ -0,0 +1,185 @@
+"""
+Agent Checkpoints
+Periodic snapshots of caches, cursors and scheduler state for warm restarts
+"""
+
+import os
+import json
+import asyncio
+import time
+import zlib
+import struct
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+from common import runtime
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_DIR = runtime.data_path(os.getenv("CHECKPOINT_DIR", "checkpoints"))
+CHECKPOINT_INTERVAL = float(os.getenv("CHECKPOINT_INTERVAL", "60"))
+CHECKPOINT_MAX_AGE = float(os.getenv("CHECKPOINT_MAX_AGE", "21600"))
+
+MAGIC = b"MCGK"
+FORMAT_VERSION = 1
+
+# Header: magic, format version, CRC32 of the body, created-at (unix time), body length
+HEADER = struct.Struct("<4sHIdI")
+
+
+@dataclass
+class Section:
+    """One named piece of state and how to capture and restore it"""
+    dump: Callable[[], Any]
+    load: Callable[[Any], None]
+    version: int = 1
+
+
+class Checkpointer:
+    """
+    Snapshots registered state sections to `<dir>/<agent>.ckpt`.
+
+    Each section dumps to JSON-compatible data; the whole snapshot is
+    zlib-compressed behind a small header carrying a checksum and creation
+    time, and written atomically. On restore the file is rejected if it is
+    corrupt, from another format version or older than CHECKPOINT_MAX_AGE;
+    a section is skipped if its version changed or its loader fails, so one
+    bad section never blocks the rest.
+    """
+
+    def __init__(self, agent: str, directory: str = CHECKPOINT_DIR, max_age: float = CHECKPOINT_MAX_AGE):
+        self.agent = agent
+        self.directory = directory
+        self.max_age = max_age
+        self.sections: Dict[str, Section] = {}
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f"{self.agent}.ckpt")
+
+    def register(self, name: str, dump: Callable[[], Any], load: Callable[[Any], None], version: int = 1):
+        """Add a state section; bump `version` whenever its data shape changes"""
+        self.sections[name] = Section(dump=dump, load=load, version=version)
+
+    def attach(self, agent):
+        """Restore on startup, then save every CHECKPOINT_INTERVAL and on shutdown"""
+        if not self.directory:
+            return
+
+        async def restore_checkpoint(ctx):
+            restored = self.restore()
+            if restored:
+                ctx.logger.info(f"♻️ Warm start: restored {restored}/{len(self.sections)} checkpoint section(s)")
+
+        async def save_checkpoint(ctx):
+            # Capture on the event loop so state is consistent, write off it
+            blob = self._collect()
+            await asyncio.to_thread(self._write, blob)
+
+        async def final_checkpoint(ctx):
+            self.save()
+
+        agent.on_event("startup")(restore_checkpoint)
+        agent.on_interval(period=CHECKPOINT_INTERVAL)(save_checkpoint)
+        agent.on_event("shutdown")(final_checkpoint)
+
+    def save(self) -> Optional[int]:
+        """Write a snapshot; returns its size in bytes, or None if disabled or failed"""
+        if not self.directory:
+            return None
+        return self._write(self._collect())
+
+    def _collect(self) -> bytes:
+        snapshot = {"agent": self.agent, "sections": {}}
+        for name, section in self.sections.items():
+            try:
+                snapshot["sections"][name] = {"v": section.version, "data": section.dump()}
+            except Exception as e:
+                logger.warning(f"⚠️ Checkpoint section {name} not saved: {e}")
+
+        body = zlib.compress(json.dumps(snapshot, separators=(",", ":")).encode(), 6)
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, zlib.crc32(body), time.time(), len(body))
+        return header + body
+
+    def _write(self, blob: bytes) -> Optional[int]:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(blob)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"❌ Checkpoint write failed: {e}")
+            return None
+
+        return len(blob)
+
+    def restore(self) -> int:
+        """Load the last snapshot if it is valid; returns the number of sections restored"""
+        if not self.directory:
+            return 0
+
+        snapshot = self._read()
+        if snapshot is None:
+            return 0
+
+        restored = 0
+        for name, entry in snapshot.get("sections", {}).items():
+            section = self.sections.get(name)
+            if section is None:
+                continue
+            if entry.get("v") != section.version:
+                logger.info(f"Checkpoint section {name} has version {entry.get('v')}, expected {section.version} - skipped")
+                continue
+            try:
+                section.load(entry["data"])
+                restored += 1
+            except Exception as e:
+                logger.warning(f"⚠️ Checkpoint section {name} not restored: {e}")
+
+        return restored
+
+    def _read(self) -> Optional[Dict]:
+        try:
+            with open(self.path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"⚠️ Checkpoint unreadable: {e}")
+            return None
+
+        if len(raw) < HEADER.size:
+            logger.warning("⚠️ Checkpoint truncated - starting cold")
+            return None
+
+        magic, version, crc, created_at, length = HEADER.unpack_from(raw)
+        body = raw[HEADER.size:]
+
+        if magic != MAGIC or version != FORMAT_VERSION:
+            logger.warning("⚠️ Checkpoint has an unknown format - starting cold")
+            return None
+        if len(body) != length or zlib.crc32(body) != crc:
+            logger.warning("⚠️ Checkpoint failed its checksum - starting cold")
+            return None
+
+        age = time.time() - created_at
+        if age > self.max_age:
+            logger.info(f"Checkpoint is {age:.0f}s old - starting cold")
+            return None
+
+        try:
+            snapshot = json.loads(zlib.decompress(body))
+        except (zlib.error, ValueError) as e:
+            logger.warning(f"⚠️ Checkpoint undecodable: {e}")
+            return None
+
+        if snapshot.get("agent") != self.agent:
+            logger.warning(f"⚠️ Checkpoint belongs to {snapshot.get('agent')} - ignored")
+            return None
+
+        logger.info(f"♻️ Restoring checkpoint from {age:.0f}s ago")
+        return snapshot
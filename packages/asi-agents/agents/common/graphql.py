@@ -0,0 +1,49 @@
+"""
+GraphQL Indexer Client
+Shared access to the Hasura-style GraphQL API at GRAPHQL_ENDPOINT
+"""
+
+import os
+import json
+import asyncio
+from typing import Optional, Dict
+
+from common import capture, metrics
+from common.resilience import CircuitBreaker, Fetched, StaleCache
+
+GRAPHQL_ENDPOINT = os.getenv("GRAPHQL_ENDPOINT", "http://localhost:8080/v1/graphql")
+
+breaker = CircuitBreaker("graphql")
+cache = StaleCache(
+    "graphql",
+    fresh_ttl=float(os.getenv("GRAPHQL_FRESH_TTL", "5")),
+    max_stale=float(os.getenv("GRAPHQL_MAX_STALE", "300"))
+)
+
+
+async def execute(query: str, variables: Optional[Dict] = None) -> Dict:
+    """Run a query against the indexer, raising on transport or GraphQL errors"""
+    import requests  # Deferred to keep agent imports cheap
+    
+    payload = {"query": query}
+    if variables is not None:
+        payload["variables"] = variables
+    
+    def post() -> Dict:
+        response = requests.post(GRAPHQL_ENDPOINT, json=payload, timeout=breaker.timeout)
+        response.raise_for_status()
+        return response.json()
+    
+    operation = capture.graphql_operation(query)
+    with metrics.upstream_timer("graphql", "query"):
+        data = await breaker.call(lambda: asyncio.to_thread(capture.session.call, "graphql", operation, payload, post))
+    if data.get('errors'):
+        raise RuntimeError(f"GraphQL errors: {data['errors']}")
+    
+    return data.get('data', {})
+
+
+async def query(query: str, variables: Optional[Dict] = None, allow_stale: bool = True) -> Fetched[Dict]:
+    """Run a query through the stale-while-revalidate cache"""
+    key = (query, json.dumps(variables, sort_keys=True))
+    return await cache.get(key, lambda: execute(query, variables), allow_stale)
@@ -0,0 +1,240 @@
+"""
+Resolution Job Queue
+Durable per-market resolution state in SQLite, so restarts resume in-flight work
+"""
+
+import os
+import time
+import random
+import sqlite3
+import logging
+from dataclasses import dataclass
+from typing import List, Optional
+
+from common import runtime
+
+logger = logging.getLogger(__name__)
+
+JOB_DB_PATH = runtime.data_path(os.getenv("RESOLVER_JOB_DB", "resolver-jobs.db"))
+RETRY_BASE = float(os.getenv("RESOLVER_RETRY_BASE", "30"))
+RETRY_MAX = float(os.getenv("RESOLVER_RETRY_MAX", "3600"))
+MAX_ATTEMPTS = int(os.getenv("RESOLVER_MAX_ATTEMPTS", "8"))
+
+# Job states, in the order a successful resolution passes through them
+DUE = "due"              # Resolution time passed; nothing checked yet
+PRICED = "priced"        # Pre-flight checks passed and the final price is fixed
+SUBMITTED = "submitted"  # Transaction signed, stored and broadcast
+CONFIRMED = "confirmed"  # Market resolved on-chain (terminal)
+FAILED = "failed"        # Gave up (terminal)
+
+STATES = (DUE, PRICED, SUBMITTED, CONFIRMED, FAILED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    market TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    collection_slug TEXT,
+    target_price TEXT,
+    final_price TEXT,
+    tx_hash TEXT,
+    raw_tx TEXT,
+    nonce INTEGER,
+    priced_at REAL,
+    gas INTEGER,
+    max_fee INTEGER,
+    priority_fee INTEGER,
+    tx_hashes TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    submitted_at REAL,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_state ON jobs (state, next_attempt);
+"""
+
+# Columns added after the first release, added to older databases on open
+ADDED_COLUMNS = {
+    "priced_at": "REAL",
+    "gas": "INTEGER",
+    "max_fee": "INTEGER",
+    "priority_fee": "INTEGER",
+    "tx_hashes": "TEXT",
+}
+
+
+@dataclass
+class ResolutionJob:
+    """One market's progress towards on-chain resolution"""
+    market: str  # Lower-case
+    state: str
+    collection_slug: Optional[str] = None
+    target_price: Optional[int] = None  # Wei
+    final_price: Optional[int] = None   # Wei
+    priced_at: Optional[float] = None   # When final_price was observed
+    tx_hash: Optional[str] = None       # Latest transaction sent
+    raw_tx: Optional[str] = None        # Latest signed transaction, re-broadcast as-is
+    nonce: Optional[int] = None
+    gas: Optional[int] = None           # Gas limit and EIP-1559 fees of the latest transaction
+    max_fee: Optional[int] = None
+    priority_fee: Optional[int] = None
+    tx_hashes: Optional[str] = None     # Comma-separated hashes of every transaction sent with `nonce`
+    attempts: int = 0
+    next_attempt: float = 0.0
+    submitted_at: Optional[float] = None
+    error: Optional[str] = None
+    updated_at: float = 0.0
+
+    @property
+    def terminal(self) -> bool:
+        return self.state in (CONFIRMED, FAILED)
+
+    @property
+    def sent_hashes(self) -> List[str]:
+        """Every transaction sent for this job's nonce, oldest first; any one of them may be mined"""
+        if self.tx_hashes:
+            return self.tx_hashes.split(",")
+        return [self.tx_hash] if self.tx_hash else []
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "ResolutionJob":
+        job = cls(**dict(row))
+        # Wei amounts are stored as text; they overflow SQLite integers
+        job.target_price = int(job.target_price) if job.target_price is not None else None
+        job.final_price = int(job.final_price) if job.final_price is not None else None
+        return job
+
+
+class JobQueue:
+    """
+    Resolution jobs keyed by market address.
+
+    Every state change is committed before the action it enables, e.g. a
+    signed transaction and its nonce are stored before it is broadcast. A
+    restarted resolver therefore picks up exactly where it stopped: it
+    checks receipts for submitted jobs and re-broadcasts the stored
+    transaction instead of pricing and signing again. Failed attempts are
+    retried with exponential backoff and jitter until MAX_ATTEMPTS.
+
+    The database runs in WAL mode with synchronous=NORMAL: commits are
+    cheap enough to make on the event loop, and a crash loses at most the
+    last few commits, never consistency.
+    """
+
+    def __init__(self, path: str = JOB_DB_PATH):
+        self.path = path or ":memory:"
+        self._db: Optional[sqlite3.Connection] = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, isolation_level=None)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(SCHEMA)
+            existing = {row["name"] for row in self._db.execute("PRAGMA table_info(jobs)")}
+            for name, kind in ADDED_COLUMNS.items():
+                if name not in existing:
+                    self._db.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+        return self._db
+
+    def get(self, market: str) -> Optional[ResolutionJob]:
+        row = self.db.execute("SELECT * FROM jobs WHERE market = ?", (market.lower(),)).fetchone()
+        return ResolutionJob.from_row(row) if row else None
+
+    def enqueue(self, market: str, collection_slug: Optional[str] = None, target_price: Optional[int] = None) -> ResolutionJob:
+        """Add a due job unless the market already has one; returns the current job"""
+        now = time.time()
+        self.db.execute(
+            "INSERT OR IGNORE INTO jobs (market, state, collection_slug, target_price, next_attempt, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (market.lower(), DUE, collection_slug,
+             str(target_price) if target_price is not None else None, now, now)
+        )
+        return self.get(market)
+
+    def ready(self, now: float, limit: int = 10) -> List[ResolutionJob]:
+        """Non-terminal jobs whose next attempt is due, oldest schedule first"""
+        rows = self.db.execute(
+            "SELECT * FROM jobs WHERE state IN (?, ?, ?) AND next_attempt <= ? ORDER BY next_attempt LIMIT ?",
+            (DUE, PRICED, SUBMITTED, now, limit)
+        ).fetchall()
+        return [ResolutionJob.from_row(r) for r in rows]
+
+    def count(self, state: str) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM jobs WHERE state = ?", (state,)).fetchone()[0]
+
+    def priced(self, job: ResolutionJob, collection_slug: str, target_price: int, final_price: int) -> ResolutionJob:
+        return self._update(
+            job, state=PRICED, collection_slug=collection_slug,
+            target_price=target_price, final_price=final_price, priced_at=time.time(), error=None
+        )
+
+    def submitted(self, job: ResolutionJob, tx_hash: str, raw_tx: str, nonce: int,
+                  gas: int, max_fee: int, priority_fee: int) -> ResolutionJob:
+        return self._update(
+            job, state=SUBMITTED, tx_hash=tx_hash, raw_tx=raw_tx, nonce=nonce,
+            gas=gas, max_fee=max_fee, priority_fee=priority_fee, tx_hashes=tx_hash,
+            submitted_at=time.time(), error=None
+        )
+
+    def replaced(self, job: ResolutionJob, tx_hash: str, raw_tx: str, max_fee: int, priority_fee: int) -> ResolutionJob:
+        """Record a re-signed transaction for the same nonce, keeping the hashes sent before it"""
+        return self._update(
+            job, tx_hash=tx_hash, raw_tx=raw_tx, max_fee=max_fee, priority_fee=priority_fee,
+            tx_hashes=",".join(job.sent_hashes + [tx_hash]), submitted_at=time.time(), error=None
+        )
+
+    def confirmed(self, job: ResolutionJob, note: Optional[str] = None, tx_hash: Optional[str] = None) -> ResolutionJob:
+        changes = {"tx_hash": tx_hash} if tx_hash else {}
+        return self._update(job, state=CONFIRMED, raw_tx=None, error=note, **changes)
+
+    def failed(self, job: ResolutionJob, error: str) -> ResolutionJob:
+        """Give up on a job for a reason retrying cannot fix"""
+        logger.warning(f"Resolution job {job.market} failed permanently: {error}")
+        return self._update(job, state=FAILED, raw_tx=None, error=error)
+
+    def reopen(self, job: ResolutionJob) -> ResolutionJob:
+        """Start a failed job over with a fresh set of attempts"""
+        return self._update(job, state=DUE, attempts=0, next_attempt=time.time(), error=None)
+
+    def defer(self, job: ResolutionJob, delay: float, **changes) -> ResolutionJob:
+        """Check the job again after `delay` seconds without counting an attempt"""
+        return self._update(job, next_attempt=time.time() + delay, **changes)
+
+    def retry(self, job: ResolutionJob, error: str, state: Optional[str] = None) -> ResolutionJob:
+        """Record a failed attempt and schedule the next one, moving to `state` if given"""
+        attempts = job.attempts + 1
+        if attempts >= MAX_ATTEMPTS:
+            return self._update(job, attempts=attempts, state=FAILED, raw_tx=None,
+                                error=f"{error} (after {attempts} attempts)")
+
+        delay = min(RETRY_MAX, RETRY_BASE * 2 ** (attempts - 1))
+        delay *= random.uniform(0.8, 1.2)
+        return self._update(
+            job, attempts=attempts, state=state or job.state, error=error,
+            next_attempt=time.time() + delay
+        )
+
+    def _update(self, job: ResolutionJob, **changes) -> ResolutionJob:
+        changes["updated_at"] = time.time()
+        for name, value in changes.items():
+            setattr(job, name, value)
+
+        stored = {k: (str(v) if k in ("target_price", "final_price") and v is not None else v)
+                  for k, v in changes.items()}
+        assignments = ", ".join(f"{name} = ?" for name in stored)
+        self.db.execute(f"UPDATE jobs SET {assignments} WHERE market = ?", (*stored.values(), job.market))
+        return job
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+# Process-wide queue for the resolver
+queue = JobQueue()
@@ -0,0 +1,175 @@
+"""
+Agent Logging
+Queue-backed logging: callers only enqueue records, a background thread formats
+and writes them to the console and a size-rotated JSON log file
+"""
+
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional, Tuple
+
+from common import metrics
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FILE = os.getenv("LOG_FILE", "agents.log")  # Empty disables the file
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUPS = int(os.getenv("LOG_BACKUPS", "5"))
+LOG_CONSOLE_FORMAT = os.getenv("LOG_CONSOLE_FORMAT", "text")  # text or json
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", "20"))  # Lines per call site per window (0 disables)
+LOG_SAMPLE_WINDOW = float(os.getenv("LOG_SAMPLE_WINDOW", "10"))
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+dropped_records = metrics.registry.counter(
+    "mcg_log_records_dropped_total", "Log records not written, by reason"
+)
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "site": f"{record.module}:{record.lineno}",
+        }
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """The usual text format, noting lines dropped by sampling"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{line} (+{suppressed} similar suppressed)" if suppressed else line
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Rate limit for repetitive lines, per call site.
+
+    Each (file, line) may emit `burst` INFO/DEBUG records per `window`
+    seconds; the rest are dropped and counted, and the first record let
+    through in the next window carries the count. Warnings and errors are
+    never sampled.
+    """
+
+    def __init__(self, burst: int = LOG_SAMPLE_BURST, window: float = LOG_SAMPLE_WINDOW):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        # site -> [window start, records emitted, records suppressed]
+        self._sites: Dict[Tuple[str, int], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0 or record.levelno >= logging.WARNING:
+            return True
+
+        now = record.created
+        with self._lock:
+            site = self._sites.get((record.pathname, record.lineno))
+            if site is None:
+                self._sites[(record.pathname, record.lineno)] = [now, 1, 0]
+                return True
+
+            if now - site[0] >= self.window:
+                record.suppressed = site[2]
+                site[0], site[1], site[2] = now, 1, 0
+                return True
+
+            if site[1] < self.burst:
+                site[1] += 1
+                return True
+
+            site[2] += 1
+
+        dropped_records.inc(reason="sampled")
+        return False
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Enqueue without blocking; a full queue drops the record instead of stalling the caller"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message once here, so args never cross threads, but skip
+        # the formatter: the writer thread formats for each destination
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records.inc(reason="queue_full")
+
+
+def configure(level: str = LOG_LEVEL, log_file: str = LOG_FILE):
+    """
+    Route the root logger through a background writer thread.
+
+    Replaces any handlers already on the root logger (e.g. from an agent
+    module's basicConfig). Safe to call more than once; later calls are
+    ignored. Records still queued at exit are flushed.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(JsonFormatter() if LOG_CONSOLE_FORMAT == "json" else TextFormatter(TEXT_FORMAT))
+    destinations = [console]
+
+    if log_file:
+        directory = os.path.dirname(log_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file_handler = RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8")
+        file_handler.setFormatter(JsonFormatter())
+        destinations.append(file_handler)
+
+    records: "queue.Queue[logging.LogRecord]" = queue.Queue(LOG_QUEUE_SIZE)
+    handler = DroppingQueueHandler(records)
+    handler.addFilter(SamplingFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    _listener = QueueListener(records, *destinations, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown)
+
+
+def shutdown():
+    """Stop the writer thread after it has written everything queued"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,217 @@
+"""
+On-chain Market Discovery
+Builds a local market registry from MarketFactory and Market logs, independent of the indexer
+"""
+
+import os
+import time
+import asyncio
+import logging
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+from common import metrics
+
+logger = logging.getLogger(__name__)
+
+MARKET_FACTORY_ADDRESS = os.getenv("MARKET_FACTORY_ADDRESS", "0x25A57013bc5139E3FCb06189592652Cd146aecA5")
+SCAN_CONFIRMATIONS = int(os.getenv("MARKET_SCAN_CONFIRMATIONS", "3"))
+SCAN_MIN_CHUNK = int(os.getenv("MARKET_SCAN_MIN_CHUNK", "10"))
+SCAN_MAX_CHUNK = int(os.getenv("MARKET_SCAN_MAX_CHUNK", "5000"))
+SCAN_BOOTSTRAP_CONCURRENCY = int(os.getenv("MARKET_SCAN_BOOTSTRAP_CONCURRENCY", "8"))
+
+MARKET_CREATED = "MarketCreated(address,address,string,string,uint256,uint256)"
+MARKET_RESOLVED = "MarketResolved(bool,uint256)"
+
+FACTORY_ABI = [
+    {
+        "inputs": [],
+        "name": "getAllMarkets",
+        "outputs": [{"name": "", "type": "address[]"}],
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
+
+MARKET_INFO_ABI = [
+    {
+        "inputs": [],
+        "name": "getMarketInfo",
+        "outputs": [
+            {"name": "_question", "type": "string"},
+            {"name": "_collectionSlug", "type": "string"},
+            {"name": "_targetPrice", "type": "uint256"},
+            {"name": "_resolutionTimestamp", "type": "uint256"},
+            {"name": "_status", "type": "uint8"},
+            {"name": "_winningOutcome", "type": "bool"},
+            {"name": "_yesSharesTotal", "type": "uint256"},
+            {"name": "_noSharesTotal", "type": "uint256"},
+            {"name": "_yesPrice", "type": "uint256"},
+            {"name": "_noPrice", "type": "uint256"}
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
+
+scanned_blocks = metrics.registry.counter(
+    "mcg_market_scan_blocks_total", "Blocks covered by the on-chain market log scanner"
+)
+
+
+@dataclass
+class MarketRecord:
+    """Immutable market configuration plus its resolution status"""
+    address: str  # Lower-case
+    collection_slug: str
+    target_price: int  # Wei
+    resolution_timestamp: int
+    resolved: bool = False
+
+
+class MarketScanner:
+    """
+    Local market registry kept current from chain logs.
+
+    The first sync bootstraps from MarketFactory.getAllMarkets and each
+    market's getMarketInfo, and sets the cursor to the head at that time.
+    Later syncs read MarketCreated and MarketResolved logs from the cursor
+    to the confirmed head with eth_getLogs. The block range per request
+    doubles after each success and halves when the node rejects or fails a
+    request, so ranges stay as wide as the provider allows. The registry
+    and cursor are exposed via snapshot()/restore() for checkpointing.
+    """
+
+    def __init__(self, factory_address: str = MARKET_FACTORY_ADDRESS):
+        self.factory_address = factory_address
+        self.markets: Dict[str, MarketRecord] = {}
+        self.cursor: Optional[int] = None  # Last block fully scanned
+        self.chunk = SCAN_MAX_CHUNK
+        self.synced_at = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    def get(self, market_address: str) -> Optional[MarketRecord]:
+        return self.markets.get(market_address.lower())
+
+    def due(self, now: float) -> List[MarketRecord]:
+        """Open markets whose resolution time has passed, earliest first"""
+        due = [m for m in self.markets.values() if not m.resolved and m.resolution_timestamp <= now]
+        return sorted(due, key=lambda m: m.resolution_timestamp)
+
+    def open_markets(self) -> List[MarketRecord]:
+        return [m for m in self.markets.values() if not m.resolved]
+
+    async def sync(self) -> int:
+        """Bring the registry up to the confirmed head; returns the number of new markets"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            from common import rpc
+
+            w3 = rpc.get_web3()
+            head = await asyncio.to_thread(lambda: w3.eth.block_number) - SCAN_CONFIRMATIONS
+
+            before = len(self.markets)
+            if self.cursor is None:
+                await self._bootstrap(head)
+            elif head > self.cursor:
+                await self._scan(self.cursor + 1, head)
+
+            self.synced_at = time.time()
+            return len(self.markets) - before
+
+    def snapshot(self) -> Dict:
+        return {
+            "factory": self.factory_address.lower(),
+            "cursor": self.cursor,
+            "markets": [asdict(m) for m in self.markets.values()],
+        }
+
+    def restore(self, state: Dict):
+        if state["factory"] != self.factory_address.lower():
+            raise ValueError("checkpoint is for a different MarketFactory")
+        if self.cursor is not None:
+            return  # Already synced since startup
+
+        self.markets = {m["address"]: MarketRecord(**m) for m in state["markets"]}
+        self.cursor = state["cursor"]
+
+    async def _bootstrap(self, head: int):
+        from common import rpc
+
+        w3 = rpc.get_web3()
+        factory = w3.eth.contract(address=w3.to_checksum_address(self.factory_address), abi=FACTORY_ABI)
+        addresses = await asyncio.to_thread(factory.functions.getAllMarkets().call, block_identifier=head)
+
+        semaphore = asyncio.Semaphore(SCAN_BOOTSTRAP_CONCURRENCY)
+
+        async def load(address: str):
+            async with semaphore:
+                market = w3.eth.contract(address=address, abi=MARKET_INFO_ABI)
+                info = await asyncio.to_thread(market.functions.getMarketInfo().call, block_identifier=head)
+            _, slug, target_price, resolution_timestamp, status = info[:5]
+            self.markets[address.lower()] = MarketRecord(
+                address=address.lower(),
+                collection_slug=slug,
+                target_price=target_price,
+                resolution_timestamp=resolution_timestamp,
+                resolved=status != 0
+            )
+
+        await asyncio.gather(*[load(a) for a in addresses if a.lower() not in self.markets])
+        self.cursor = head
+        logger.info(f"🧭 Market registry bootstrapped: {len(self.markets)} markets at block {head}")
+
+    async def _scan(self, start: int, end: int):
+        from web3 import Web3
+        from eth_abi import decode
+        from common import rpc
+
+        w3 = rpc.get_web3()
+        created_topic = Web3.keccak(text=MARKET_CREATED).hex()
+        resolved_topic = Web3.keccak(text=MARKET_RESOLVED).hex()
+        factory = self.factory_address.lower()
+
+        while start <= end:
+            stop = min(end, start + self.chunk - 1)
+            try:
+                # Topic-only filter: MarketResolved comes from every market contract
+                logs = await asyncio.to_thread(w3.eth.get_logs, {
+                    "fromBlock": start,
+                    "toBlock": stop,
+                    "topics": [[created_topic, resolved_topic]],
+                })
+            except Exception as e:
+                if self.chunk <= SCAN_MIN_CHUNK:
+                    raise
+                self.chunk = max(SCAN_MIN_CHUNK, self.chunk // 2)
+                logger.info(f"getLogs {start}-{stop} failed ({e}); chunk now {self.chunk}")
+                continue
+
+            for log in logs:
+                topic = log["topics"][0].hex()
+                emitter = log["address"].lower()
+
+                if topic.removeprefix("0x") == created_topic.removeprefix("0x") and emitter == factory:
+                    address = "0x" + log["topics"][1].hex().removeprefix("0x")[-40:]
+                    _, slug, target_price, resolution_timestamp = decode(
+                        ["string", "string", "uint256", "uint256"], bytes(log["data"])
+                    )
+                    self.markets.setdefault(address, MarketRecord(
+                        address=address,
+                        collection_slug=slug,
+                        target_price=target_price,
+                        resolution_timestamp=resolution_timestamp
+                    ))
+                elif emitter in self.markets:
+                    self.markets[emitter].resolved = True
+
+            scanned_blocks.inc(stop - start + 1)
+            self.cursor = stop
+            start = stop + 1
+            self.chunk = min(SCAN_MAX_CHUNK, self.chunk * 2)
+
+
+# Process-wide registry for the configured MarketFactory
+scanner = MarketScanner()
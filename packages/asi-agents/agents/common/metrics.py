@@ -0,0 +1,306 @@
+"""
+Agent Metrics
+In-process counters, gauges and histograms exported in Prometheus text format
+"""
+
+import time
+import logging
+import functools
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{v}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+class _Metric:
+    kind = ""
+    
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+    
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set"""
+    kind = "counter"
+    
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+    
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+    
+    def _samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(k)} {v}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    """Point-in-time value per label set, optionally computed at scrape time"""
+    kind = "gauge"
+    
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+        self._functions: Dict[LabelKey, Callable[[], float]] = {}
+    
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+    
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+    
+    def set_function(self, fn: Callable[[], float], **labels):
+        """Compute the value with `fn` whenever metrics are scraped"""
+        with self._lock:
+            self._functions[_label_key(labels)] = fn
+    
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        
+        for key, fn in functions.items():
+            try:
+                values[key] = float(fn())
+            except Exception as e:
+                logger.debug(f"Gauge {self.name} callback failed: {e}")
+        
+        return [f"{self.name}{_format_labels(k)} {v}" for k, v in values.items()]
+
+
+class Histogram(_Metric):
+    """Cumulative bucketed observations per label set"""
+    kind = "histogram"
+    
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, List[float]] = {}  # bucket counts..., sum, count
+    
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+    
+    def _samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, series in self._series.items():
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', repr(bound)))} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+    
+    def _get_or_create(self, cls, name: str, help_text: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            return metric
+    
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._get_or_create(Counter, name, help_text)
+    
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text)
+    
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)
+    
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry shared by every agent in this process
+registry = Registry()
+
+handler_duration = registry.histogram(
+    "mcg_handler_duration_seconds", "Latency of agent message handlers and interval jobs"
+)
+handler_in_flight = registry.gauge(
+    "mcg_handler_in_flight", "Handler invocations currently running"
+)
+handler_errors = registry.counter(
+    "mcg_handler_errors_total", "Handler invocations that raised"
+)
+upstream_duration = registry.histogram(
+    "mcg_upstream_request_duration_seconds", "Latency of outbound calls by upstream"
+)
+cache_requests = registry.counter(
+    "mcg_cache_requests_total", "Cache lookups by cache and result (hit, stale, miss)"
+)
+cache_hit_ratio = registry.gauge(
+    "mcg_cache_hit_ratio", "Share of cache lookups served without an upstream call"
+)
+queue_depth = registry.gauge(
+    "mcg_queue_depth", "Requests waiting in an internal queue"
+)
+
+
+# Optional invocation observer installed by common.profiling; while it is
+# None (or not interested in a handler) timed() adds no further work
+observer = None
+
+
+def timed(agent: str, name: Optional[str] = None):
+    """Decorator recording latency, in-flight count and errors of an async handler"""
+    def decorator(func):
+        handler = name or func.__name__
+        labels = {"agent": agent, "handler": handler}
+        
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            handler_in_flight.inc(**labels)
+            start = time.perf_counter()
+            try:
+                if observer is not None and observer.wants(handler):
+                    return await observer.observe(agent, handler, func, args, kwargs)
+                return await func(*args, **kwargs)
+            except BaseException:
+                handler_errors.inc(**labels)
+                raise
+            finally:
+                handler_duration.observe(time.perf_counter() - start, **labels)
+                handler_in_flight.dec(**labels)
+        
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def upstream_timer(upstream: str, operation: str = "request"):
+    """Time an outbound call; the outcome label records whether it raised"""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        upstream_duration.observe(elapsed, upstream=upstream, operation=operation, outcome=outcome)
+        if observer is not None:
+            observer.record_outbound(upstream, operation, elapsed)
+
+
+_ratio_caches = set()
+
+
+def record_cache(cache: str, result: str):
+    """Count a cache lookup; `result` is hit, stale or miss"""
+    cache_requests.inc(cache=cache, result=result)
+    
+    if cache not in _ratio_caches:
+        _ratio_caches.add(cache)
+        
+        def ratio() -> float:
+            total = sum(cache_requests.value(cache=cache, result=r) for r in ("hit", "stale", "miss"))
+            served = total - cache_requests.value(cache=cache, result="miss")
+            return served / total if total else 0.0
+        cache_hit_ratio.set_function(ratio, cache=cache)
+
+
+def track_queue(queue: str, depth: Callable[[], float]):
+    """Export the depth of an internal queue, read at scrape time"""
+    queue_depth.set_function(depth, queue=queue)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        # Scrapes are frequent; keep them out of the agent logs
+        pass
+
+
+_servers: Dict[int, ThreadingHTTPServer] = {}
+
+
+def start_server(port: int, host: str = "127.0.0.1") -> bool:
+    """Serve /metrics on a local port from a daemon thread (idempotent per port)"""
+    if port <= 0 or port in _servers:
+        return False
+    
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logger.warning(f"Metrics server could not bind :{port}: {e}")
+        return False
+    
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=f"metrics-{port}", daemon=True).start()
+    _servers[port] = server
+    logger.info(f"📈 Metrics on http://{host}:{port}/metrics")
+    return True
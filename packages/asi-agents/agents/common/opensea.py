@@ -0,0 +1,143 @@
+"""
+OpenSea Client
+Shared, rate-limited access to the OpenSea collection stats API
+"""
+
+import os
+import asyncio
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional, Dict
+
+from common import capture, metrics
+from common.resilience import CircuitBreaker, Fetched, StaleCache
+from common.scheduler import Priority, SharedBucket, UpstreamScheduler
+
+logger = logging.getLogger(__name__)
+
+OPENSEA_API_URL = os.getenv("OPENSEA_API_URL", "https://api.opensea.io/api/v2")
+
+# OPENSEA_RATE_LIMIT and OPENSEA_BURST are the limits of OPENSEA_API_KEY. Agent
+# processes on one host share them through a bucket file in the runtime directory
+# (see common/runtime.py). With OPENSEA_SHARED_BUCKET empty each process gets the
+# full limits, so size them per process (e.g. when agents on several hosts share a key)
+OPENSEA_RATE_LIMIT = float(os.getenv("OPENSEA_RATE_LIMIT", "2"))
+OPENSEA_BURST = float(os.getenv("OPENSEA_BURST", "4"))
+OPENSEA_SHARED_BUCKET = os.getenv("OPENSEA_SHARED_BUCKET", "opensea-bucket")
+
+scheduler = UpstreamScheduler(
+    "opensea",
+    rate=OPENSEA_RATE_LIMIT,
+    burst=OPENSEA_BURST,
+    shared=SharedBucket(OPENSEA_SHARED_BUCKET, OPENSEA_BURST) if OPENSEA_SHARED_BUCKET else None
+)
+
+metrics.track_queue("opensea", lambda: scheduler.queue_depth)
+
+breaker = CircuitBreaker("opensea")
+
+# Last good floor price per collection, served while OpenSea is degraded
+floor_cache = StaleCache(
+    "opensea",
+    fresh_ttl=float(os.getenv("OPENSEA_FRESH_TTL", "30")),
+    max_stale=float(os.getenv("OPENSEA_MAX_STALE", "3600"))
+)
+
+# Extra attempts after a 429, by priority
+MAX_RETRIES = {
+    Priority.RESOLUTION: 3,
+    Priority.USER: 1,
+    Priority.BACKGROUND: 0,
+}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date"""
+    if not value:
+        return None
+    
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+async def fetch_collection_stats(collection_slug: str, priority: Priority = Priority.USER) -> Dict:
+    """Fetch collection stats from OpenSea, raising on failure"""
+    import requests  # Deferred to keep agent imports cheap
+    
+    url = f"{OPENSEA_API_URL}/collections/{collection_slug}/stats"
+    headers = {}
+    
+    api_key = os.getenv("OPENSEA_API_KEY")
+    if api_key:
+        headers["X-API-KEY"] = api_key
+    
+    attempts = MAX_RETRIES[priority] + 1
+    for attempt in range(attempts):
+        # Fail fast while the circuit is open instead of spending a token, but only
+        # claim a half-open trial once the token is held: waiting may be cancelled
+        breaker.check()
+        await scheduler.acquire(priority)
+        breaker.before_call()
+        
+        try:
+            with metrics.upstream_timer("opensea", "collection_stats"):
+                response = await asyncio.wait_for(
+                    asyncio.to_thread(
+                        capture.session.http, "opensea", "collection_stats", {"slug": collection_slug},
+                        lambda: requests.get(url, headers=headers, timeout=breaker.timeout)
+                    ),
+                    breaker.timeout
+                )
+        except Exception:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        
+        if response.status_code == 429:
+            # Throttling is the scheduler's concern, not an endpoint failure
+            breaker.record_success()
+            scheduler.on_throttled(parse_retry_after(response.headers.get("Retry-After")))
+            if attempt + 1 < attempts:
+                continue
+            response.raise_for_status()
+        
+        if response.status_code >= 500:
+            breaker.record_failure()
+            response.raise_for_status()
+        
+        breaker.record_success()
+        response.raise_for_status()
+        scheduler.on_success()
+        return response.json()
+
+
+async def fetch_floor_price(collection_slug: str, priority: Priority = Priority.USER) -> Optional[float]:
+    """Fetch the floor price of a collection, None if it has no floor"""
+    data = await fetch_collection_stats(collection_slug, priority)
+    floor_price = data.get('total', {}).get('floor_price', 0)
+    
+    return float(floor_price) if floor_price else None
+
+
+async def get_floor_price(
+    collection_slug: str,
+    priority: Priority = Priority.USER,
+    allow_stale: bool = True
+) -> Fetched[Optional[float]]:
+    """Floor price with stale-while-revalidate fallback to the last good value"""
+    return await floor_cache.get(
+        collection_slug,
+        lambda: fetch_floor_price(collection_slug, priority),
+        allow_stale
+    )
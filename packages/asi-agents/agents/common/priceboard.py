@@ -0,0 +1,284 @@
+"""
+Shared Price Board
+Memory-mapped floor price table written by the oracle and read by co-located agents
+"""
+
+import os
+import time
+import mmap
+import zlib
+import struct
+import logging
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from common import metrics, runtime
+
+try:
+    import fcntl
+except ImportError:  # Windows: the single-writer check is skipped
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+PRICE_BOARD_PATH = os.getenv("PRICE_BOARD_PATH")  # Unset: price-board in the runtime directory; empty disables
+PRICE_BOARD_SLOTS = int(os.getenv("PRICE_BOARD_SLOTS", "1024"))
+PRICE_BOARD_MAX_AGE = float(os.getenv("PRICE_BOARD_MAX_AGE", "60"))
+
+MAGIC = b"MCGP"
+VERSION = 1
+MAX_SLUG_BYTES = 64
+READ_RETRIES = 8
+REOPEN_INTERVAL = 5.0
+
+# Never follow a symlink planted in place of the board
+OPEN_FLAGS = getattr(os, "O_NOFOLLOW", 0)
+
+# Header: magic, version, slot count, slot size (padded to 64 bytes)
+HEADER = struct.Struct("<4sIII")
+HEADER_SIZE = 64
+
+# Slot: sequence number, slug, price, confidence, source count, timestamp (padded to 128 bytes)
+SEQ = struct.Struct("<Q")
+PAYLOAD = struct.Struct(f"<{MAX_SLUG_BYTES}sddI4xd")
+SLOT_SIZE = 128
+
+
+@dataclass
+class BoardEntry:
+    """One consistent snapshot of a slot"""
+    price: float
+    confidence: float
+    source_count: int
+    timestamp: float
+
+    @property
+    def age(self) -> float:
+        return max(0.0, time.time() - self.timestamp)
+
+
+class PriceBoard:
+    """
+    Fixed-layout price table in a memory-mapped file.
+
+    Collection slugs are interned into slots by open addressing on a stable
+    hash, so every process finds the same slot without coordination; once
+    found, the slot index is cached per process. Slots are never freed.
+
+    Each slot is guarded by a seqlock: the single writer makes the sequence
+    number odd, writes the payload, then makes it even again. Readers retry
+    until they see the same even sequence number before and after copying
+    the payload, so a read never mixes two updates and never blocks the writer.
+
+    The board is only trusted when this user owns it and no one else can
+    write it (see common/runtime.py); a file failing that is not used.
+    """
+
+    def __init__(self, path: Optional[str] = PRICE_BOARD_PATH, slots: int = PRICE_BOARD_SLOTS):
+        self._path = path
+        self.slots = slots
+        self.writable = False
+        self._writer_failed = False
+        self._mm: Optional[mmap.mmap] = None
+        self._fd: Optional[int] = None
+        self._index: Dict[str, int] = {}
+        self._next_open = 0.0
+        self._inode: Optional[int] = None
+        self._rejected: Optional[int] = None  # Inode of an unsafe board, warned about once
+
+    @property
+    def path(self) -> str:
+        """Board file, or "" if disabled or the runtime directory is unusable"""
+        if self._path is None:
+            try:
+                self._path = runtime.runtime_path("price-board")
+            except OSError as e:
+                logger.warning(f"⚠️ Price board disabled: {e}")
+                self._path = ""
+        return self._path
+
+    @property
+    def size(self) -> int:
+        return HEADER_SIZE + self.slots * SLOT_SIZE
+
+    def open_writer(self) -> bool:
+        """Map the board for writing, creating it if needed; only one writer may hold it"""
+        if self.writable:
+            return True
+        if not self.path or self._writer_failed:
+            return False
+
+        try:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT | OPEN_FLAGS, 0o600)
+            try:
+                runtime.check_private(fd, self.path)
+            except OSError:
+                os.close(fd)
+                raise
+            if fcntl is not None:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    os.close(fd)
+                    logger.warning(f"⚠️ Price board {self.path} already has a writer - not publishing")
+                    self._writer_failed = True
+                    return False
+
+            if os.fstat(fd).st_size != self.size or not self._valid_header(fd):
+                # New board or an incompatible layout. Replace the file rather than
+                # resizing it, so readers still mapping the old one are unaffected
+                os.close(fd)
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC | OPEN_FLAGS, 0o600)
+                os.ftruncate(fd, self.size)
+                os.write(fd, HEADER.pack(MAGIC, VERSION, self.slots, SLOT_SIZE))
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                os.replace(tmp_path, self.path)
+
+            self.close()
+            self._fd = fd
+            self._mm = mmap.mmap(fd, self.size)
+            self.writable = True
+            logger.info(f"📋 Publishing prices to {self.path} ({self.slots} slots)")
+            return True
+
+        except OSError as e:
+            logger.warning(f"⚠️ Price board unavailable: {e}")
+            self._writer_failed = True
+            return False
+
+    def publish(self, slug: str, price: float, confidence: float, source_count: int, timestamp: Optional[float] = None) -> bool:
+        """Write the latest price for a collection; returns False if it could not be stored"""
+        if not self.open_writer():
+            return False
+
+        index = self._find(slug, claim=True)
+        if index is None:
+            return False
+
+        offset = HEADER_SIZE + index * SLOT_SIZE
+        (seq,) = SEQ.unpack_from(self._mm, offset)
+        SEQ.pack_into(self._mm, offset, seq + 1)
+        PAYLOAD.pack_into(
+            self._mm, offset + SEQ.size,
+            slug.encode(), price, confidence, source_count,
+            timestamp if timestamp is not None else time.time()
+        )
+        SEQ.pack_into(self._mm, offset, seq + 2)
+        return True
+
+    def read(self, slug: str, max_age: Optional[float] = None) -> Optional[BoardEntry]:
+        """Latest published price for a collection, or None if absent or older than max_age"""
+        entry = self._read(slug)
+        if entry is None or (max_age is not None and entry.age > max_age):
+            metrics.record_cache("price_board", "miss")
+            return None
+
+        metrics.record_cache("price_board", "hit")
+        return entry
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _read(self, slug: str) -> Optional[BoardEntry]:
+        if not self._open_reader():
+            return None
+
+        index = self._find(slug, claim=False)
+        if index is None:
+            return None
+
+        offset = HEADER_SIZE + index * SLOT_SIZE
+        for _ in range(READ_RETRIES):
+            (before,) = SEQ.unpack_from(self._mm, offset)
+            if before & 1:
+                continue
+            _, price, confidence, source_count, timestamp = PAYLOAD.unpack_from(self._mm, offset + SEQ.size)
+            (after,) = SEQ.unpack_from(self._mm, offset)
+            if before == after:
+                return BoardEntry(price, confidence, source_count, timestamp)
+
+        return None
+
+    def _open_reader(self) -> bool:
+        if self.writable:
+            return True
+        if not self.path or time.monotonic() < self._next_open:
+            return self._mm is not None
+
+        # The oracle may not have created the board yet, or may have replaced
+        # it with a new layout; check occasionally
+        self._next_open = time.monotonic() + REOPEN_INTERVAL
+        try:
+            inode = os.stat(self.path).st_ino
+            if self._mm is not None and inode == self._inode:
+                return True
+            fd = os.open(self.path, os.O_RDONLY | OPEN_FLAGS)
+        except OSError:
+            return self._mm is not None
+
+        try:
+            runtime.check_private(fd, self.path)
+        except OSError as e:
+            os.close(fd)
+            if inode != self._rejected:
+                logger.warning(f"⚠️ Ignoring price board: {e}")
+                self._rejected = inode
+            self.close()
+            return False
+
+        if os.fstat(fd).st_size != self.size or not self._valid_header(fd):
+            os.close(fd)
+            return self._mm is not None
+
+        self.close()
+        self._index.clear()
+        self._inode = inode
+        self._fd = fd
+        self._mm = mmap.mmap(fd, self.size, access=mmap.ACCESS_READ)
+        return True
+
+    def _valid_header(self, fd: int) -> bool:
+        os.lseek(fd, 0, os.SEEK_SET)
+        header = os.read(fd, HEADER.size)
+        return len(header) == HEADER.size and HEADER.unpack(header) == (MAGIC, VERSION, self.slots, SLOT_SIZE)
+
+    def _find(self, slug: str, claim: bool) -> Optional[int]:
+        """Slot holding `slug`, claiming the first empty one on the probe path if asked"""
+        index = self._index.get(slug)
+        if index is not None:
+            return index
+
+        key = slug.encode()
+        if not key or len(key) > MAX_SLUG_BYTES:
+            return None
+
+        start = zlib.crc32(key) % self.slots
+        for probe in range(self.slots):
+            index = (start + probe) % self.slots
+            offset = HEADER_SIZE + index * SLOT_SIZE + SEQ.size
+            stored = self._mm[offset:offset + MAX_SLUG_BYTES].rstrip(b"\0")
+
+            if stored == key:
+                self._index[slug] = index
+                return index
+            if not stored:
+                if not claim:
+                    return None
+                # Claimed by the caller's first publish, which writes the slug
+                self._index[slug] = index
+                return index
+
+        if claim:
+            logger.warning(f"⚠️ Price board full ({self.slots} slots) - {slug} not published")
+        return None
+
+
+# Process-wide board; the oracle opens it for writing, everyone else reads
+board = PriceBoard()
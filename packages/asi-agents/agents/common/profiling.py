@@ -0,0 +1,273 @@
+"""
+Handler Profiling
+Opt-in sampling profiler for agent handlers and interval jobs
+
+Enable with AGENT_PROFILE="resolve_market,periodic_scan" (or "*") or at runtime
+with a ProfileControl message. Output goes to AGENT_PROFILE_DIR:
+  <agent>.<handler>.folded        collapsed stacks for flamegraph.pl / speedscope
+  <agent>.<handler>.slowest.json  slowest invocations with their outbound-call breakdown
+"""
+
+import os
+import sys
+import json
+import time
+import heapq
+import atexit
+import itertools
+import logging
+import threading
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Set, Tuple
+
+from uagents import Context, Model
+
+from common import metrics
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HANDLERS = os.getenv("AGENT_PROFILE", "")
+PROFILE_DIR = os.getenv("AGENT_PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = float(os.getenv("AGENT_PROFILE_INTERVAL", "0.005"))  # 5 ms
+PROFILE_TOP_N = int(os.getenv("AGENT_PROFILE_TOP_N", "10"))
+
+# Agent addresses allowed to send ProfileControl messages (empty = nobody)
+PROFILE_CONTROLLERS = {a.strip() for a in os.getenv("AGENT_PROFILE_CONTROLLERS", "").split(",") if a.strip()}
+
+
+# Message Models
+class ProfileControl(Model):
+    """Switch handler profiling on or off at runtime"""
+    enable: bool
+    handlers: List[str] = []  # Handler names, or ["*"] for all
+    flush: bool = True
+
+
+class ProfileStatus(Model):
+    """Profiler state after a control message"""
+    enabled_handlers: List[str]
+    output_dir: str
+    files_written: List[str]
+
+
+class Invocation:
+    """One profiled handler call"""
+    __slots__ = ("agent", "handler", "code", "thread", "started_at", "duration", "outbound")
+    
+    def __init__(self, agent: str, handler: str, code, thread: int):
+        self.agent = agent
+        self.handler = handler
+        self.code = code
+        self.thread = thread
+        self.started_at = time.time()
+        self.duration = 0.0
+        self.outbound: Dict[str, List[float]] = {}  # "upstream:operation" -> [calls, seconds]
+    
+    def to_dict(self) -> Dict:
+        return {
+            "started_at": self.started_at,
+            "duration_seconds": round(self.duration, 6),
+            "outbound": {
+                key: {"calls": int(calls), "seconds": round(seconds, 6)}
+                for key, (calls, seconds) in sorted(self.outbound.items())
+            },
+        }
+
+
+_current: ContextVar[Optional[Invocation]] = ContextVar("profiled_invocation", default=None)
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name}@{os.path.basename(code.co_filename)}:{code.co_firstlineno}"
+
+
+class Profiler:
+    """
+    Samples the stacks of threads running profiled handlers.
+    
+    A background thread wakes every `interval` seconds and, for each thread
+    with an active invocation, walks its current frame chain. A sample is
+    attributed to a handler only if that handler's code object is on the
+    stack, so time spent awaiting I/O shows up in the outbound breakdown
+    rather than as misattributed CPU samples.
+    """
+    
+    def __init__(self, output_dir: str, interval: float, top_n: int):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.top_n = top_n
+        self.handlers: Set[str] = set()
+        self._all = False
+        self._lock = threading.Lock()
+        self._active: Dict[int, Set[Invocation]] = defaultdict(set)
+        self._stacks: Dict[Tuple[str, str], Counter] = defaultdict(Counter)
+        self._slowest: Dict[Tuple[str, str], List] = defaultdict(list)
+        self._seq = itertools.count()
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+    
+    @property
+    def enabled(self) -> bool:
+        return self._all or bool(self.handlers)
+    
+    def enable(self, handlers: List[str]):
+        """Start profiling the named handlers ("*" for all)"""
+        names = {h for h in handlers if h}
+        self._all = self._all or "*" in names
+        self.handlers |= names - {"*"}
+        metrics.observer = self
+        logger.info(f"🔬 Profiling enabled for {sorted(self.handlers) or ['*']}")
+    
+    def disable(self):
+        """Stop profiling; collected data stays until flushed"""
+        self.handlers = set()
+        self._all = False
+        metrics.observer = None
+        self._stop.set()
+        self._sampler = None
+        logger.info("🔬 Profiling disabled")
+    
+    def enabled_handlers(self) -> List[str]:
+        return sorted(self.handlers | ({"*"} if self._all else set()))
+    
+    def wants(self, handler: str) -> bool:
+        return self._all or handler in self.handlers
+    
+    async def observe(self, agent: str, handler: str, func, args, kwargs):
+        """Run a handler call while it is being sampled"""
+        invocation = Invocation(agent, handler, func.__code__, threading.get_ident())
+        token = _current.set(invocation)
+        with self._lock:
+            self._active[invocation.thread].add(invocation)
+        self._ensure_sampler()
+        
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            invocation.duration = time.perf_counter() - start
+            _current.reset(token)
+            with self._lock:
+                self._active[invocation.thread].discard(invocation)
+                self._keep_if_slow(invocation)
+    
+    def record_outbound(self, upstream: str, operation: str, elapsed: float):
+        """Attribute an outbound call to the invocation that made it"""
+        invocation = _current.get()
+        if invocation is None:
+            return
+        entry = invocation.outbound.setdefault(f"{upstream}:{operation}", [0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed
+    
+    def _keep_if_slow(self, invocation: Invocation):
+        heap = self._slowest[(invocation.agent, invocation.handler)]
+        item = (invocation.duration, next(self._seq), invocation)
+        if len(heap) < self.top_n:
+            heapq.heappush(heap, item)
+        elif invocation.duration > heap[0][0]:
+            heapq.heapreplace(heap, item)
+    
+    def _ensure_sampler(self):
+        if self._sampler is not None:
+            return
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(
+            target=self._sample_loop, args=(self._stop,), name="handler-profiler", daemon=True
+        )
+        self._sampler.start()
+    
+    def _sample_loop(self, stop: threading.Event):
+        while not stop.wait(self.interval):
+            with self._lock:
+                active = {tid: list(invs) for tid, invs in self._active.items() if invs}
+            if not active:
+                continue
+            
+            frames = sys._current_frames()
+            for thread_id, invocations in active.items():
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                codes.reverse()
+                
+                for invocation in invocations:
+                    if invocation.code not in codes:
+                        continue
+                    # Root the stack at the handler itself
+                    stack = codes[codes.index(invocation.code):]
+                    folded = ";".join(_frame_label(c) for c in stack)
+                    with self._lock:
+                        self._stacks[(invocation.agent, invocation.handler)][folded] += 1
+    
+    def flush(self) -> List[str]:
+        """Write collapsed stacks and slowest invocations to disk"""
+        written = []
+        
+        with self._lock:
+            stacks = {key: dict(counter) for key, counter in self._stacks.items()}
+            slowest = {
+                key: [inv.to_dict() for _, _, inv in sorted(heap, reverse=True)]
+                for key, heap in self._slowest.items()
+            }
+        
+        if not stacks and not slowest:
+            return written
+        
+        os.makedirs(self.output_dir, exist_ok=True)
+        
+        for (agent, handler), counter in stacks.items():
+            path = os.path.join(self.output_dir, f"{agent}.{handler}.folded")
+            with open(path, "w") as f:
+                for stack, count in sorted(counter.items()):
+                    f.write(f"{stack} {count}\n")
+            written.append(path)
+        
+        for (agent, handler), invocations in slowest.items():
+            path = os.path.join(self.output_dir, f"{agent}.{handler}.slowest.json")
+            with open(path, "w") as f:
+                json.dump(invocations, f, indent=2)
+            written.append(path)
+        
+        if written:
+            logger.info(f"🔬 Wrote {len(written)} profile file(s) to {self.output_dir}")
+        return written
+
+
+profiler = Profiler(PROFILE_DIR, PROFILE_INTERVAL, PROFILE_TOP_N)
+atexit.register(profiler.flush)
+
+if PROFILE_HANDLERS:
+    profiler.enable(PROFILE_HANDLERS.split(","))
+
+
+def register_control(agent):
+    """Attach the ProfileControl message handler to an agent"""
+    
+    @agent.on_message(model=ProfileControl)
+    async def handle_profile_control(ctx: Context, sender: str, msg: ProfileControl):
+        """Toggle profiling at runtime"""
+        if sender not in PROFILE_CONTROLLERS:
+            ctx.logger.warning(f"⚠️ Ignoring profile control from unauthorised {sender[:8]}...")
+            return
+        
+        if msg.enable:
+            profiler.enable(msg.handlers or ["*"])
+        else:
+            profiler.disable()
+        
+        written = profiler.flush() if msg.flush else []
+        
+        await ctx.send(sender, ProfileStatus(
+            enabled_handlers=profiler.enabled_handlers(),
+            output_dir=os.path.abspath(profiler.output_dir),
+            files_written=written
+        ))
+    
+    return handle_profile_control
@@ -0,0 +1,63 @@
+"""
+Incremental Ranking
+Keyed scores kept in sorted order, so the top K is a slice rather than a sort
+"""
+
+from bisect import bisect_left, insort
+from typing import Any, Dict, Generic, Hashable, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class Ranking(Generic[T]):
+    """
+    Items ranked by score, highest first, updated one key at a time.
+
+    Scores are kept in a list sorted on (-score, key) next to a dict of the
+    current score and item per key. An update removes the key's old
+    position by binary search and inserts the new one; reading the top K
+    is a slice of the list, O(K), with no per-request sorting or heap pops.
+    """
+
+    def __init__(self):
+        self._order: List[Tuple[float, Any]] = []
+        self._entries: Dict[Hashable, Tuple[float, T]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Optional[T]:
+        entry = self._entries.get(key)
+        return entry[1] if entry else None
+
+    def update(self, key: Hashable, score: float, item: T):
+        """Set the score and item for `key`, moving it in the order only if the score changed"""
+        current = self._entries.get(key)
+        if current is not None and current[0] == score:
+            self._entries[key] = (score, item)
+            return
+
+        if current is not None:
+            self._remove_order(key, current[0])
+        insort(self._order, (-score, key))
+        self._entries[key] = (score, item)
+
+    def remove(self, key: Hashable):
+        current = self._entries.pop(key, None)
+        if current is not None:
+            self._remove_order(key, current[0])
+
+    def keys(self) -> List[Hashable]:
+        return list(self._entries)
+
+    def top(self, k: int) -> List[Tuple[float, T]]:
+        """The k highest scored items with their scores"""
+        return [(-neg_score, self._entries[key][1]) for neg_score, key in self._order[:k]]
+
+    def _remove_order(self, key: Hashable, score: float):
+        i = bisect_left(self._order, (-score, key))
+        if i < len(self._order) and self._order[i] == (-score, key):
+            del self._order[i]
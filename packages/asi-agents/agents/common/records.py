@@ -0,0 +1,223 @@
+"""
+Indexer Records
+Slotted Market, Position and Trade records, parsed once where indexer data enters an agent
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+WEI = 10**18
+
+
+def _int(value: Any) -> int:
+    """BigInt fields arrive as decimal strings; missing or null reads as 0"""
+    return int(value) if value else 0
+
+
+def _optional_int(value: Any) -> Optional[int]:
+    return int(value) if value is not None else None
+
+
+class Record:
+    """
+    Base for fixed-field records.
+
+    Fields live in __slots__, so a record has no per-instance dict, and
+    amounts are Python ints holding exact wei. (Wei totals overflow 64-bit
+    integers, which rules out packing them into fixed-width arrays.)
+    """
+
+    __slots__ = ()
+
+    def replace(self, **changes) -> "Record":
+        """Copy with some fields changed"""
+        copy = object.__new__(type(self))
+        for name in self.__slots__:
+            setattr(copy, name, changes.get(name, getattr(self, name)))
+        return copy
+
+    def __eq__(self, other) -> bool:
+        return type(other) is type(self) and all(getattr(self, n) == getattr(other, n) for n in self.__slots__)
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{n}={getattr(self, n)!r}" for n in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class Market(Record):
+    """An indexer Market; fields a query did not select keep their defaults"""
+
+    __slots__ = (
+        "id", "market_address", "collection_slug", "target_price", "resolution_timestamp", "status",
+        "yes_shares_total", "no_shares_total", "total_volume", "total_trades",
+        "winning_outcome", "final_price", "created_at",
+    )
+
+    def __init__(
+        self,
+        id: str = "",
+        market_address: str = "",
+        collection_slug: str = "",
+        target_price: int = 0,  # Wei
+        resolution_timestamp: int = 0,
+        status: str = "Open",
+        yes_shares_total: int = 0,  # Wei-denominated shares
+        no_shares_total: int = 0,
+        total_volume: int = 0,  # Wei
+        total_trades: int = 0,
+        winning_outcome: Optional[bool] = None,
+        final_price: Optional[int] = None,  # Wei
+        created_at: int = 0
+    ):
+        self.id = id
+        self.market_address = market_address
+        self.collection_slug = collection_slug
+        self.target_price = target_price
+        self.resolution_timestamp = resolution_timestamp
+        self.status = status
+        self.yes_shares_total = yes_shares_total
+        self.no_shares_total = no_shares_total
+        self.total_volume = total_volume
+        self.total_trades = total_trades
+        self.winning_outcome = winning_outcome
+        self.final_price = final_price
+        self.created_at = created_at
+
+    @classmethod
+    def from_indexer(cls, row: Dict) -> "Market":
+        return cls(
+            id=row.get("id") or row.get("marketAddress") or "",
+            market_address=row.get("marketAddress") or row.get("id") or "",
+            collection_slug=row.get("collectionSlug") or "",
+            target_price=_int(row.get("targetPrice")),
+            resolution_timestamp=_int(row.get("resolutionTimestamp")),
+            status=row.get("status") or "Open",
+            yes_shares_total=_int(row.get("yesSharesTotal")),
+            no_shares_total=_int(row.get("noSharesTotal")),
+            total_volume=_int(row.get("totalVolume")),
+            total_trades=_int(row.get("totalTrades")),
+            winning_outcome=row.get("winningOutcome"),
+            final_price=_optional_int(row.get("finalPrice")),
+            created_at=_int(row.get("createdAt"))
+        )
+
+    @property
+    def total_shares(self) -> int:
+        return self.yes_shares_total + self.no_shares_total
+
+    @property
+    def yes_fraction(self) -> Optional[float]:
+        """Share of all shares on YES; None before the first trade"""
+        total = self.yes_shares_total + self.no_shares_total
+        return self.yes_shares_total / total if total else None
+
+    @property
+    def target_price_eth(self) -> float:
+        return self.target_price / WEI
+
+    @property
+    def total_volume_eth(self) -> float:
+        return self.total_volume / WEI
+
+
+class Position(Record):
+    """An indexer Position: one user's holdings in one market"""
+
+    __slots__ = ("market_id", "user_id", "yes_shares", "no_shares", "total_invested", "realized_pnl", "updated_at")
+
+    def __init__(
+        self,
+        market_id: str = "",
+        user_id: str = "",
+        yes_shares: int = 0,
+        no_shares: int = 0,
+        total_invested: int = 0,  # Wei
+        realized_pnl: int = 0,  # Wei, signed
+        updated_at: int = 0
+    ):
+        self.market_id = market_id
+        self.user_id = user_id
+        self.yes_shares = yes_shares
+        self.no_shares = no_shares
+        self.total_invested = total_invested
+        self.realized_pnl = realized_pnl
+        self.updated_at = updated_at
+
+    @classmethod
+    def from_indexer(cls, row: Dict) -> "Position":
+        return cls(
+            market_id=(row.get("market_id") or "").lower(),
+            user_id=(row.get("user_id") or "").lower(),
+            yes_shares=_int(row.get("yesShares")),
+            no_shares=_int(row.get("noShares")),
+            total_invested=_int(row.get("totalInvested")),
+            realized_pnl=_int(row.get("realizedPnL")),
+            updated_at=_int(row.get("updatedAt"))
+        )
+
+    @property
+    def net_shares(self) -> int:
+        """YES minus NO shares: positive when the position gains from the floor ending above target"""
+        return self.yes_shares - self.no_shares
+
+
+class Trade(Record):
+    """An indexer Trade, with the market's share totals after it"""
+
+    __slots__ = (
+        "market_id", "user_id", "outcome", "is_buy", "share_amount", "eth_amount",
+        "yes_shares_total", "no_shares_total", "timestamp", "block_number", "transaction_hash",
+    )
+
+    def __init__(
+        self,
+        market_id: str = "",
+        user_id: str = "",
+        outcome: bool = False,  # True for YES
+        is_buy: bool = True,
+        share_amount: int = 0,
+        eth_amount: int = 0,  # Wei
+        yes_shares_total: int = 0,
+        no_shares_total: int = 0,
+        timestamp: int = 0,
+        block_number: int = 0,
+        transaction_hash: str = ""
+    ):
+        self.market_id = market_id
+        self.user_id = user_id
+        self.outcome = outcome
+        self.is_buy = is_buy
+        self.share_amount = share_amount
+        self.eth_amount = eth_amount
+        self.yes_shares_total = yes_shares_total
+        self.no_shares_total = no_shares_total
+        self.timestamp = timestamp
+        self.block_number = block_number
+        self.transaction_hash = transaction_hash
+
+    @classmethod
+    def from_indexer(cls, row: Dict) -> "Trade":
+        return cls(
+            market_id=(row.get("market_id") or "").lower(),
+            user_id=(row.get("user_id") or "").lower(),
+            outcome=bool(row.get("outcome")),
+            is_buy=bool(row.get("isBuy", True)),
+            share_amount=_int(row.get("shareAmount")),
+            eth_amount=_int(row.get("ethAmount")),
+            yes_shares_total=_int(row.get("yesSharesTotal")),
+            no_shares_total=_int(row.get("noSharesTotal")),
+            timestamp=_int(row.get("timestamp")),
+            block_number=_int(row.get("blockNumber")),
+            transaction_hash=row.get("transactionHash") or ""
+        )
+
+
+def markets(rows: Iterable[Dict]) -> List[Market]:
+    return [Market.from_indexer(row) for row in rows]
+
+
+def positions(rows: Iterable[Dict]) -> List[Position]:
+    return [Position.from_indexer(row) for row in rows]
+
+
+def trades(rows: Iterable[Dict]) -> List[Trade]:
+    return [Trade.from_indexer(row) for row in rows]
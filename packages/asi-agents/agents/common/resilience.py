@@ -0,0 +1,292 @@
+"""
+Upstream Resilience
+Per-endpoint circuit breakers and stale-while-revalidate caching
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, List, Optional, TypeVar
+
+from common import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "5"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the endpoint's circuit is open"""
+
+
+@dataclass
+class Fetched(Generic[T]):
+    """An upstream value with explicit staleness metadata"""
+    value: Optional[T]
+    stale: bool = False
+    age: Optional[float] = None  # Seconds since the value was fetched
+    error: Optional[str] = None
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker for a single upstream endpoint.
+    
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    fail fast for `reset_timeout` seconds. One trial call is then let through
+    (half-open); its outcome closes or re-opens the circuit.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_RESET_TIMEOUT,
+        timeout: float = UPSTREAM_TIMEOUT
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.timeout = timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+    
+    def check(self):
+        """Raise CircuitOpenError if before_call() would, without claiming the trial"""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout:
+            raise CircuitOpenError(f"{self.name} circuit open")
+        if self.state == self.HALF_OPEN and self._trial_in_flight:
+            raise CircuitOpenError(f"{self.name} circuit half-open, trial in flight")
+    
+    def before_call(self):
+        """
+        Raise CircuitOpenError unless a call may go out now.
+        
+        A call allowed through must end in record_success(), record_failure()
+        or release(), or a half-open circuit stays blocked on its trial.
+        """
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError(f"{self.name} circuit open")
+            self.state = self.HALF_OPEN
+            self._trial_in_flight = False
+        
+        if self.state == self.HALF_OPEN:
+            if self._trial_in_flight:
+                raise CircuitOpenError(f"{self.name} circuit half-open, trial in flight")
+            self._trial_in_flight = True
+    
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info(f"{self.name} circuit closed")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_in_flight = False
+    
+    def release(self):
+        """End a call with no verdict on the endpoint (e.g. it was cancelled)"""
+        self._trial_in_flight = False
+    
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"{self.name} circuit opened after {self.failures} failure(s)")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+    
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run `fn` under the breaker with the endpoint timeout"""
+        self.before_call()
+        try:
+            result = await asyncio.wait_for(fn(), self.timeout)
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.record_success()
+        return result
+
+
+@dataclass
+class _Entry:
+    value: Any
+    fetched_at: float
+
+
+class StaleCache:
+    """
+    Stale-while-revalidate cache in front of an upstream fetch.
+    
+    Values younger than `fresh_ttl` are served as fresh. Older values up to
+    `max_stale` are served immediately, flagged stale, while a single
+    background task refreshes them. When a fetch fails the last good value is
+    returned (flagged stale) instead of an empty result.
+    """
+    
+    def __init__(self, name: str, fresh_ttl: float, max_stale: float, max_entries: int = 1024):
+        self.name = name
+        self.fresh_ttl = fresh_ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._refreshing: Dict[Hashable, asyncio.Task] = {}
+    
+    async def get(
+        self,
+        key: Hashable,
+        fetch: Callable[[], Awaitable[T]],
+        allow_stale: bool = True
+    ) -> Fetched[T]:
+        """Return the cached value for `key`, fetching or revalidating as needed"""
+        entry = self._entries.get(key)
+        
+        if entry is not None:
+            self._entries.move_to_end(key)
+            age = time.time() - entry.fetched_at
+            
+            if age <= self.fresh_ttl:
+                metrics.record_cache(self.name, "hit")
+                return Fetched(value=entry.value, age=age)
+            
+            if allow_stale and age <= self.max_stale:
+                metrics.record_cache(self.name, "stale")
+                self._revalidate(key, fetch)
+                return Fetched(value=entry.value, stale=True, age=age)
+        
+        metrics.record_cache(self.name, "miss")
+        try:
+            value = await fetch()
+        except Exception as e:
+            logger.error(f"{self.name} fetch failed: {e}")
+            if entry is not None and allow_stale:
+                return Fetched(
+                    value=entry.value,
+                    stale=True,
+                    age=time.time() - entry.fetched_at,
+                    error=str(e)
+                )
+            return Fetched(value=None, stale=True, error=str(e))
+        
+        self._store(key, value)
+        return Fetched(value=value, age=0.0)
+    
+    def peek(self, key: Hashable) -> Optional[Fetched]:
+        """The cached value for `key` without fetching, None if absent or older than max_stale"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        age = time.time() - entry.fetched_at
+        if age > self.max_stale:
+            return None
+        return Fetched(value=entry.value, stale=age > self.fresh_ttl, age=age)
+    
+    def clear(self):
+        """Drop every cached value"""
+        self._entries.clear()
+    
+    def snapshot(self) -> List[list]:
+        """Entries still within max_stale as [key, value, fetched_at], oldest first"""
+        cutoff = time.time() - self.max_stale
+        return [
+            [key, entry.value, entry.fetched_at]
+            for key, entry in self._entries.items()
+            if entry.fetched_at >= cutoff
+        ]
+    
+    def restore(self, entries: List[list]):
+        """Load entries from snapshot(), keeping any newer value already cached"""
+        cutoff = time.time() - self.max_stale
+        for key, value, fetched_at in sorted(entries, key=lambda e: e[2]):
+            # JSON turns tuple keys into lists
+            key = tuple(key) if isinstance(key, list) else key
+            current = self._entries.get(key)
+            if fetched_at < cutoff or (current is not None and current.fetched_at >= fetched_at):
+                continue
+            self._entries[key] = _Entry(value=value, fetched_at=fetched_at)
+        
+        # Keep LRU order by age and respect the size bound
+        ordered = sorted(self._entries.items(), key=lambda item: item[1].fetched_at)
+        self._entries = OrderedDict(ordered[-self.max_entries:])
+    
+    def _store(self, key: Hashable, value: Any):
+        self._entries[key] = _Entry(value=value, fetched_at=time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def _revalidate(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]):
+        """Refresh `key` in the background, at most once at a time"""
+        if key in self._refreshing:
+            return
+        
+        async def refresh():
+            try:
+                self._store(key, await fetch())
+            except Exception as e:
+                logger.warning(f"{self.name} revalidation failed: {e}")
+            finally:
+                self._refreshing.pop(key, None)
+        
+        self._refreshing[key] = asyncio.create_task(refresh())
+
+
+@dataclass
+class _Versioned:
+    version: Hashable
+    value: Any
+    stored_at: float
+
+
+class VersionedCache:
+    """
+    Memo of derived results, valid while their inputs' version is unchanged.
+    
+    Each key holds one result plus the version of the inputs it was computed
+    from; a lookup with a different version, or after `ttl`, is a miss and
+    the next put() replaces the entry. Least recently used keys are evicted
+    beyond `max_entries`.
+    """
+    
+    def __init__(self, name: str, ttl: float, max_entries: int = 1024):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, _Versioned]" = OrderedDict()
+    
+    def get(self, key: Hashable, version: Hashable) -> Optional[Any]:
+        """Cached result for `key` if it was computed from `version` within the TTL"""
+        entry = self._entries.get(key)
+        if entry is None or entry.version != version or time.time() - entry.stored_at > self.ttl:
+            metrics.record_cache(self.name, "miss")
+            return None
+        
+        self._entries.move_to_end(key)
+        metrics.record_cache(self.name, "hit")
+        return entry.value
+    
+    def put(self, key: Hashable, version: Hashable, value: Any):
+        self._entries[key] = _Versioned(version=version, value=value, stored_at=time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def clear(self):
+        self._entries.clear()
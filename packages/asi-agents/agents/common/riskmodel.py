@@ -0,0 +1,195 @@
+"""
+Collection Risk Model
+Online covariance of collection floor-price returns, for portfolio risk
+"""
+
+import os
+import base64
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RISK_HALF_LIFE = float(os.getenv("RISK_HALF_LIFE", "2016"))  # Samples; a week at the default interval
+RISK_MIN_SAMPLES = int(os.getenv("RISK_MIN_SAMPLES", "24"))  # Returns a collection needs before it is modelled
+
+INITIAL_CAPACITY = 64
+
+
+@dataclass
+class PortfolioRisk:
+    """Risk of a set of collection exposures under the current covariance"""
+    # Daily standard deviation of sum(exposure x floor log-return): share-weighted floor
+    # volatility, for comparing portfolios. Not ETH P&L, as share values are not linear in the floor
+    exposure_volatility: float
+    correlated_exposure: float  # -1..1: share of risk from positions moving together (negative: hedged)
+    modelled: float  # Share of gross exposure in collections with enough history
+    # (slug, slug, correlation) for held pairs whose moves reinforce each other, strongest first
+    reinforcing_pairs: List[Tuple[str, str, float]] = field(default_factory=list)
+
+
+class CovarianceTracker:
+    """
+    Exponentially weighted covariance of log floor-price returns across collections.
+
+    `interval` is the expected number of seconds between samples, used to
+    express exposure volatility per day.
+
+    Each update() is one sample: the floor price of every tracked
+    collection at the same moment. The return vector since the previous
+    sample updates the mean and covariance in place with a Welford-style
+    step, cov <- (1 - a)(cov + a d d^T) where d is the return's deviation
+    from the old mean, an O(n^2) vector operation. For the first 1/a
+    samples a = 1/n, which is exactly Welford's running covariance; after
+    that a follows RISK_HALF_LIFE so the model tracks changing regimes.
+
+    Collections without a new price contribute a zero return (the floor
+    is carried forward). Arrays grow by doubling as collections are added,
+    and each collection counts its own returns so that new ones are left
+    out of portfolio figures until they have RISK_MIN_SAMPLES.
+    """
+
+    def __init__(self, interval: float = 300.0, half_life: float = RISK_HALF_LIFE,
+                 min_samples: int = RISK_MIN_SAMPLES):
+        self.alpha = 1.0 - 0.5 ** (1.0 / half_life)
+        self.interval = interval
+        self.min_samples = min_samples
+        self.samples = 0
+        self.slots: Dict[str, int] = {}
+        self._allocate(INITIAL_CAPACITY)
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def _allocate(self, capacity: int):
+        n = len(self.slots)
+        mean, cov, counts, last = np.zeros(capacity), np.zeros((capacity, capacity)), np.zeros(capacity, np.int64), np.zeros(capacity)
+        if n:
+            mean[:n], cov[:n, :n], counts[:n], last[:n] = self._mean[:n], self._cov[:n, :n], self._counts[:n], self._last[:n]
+        self._mean, self._cov, self._counts, self._last = mean, cov, counts, last
+
+    def _slot(self, slug: str) -> int:
+        slot = self.slots.get(slug)
+        if slot is None:
+            slot = len(self.slots)
+            if slot == len(self._mean):
+                self._allocate(2 * slot)
+            self.slots[slug] = slot
+        return slot
+
+    def update(self, prices: Dict[str, float]):
+        """Add one sample of floor prices (ETH), taken together"""
+        observed = [(self._slot(slug), price) for slug, price in prices.items() if price and price > 0]
+        n = len(self.slots)
+        if not observed:
+            return
+
+        slots = np.fromiter((s for s, _ in observed), np.int64, len(observed))
+        current = np.fromiter((p for _, p in observed), np.float64, len(observed))
+        previous = self._last[slots]
+        self._last[slots] = current
+
+        moved = previous > 0
+        if not moved.any():
+            return
+        returns = np.zeros(n)
+        returns[slots[moved]] = np.log(current[moved] / previous[moved])
+        self._counts[slots[moved]] += 1
+
+        self.samples += 1
+        a = max(self.alpha, 1.0 / self.samples)
+        mean, cov = self._mean[:n], self._cov[:n, :n]
+        delta = returns - mean
+        mean += a * delta
+        cov += a * np.outer(delta, delta)
+        cov *= 1.0 - a
+
+    def covariance(self, slugs: List[str]) -> np.ndarray:
+        """Covariance of per-sample returns between `slugs` (zero for unknown collections)"""
+        index = np.array([self.slots.get(s, -1) for s in slugs], np.int64)
+        result = np.zeros((len(slugs), len(slugs)))
+        known = index >= 0
+        if known.any():
+            result[np.ix_(known, known)] = self._cov[np.ix_(index[known], index[known])]
+        return result
+
+    def correlation(self, a: str, b: str) -> Optional[float]:
+        if not (self.is_modelled(a) and self.is_modelled(b)):
+            return None
+        cov = self.covariance([a, b])
+        scale = np.sqrt(cov[0, 0] * cov[1, 1])
+        return float(cov[0, 1] / scale) if scale > 0 else None
+
+    def is_modelled(self, slug: str) -> bool:
+        slot = self.slots.get(slug)
+        return slot is not None and self._counts[slot] >= self.min_samples
+
+    def portfolio_risk(self, exposures: Dict[str, float], pair_threshold: float = 0.5) -> Optional[PortfolioRisk]:
+        """
+        Risk of signed exposures per collection (positive: gains when the floor rises).
+
+        Only collections with enough history enter the covariance
+        figures; `modelled` says how much of the portfolio that covers.
+        None if nothing held is modelled yet.
+        """
+        gross = sum(abs(w) for w in exposures.values())
+        slugs = [s for s, w in exposures.items() if w and self.is_modelled(s)]
+        if not slugs or gross <= 0:
+            return None
+
+        w = np.array([exposures[s] for s in slugs])
+        cov = self.covariance(slugs)
+        sigma = np.sqrt(np.clip(np.diag(cov), 0.0, None))
+
+        variance = float(w @ cov @ w)
+        own = float(np.sum((w * sigma) ** 2))
+        scale = float(np.sum(np.abs(w) * sigma)) ** 2
+        # Cross terms over their largest possible size (every pair perfectly aligned)
+        correlated = (variance - own) / (scale - own) if scale - own > 1e-18 else 0.0
+
+        pairs = []
+        if len(slugs) > 1:
+            with np.errstate(divide="ignore", invalid="ignore"):
+                corr = np.nan_to_num(cov / np.outer(sigma, sigma))
+            # Same-direction bets on correlated collections, or opposite bets on anti-correlated ones
+            reinforcing = np.triu(corr * np.sign(np.outer(w, w)) >= pair_threshold, k=1)
+            for i, j in zip(*np.nonzero(reinforcing)):
+                pairs.append((slugs[i], slugs[j], float(corr[i, j])))
+            pairs.sort(key=lambda p: -abs(p[2]))
+
+        per_day = 86400.0 / self.interval
+        return PortfolioRisk(
+            exposure_volatility=float(np.sqrt(max(variance, 0.0) * per_day)),
+            correlated_exposure=float(np.clip(correlated, -1.0, 1.0)),
+            modelled=min(1.0, float(np.abs(w).sum() / gross)),
+            reinforcing_pairs=pairs
+        )
+
+    def snapshot(self) -> Dict:
+        """Compact state for checkpoints"""
+        n = len(self.slots)
+        pack = lambda a: base64.b64encode(np.ascontiguousarray(a).tobytes()).decode()
+        return {
+            "slugs": list(self.slots),
+            "samples": self.samples,
+            "mean": pack(self._mean[:n]),
+            "cov": pack(self._cov[:n, :n]),
+            "counts": pack(self._counts[:n]),
+            "last": pack(self._last[:n]),
+        }
+
+    def restore(self, state: Dict):
+        n = len(state["slugs"])
+        unpack = lambda key, dtype: np.frombuffer(base64.b64decode(state[key]), dtype)
+        self.slots = {}
+        self._allocate(max(INITIAL_CAPACITY, n))
+        self.slots = {slug: i for i, slug in enumerate(state["slugs"])}
+        self.samples = state["samples"]
+        self._mean[:n] = unpack("mean", np.float64)
+        self._cov[:n, :n] = unpack("cov", np.float64).reshape(n, n)
+        self._counts[:n] = unpack("counts", np.int64)
+        self._last[:n] = unpack("last", np.float64)
+        logger.info(f"Restored covariance of {n} collections over {self.samples} samples")
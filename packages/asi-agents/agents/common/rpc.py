@@ -0,0 +1,389 @@
+"""
+Ethereum JSON-RPC Helpers
+Web3 providers and transaction plumbing used by agents that talk to the chain
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Hashable, List, Optional
+from urllib.parse import urlparse
+
+from web3 import Web3
+from web3.exceptions import ContractLogicError
+from web3.providers.base import BaseProvider
+
+from common import capture, metrics
+from common.resilience import CircuitBreaker, CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated; the first reachable URL is the primary that transactions go through
+RPC_URLS = [url.strip() for url in os.getenv("BASE_SEPOLIA_RPC", "https://sepolia.base.org").split(",") if url.strip()]
+RPC_TIMEOUT = float(os.getenv("RPC_TIMEOUT", "10"))                 # Per request, per endpoint
+HEDGE_PERCENTILE = float(os.getenv("RPC_HEDGE_PERCENTILE", "95"))   # Hedge reads slower than this percentile
+HEDGE_MIN_DELAY = float(os.getenv("RPC_HEDGE_MIN_DELAY", "0.05"))   # Never hedge sooner than this
+HEDGE_INITIAL_DELAY = float(os.getenv("RPC_HEDGE_INITIAL_DELAY", "0.5"))  # Until an endpoint has samples
+PROBE_INTERVAL = float(os.getenv("RPC_PROBE_INTERVAL", "30"))       # Re-measure idle endpoints this often
+BLOCK_TIME = float(os.getenv("RPC_BLOCK_TIME", "2"))                # Expected seconds per block
+FEE_BASE_MULTIPLIER = float(os.getenv("FEE_BASE_MULTIPLIER", "2"))  # Base fee headroom in maxFeePerGas
+GAS_LIMIT_MARGIN = float(os.getenv("GAS_LIMIT_MARGIN", "1.2"))      # Gas limit over the estimate
+FEE_REPLACEMENT_BUMP = float(os.getenv("FEE_REPLACEMENT_BUMP", "0.125"))  # Fee increase of a replacement (nodes require 10%)
+
+LATENCY_SAMPLES = 200  # Per endpoint, for the hedge percentile
+LATENCY_ALPHA = 0.2    # EWMA weight of the newest sample
+MIN_SAMPLES = 20       # Before the percentile is trusted
+
+# Sent to the primary only: sends must not be duplicated, and the pending
+# nonce must come from the node the transaction goes to
+PRIMARY_METHODS = {"eth_sendRawTransaction", "eth_sendTransaction", "eth_getTransactionCount"}
+
+endpoint_latency = metrics.registry.gauge(
+    "mcg_rpc_endpoint_latency_seconds", "Smoothed response time per RPC endpoint"
+)
+endpoint_healthy = metrics.registry.gauge(
+    "mcg_rpc_endpoint_healthy", "1 while the endpoint's circuit is closed"
+)
+endpoint_errors = metrics.registry.counter(
+    "mcg_rpc_endpoint_errors_total", "Failed requests per RPC endpoint"
+)
+hedged_reads = metrics.registry.counter(
+    "mcg_rpc_hedged_total", "Reads re-issued to a second endpoint (sent) and those it answered first (won)"
+)
+
+
+class Endpoint:
+    """One RPC URL with its latency and error history"""
+    
+    def __init__(self, url: str):
+        self.url = url
+        # Host only: provider URLs often carry an API key in the path
+        self.name = urlparse(url).netloc or url
+        self.provider = Web3.HTTPProvider(url, request_kwargs={"timeout": RPC_TIMEOUT})
+        self.breaker = CircuitBreaker(f"rpc {self.name}", timeout=RPC_TIMEOUT)
+        self.samples: deque = deque(maxlen=LATENCY_SAMPLES)
+        self.latency: Optional[float] = None  # EWMA of successful requests
+        self.error_rate = 0.0                 # EWMA over all requests
+        self.used_at = 0.0
+    
+    @property
+    def available(self) -> bool:
+        """Closed circuit, or open long enough for a trial call"""
+        return (self.breaker.state != CircuitBreaker.OPEN
+                or time.monotonic() - self.breaker.opened_at >= self.breaker.reset_timeout)
+    
+    def cost(self, now: float) -> float:
+        """Routing cost: latency inflated by recent errors; unmeasured or idle endpoints cost nothing"""
+        if self.latency is None or now - self.used_at > PROBE_INTERVAL:
+            return 0.0
+        return self.latency * (1.0 + 10.0 * self.error_rate)
+    
+    def hedge_delay(self) -> float:
+        """How long a read may take on this endpoint before it is hedged"""
+        if len(self.samples) < MIN_SAMPLES:
+            return HEDGE_INITIAL_DELAY
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * HEDGE_PERCENTILE / 100))
+        return max(HEDGE_MIN_DELAY, ordered[index])
+    
+    def record(self, elapsed: float, ok: bool):
+        self.used_at = time.monotonic()
+        self.error_rate += LATENCY_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok:
+            self.samples.append(elapsed)
+            self.latency = elapsed if self.latency is None else self.latency + LATENCY_ALPHA * (elapsed - self.latency)
+            self.breaker.record_success()
+            endpoint_latency.set(self.latency, endpoint=self.name)
+        else:
+            self.breaker.record_failure()
+            endpoint_errors.inc(endpoint=self.name)
+        endpoint_healthy.set(1 if self.breaker.state == CircuitBreaker.CLOSED else 0, endpoint=self.name)
+
+
+class ProviderPool(BaseProvider):
+    """
+    Web3 provider over several RPC endpoints.
+    
+    Reads go to the endpoint with the lowest smoothed latency (inflated by
+    its recent error rate) whose circuit is closed. If no answer arrives
+    within that endpoint's HEDGE_PERCENTILE latency, the read is re-issued
+    to the next best endpoint and whichever answers first wins; a failed
+    read moves on to the next endpoint straight away. Endpoints idle for
+    PROBE_INTERVAL are routed to once more so their measurements stay
+    current.
+    
+    Transactions and pending nonce reads always go to the primary: the
+    first configured endpoint whose circuit admits calls, so every send
+    lands on the same node while it is healthy. With a single URL this is
+    a plain HTTP provider.
+    """
+    
+    def __init__(self, urls: List[str]):
+        super().__init__()
+        self.endpoints = [Endpoint(url) for url in urls]
+        self._lock = threading.Lock()
+        # Requests already run off the event loop; hedges need a second thread each
+        self._executor = ThreadPoolExecutor(max_workers=8 * len(self.endpoints), thread_name_prefix="rpc")
+    
+    def make_request(self, method, params):
+        with metrics.upstream_timer("rpc", method):
+            return capture.session.call("rpc", method, {"method": method, "params": params},
+                                        lambda: self._route(method, params))
+    
+    def _route(self, method, params):
+        if method in PRIMARY_METHODS or len(self.endpoints) == 1:
+            return self._call(self.primary(), method, params)
+        return self._read(method, params)
+    
+    def is_connected(self, show_traceback: bool = False) -> bool:
+        return self.primary().provider.is_connected(show_traceback)
+    
+    def primary(self) -> Endpoint:
+        """First configured endpoint that can take a call"""
+        with self._lock:
+            return next((e for e in self.endpoints if e.available), self.endpoints[0])
+    
+    def ranked(self) -> List[Endpoint]:
+        """Endpoints that can take a call, cheapest first"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [e for e in self.endpoints if e.available] or list(self.endpoints)
+            return sorted(candidates, key=lambda e: e.cost(now))
+    
+    def _call(self, endpoint: Endpoint, method, params):
+        with self._lock:
+            endpoint.breaker.before_call()
+        start = time.perf_counter()
+        try:
+            response = endpoint.provider.make_request(method, params)
+        except Exception:
+            with self._lock:
+                endpoint.record(time.perf_counter() - start, ok=False)
+            raise
+        except BaseException:
+            with self._lock:
+                endpoint.breaker.release()
+            raise
+        with self._lock:
+            endpoint.record(time.perf_counter() - start, ok=True)
+        return response
+    
+    def _read(self, method, params):
+        candidates = self.ranked()
+        first = candidates.pop(0)
+        delay = first.hedge_delay()
+        in_flight = {self._executor.submit(self._call, first, method, params): first}
+        hedge: Optional[Endpoint] = None
+        error: Optional[Exception] = None
+        
+        while in_flight:
+            timeout = delay if candidates and hedge is None else None
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            
+            if not done:
+                # Slower than this endpoint's tail: ask the next one as well
+                hedge = candidates.pop(0)
+                hedged_reads.inc(outcome="sent")
+                in_flight[self._executor.submit(self._call, hedge, method, params)] = hedge
+                continue
+            
+            for future in done:
+                endpoint = in_flight.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    error = e
+                    if not isinstance(e, CircuitOpenError):
+                        logger.debug(f"RPC {method} failed on {endpoint.name}: {e}")
+                    if candidates:
+                        endpoint = candidates.pop(0)
+                        in_flight[self._executor.submit(self._call, endpoint, method, params)] = endpoint
+                    continue
+                if endpoint is hedge:
+                    hedged_reads.inc(outcome="won")
+                return response
+        
+        raise error
+
+
+@lru_cache(maxsize=None)
+def get_web3() -> Web3:
+    """Process-wide Web3 client over the configured RPC endpoints"""
+    return Web3(ProviderPool(RPC_URLS))
+
+
+@lru_cache(maxsize=None)
+def chain_id() -> int:
+    """Chain id of the configured endpoints, read once"""
+    return get_web3().eth.chain_id
+
+
+@dataclass
+class FeeEstimate:
+    """EIP-1559 fee fields for transactions sent against one block"""
+    block: int
+    base_fee: int
+    priority_fee: int
+    
+    @property
+    def max_fee(self) -> int:
+        return int(self.base_fee * FEE_BASE_MULTIPLIER) + self.priority_fee
+    
+    def tx_fields(self) -> Dict[str, int]:
+        return {"maxFeePerGas": self.max_fee, "maxPriorityFeePerGas": self.priority_fee}
+
+
+@dataclass
+class Simulation:
+    """Outcome of executing a transaction against a block without sending it"""
+    ok: bool
+    gas: int = 0  # Gas limit to send with, including GAS_LIMIT_MARGIN
+    error: Optional[str] = None
+
+
+class FeeOracle:
+    """
+    EIP-1559 fees and pre-flight simulations, refreshed once per block.
+    
+    The latest block is fetched at most once per BLOCK_TIME; only when its
+    number changes are the base fee and priority fee re-read, and the
+    simulation cache is cleared. Every transaction built in between shares
+    the same estimate, and simulating the same call twice in one block
+    costs one estimateGas.
+    """
+    
+    def __init__(self):
+        self.estimate: Optional[FeeEstimate] = None
+        self.checked_at = 0.0
+        self._simulations: Dict[Hashable, Simulation] = {}
+        self._lock: Optional[asyncio.Lock] = None
+    
+    async def fees(self) -> FeeEstimate:
+        """Fee estimate for the current block"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        
+        async with self._lock:
+            if self.estimate is not None and time.monotonic() - self.checked_at < BLOCK_TIME:
+                metrics.record_cache("fee_oracle", "hit")
+                return self.estimate
+            
+            w3 = get_web3()
+            block = await asyncio.to_thread(w3.eth.get_block, "latest")
+            self.checked_at = time.monotonic()
+            if self.estimate is not None and block["number"] == self.estimate.block:
+                metrics.record_cache("fee_oracle", "hit")
+                return self.estimate
+            
+            metrics.record_cache("fee_oracle", "miss")
+            try:
+                priority_fee = await asyncio.to_thread(lambda: w3.eth.max_priority_fee)
+            except Exception:
+                priority_fee = self.estimate.priority_fee if self.estimate else Web3.to_wei(0.001, "gwei")
+            
+            self.estimate = FeeEstimate(
+                block=block["number"],
+                base_fee=block.get("baseFeePerGas", 0),
+                priority_fee=priority_fee
+            )
+            self._simulations.clear()
+            return self.estimate
+    
+    async def simulate(self, key: Hashable, function, sender: str) -> Simulation:
+        """
+        Execute a contract function call as `sender` with estimateGas at the current block.
+        
+        `key` identifies the call (contract, function and arguments); results
+        are reused until the next block.
+        """
+        estimate = await self.fees()
+        cached = self._simulations.get(key)
+        if cached is not None:
+            metrics.record_cache("simulation", "hit")
+            return cached
+        
+        metrics.record_cache("simulation", "miss")
+        try:
+            gas = await asyncio.to_thread(
+                function.estimate_gas, {"from": sender}, block_identifier=estimate.block
+            )
+            result = Simulation(ok=True, gas=int(gas * GAS_LIMIT_MARGIN))
+        except ContractLogicError as e:
+            # Only reverts are cached; transport errors propagate
+            result = Simulation(ok=False, error=str(e))
+        
+        self._simulations[key] = result
+        return result
+    
+    async def tx_params(self, sender: str, nonce: int, simulation: Simulation) -> Dict[str, Any]:
+        """Complete transaction fields, so building it makes no further RPC calls"""
+        estimate = await self.fees()
+        return {
+            "from": sender,
+            "nonce": nonce,
+            "gas": simulation.gas,
+            "chainId": await asyncio.to_thread(chain_id),
+            **estimate.tx_fields(),
+        }
+    
+    async def replacement_fees(self, max_fee: int, priority_fee: int, cap: int = 0) -> Optional[Dict[str, int]]:
+        """
+        Fees for re-sending a stuck transaction with the same nonce.
+        
+        Both fees rise by at least FEE_REPLACEMENT_BUMP, so nodes accept the
+        replacement, and at least to the current estimate. None if that
+        would take maxFeePerGas above `cap` (0: no cap).
+        """
+        estimate = await self.fees()
+        bump = lambda fee: fee + int(fee * FEE_REPLACEMENT_BUMP) + 1
+        new_priority = max(bump(priority_fee), estimate.priority_fee)
+        new_max = max(bump(max_fee), estimate.max_fee, new_priority)
+        if cap and new_max > cap:
+            return None
+        return {"maxFeePerGas": new_max, "maxPriorityFeePerGas": new_priority}
+
+
+# Process-wide fee oracle shared by every transaction this process sends
+fee_oracle = FeeOracle()
+
+
+class NonceTracker:
+    """
+    Hands out sequential nonces for one sending account without a round trip per transaction.
+    
+    The first reservation reads the pending transaction count from the node;
+    later ones count up locally, so several transactions can be in flight at
+    once. Call resync() whenever a send fails or a transaction is dropped,
+    and the next reservation re-reads the count from the node.
+    """
+    
+    def __init__(self, address: str):
+        self.address = address
+        self._next: Optional[int] = None
+        self._lock: Optional[asyncio.Lock] = None
+    
+    async def reserve(self) -> int:
+        """Next nonce to use"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        
+        async with self._lock:
+            if self._next is None:
+                self._next = await asyncio.to_thread(
+                    get_web3().eth.get_transaction_count, self.address, "pending"
+                )
+            nonce = self._next
+            self._next += 1
+            return nonce
+    
+    def resync(self):
+        """Forget the local count; the next reservation asks the node"""
+        if self._next is not None:
+            logger.info(f"Nonce tracker for {self.address[:10]}... resyncing")
+        self._next = None
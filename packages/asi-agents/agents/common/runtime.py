@@ -0,0 +1,60 @@
+"""
+Runtime Files
+Private per-user directory for state shared by co-located agent processes,
+and the data directory for state that outlives them
+"""
+
+import os
+import stat
+import tempfile
+from typing import Union
+
+# Empty: $XDG_RUNTIME_DIR/mcg, or mcg-<uid> in the system temp directory
+RUNTIME_DIR = os.getenv("MCG_RUNTIME_DIR", "")
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Job database and checkpoints; relative names in their settings resolve here, not in the CWD
+DATA_DIR = os.getenv("MCG_DATA_DIR", os.path.join(PACKAGE_DIR, "data"))
+
+
+def default_dir() -> str:
+    if RUNTIME_DIR:
+        return RUNTIME_DIR
+    if os.getenv("XDG_RUNTIME_DIR"):
+        return os.path.join(os.environ["XDG_RUNTIME_DIR"], "mcg")
+    uid = os.getuid() if hasattr(os, "getuid") else os.getenv("USERNAME", "user")
+    return os.path.join(tempfile.gettempdir(), f"mcg-{uid}")
+
+
+def check_private(target: Union[int, str], name: str = ""):
+    """
+    Raise PermissionError unless a file descriptor or path belongs to this
+    user and cannot be written by anyone else.
+
+    Other local users must not be able to plant or edit files the agents
+    trust. Skipped where there are no POSIX owners (Windows).
+    """
+    if not hasattr(os, "getuid"):
+        return
+    st = os.fstat(target) if isinstance(target, int) else os.lstat(target)
+    name = name or str(target)
+    if st.st_uid != os.getuid():
+        raise PermissionError(f"{name} is owned by uid {st.st_uid}, not {os.getuid()}")
+    if st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(f"{name} is writable by other users (mode {stat.S_IMODE(st.st_mode):o})")
+
+
+def runtime_dir() -> str:
+    """The runtime directory, created with mode 0700 if missing and checked either way"""
+    path = default_dir()
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    check_private(path)
+    return path
+
+
+def runtime_path(name: str) -> str:
+    return os.path.join(runtime_dir(), name)
+
+
+def data_path(name: str) -> str:
+    """`name` under DATA_DIR unless already absolute; empty stays empty (the setting is disabled)"""
+    return os.path.join(DATA_DIR, name) if name else ""
@@ -0,0 +1,255 @@
+"""
+Upstream Request Scheduler
+Priority-aware token bucket shared by every agent that calls a rate-limited API
+"""
+
+import os
+import time
+import asyncio
+import heapq
+import struct
+import itertools
+import logging
+from enum import IntEnum
+from typing import Optional, List, Tuple
+
+from common import runtime
+
+try:
+    import fcntl
+except ImportError:  # Windows: buckets are per process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Request priority classes (lower value = served first)"""
+    RESOLUTION = 0  # Final settlement prices
+    USER = 1        # Direct user / agent requests
+    BACKGROUND = 2  # Monitoring and periodic scans
+
+
+class SharedBucket:
+    """
+    Token bucket kept in a file, shared by every process on the host that
+    uses the same API key.
+    
+    Each grant takes an exclusive flock on the file, refills by wall-clock
+    time and takes a token, so concurrent agent processes together stay
+    within the key's rate instead of each spending all of it. A throttling
+    pause is stored too, so one 429 pauses every process. The file lives
+    in the private runtime directory; if it cannot be used, grants are
+    unlimited here and the process falls back to its own bucket.
+    """
+    
+    STATE = struct.Struct("<ddd")  # tokens, updated at, blocked until (wall clock)
+    
+    def __init__(self, name: str, burst: float):
+        self.name = name
+        self.burst = burst
+        self._fd: Optional[int] = None
+        self._failed = fcntl is None
+    
+    def take(self, needed: float, rate: float) -> float:
+        """Take one token if at least `needed` are available; otherwise the seconds to wait"""
+        if not self._open():
+            return 0.0
+        
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            now = time.time()
+            tokens, updated, blocked_until = self._load(now)
+            if now < blocked_until:
+                return blocked_until - now
+            
+            # Clamped in case the wall clock stepped backwards
+            tokens = min(self.burst, tokens + max(0.0, now - updated) * rate)
+            if tokens < needed:
+                self._store(tokens, now, blocked_until)
+                return (needed - tokens) / rate
+            
+            self._store(tokens - 1.0, now, blocked_until)
+            return 0.0
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+    
+    def block(self, until: float):
+        """Pause every process until the wall-clock time `until`"""
+        if not self._open():
+            return
+        
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            now = time.time()
+            tokens, updated, blocked_until = self._load(now)
+            self._store(tokens, updated, max(blocked_until, until))
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+    
+    def _open(self) -> bool:
+        if self._fd is not None:
+            return True
+        if self._failed:
+            return False
+        
+        try:
+            path = runtime.runtime_path(self.name)
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                runtime.check_private(fd, path)
+            except OSError:
+                os.close(fd)
+                raise
+        except OSError as e:
+            logger.warning(f"⚠️ Shared {self.name} bucket unavailable, limiting this process alone: {e}")
+            self._failed = True
+            return False
+        
+        self._fd = fd
+        return True
+    
+    def _load(self, now: float) -> Tuple[float, float, float]:
+        data = os.pread(self._fd, self.STATE.size, 0)
+        if len(data) < self.STATE.size:
+            return self.burst, now, 0.0
+        return self.STATE.unpack(data)
+    
+    def _store(self, tokens: float, updated: float, blocked_until: float):
+        os.pwrite(self._fd, self.STATE.pack(tokens, updated, blocked_until), 0)
+
+
+class UpstreamScheduler:
+    """
+    Token bucket with strict priority ordering.
+    
+    Waiters are granted tokens highest priority first, so a resolution fetch
+    never queues behind background work. Background requests additionally
+    leave a reserve of tokens untouched for higher priorities. Throttling
+    responses pause dispatch (honouring Retry-After) and halve the rate,
+    which then recovers additively on success.
+    
+    With a `shared` bucket, every grant must also take a token from it, so
+    the rate and the pauses apply to all processes sharing it together.
+    Priority order still holds within each process, and the background
+    reserve is kept in the shared bucket as well.
+    """
+    
+    INITIAL_BACKOFF = 1.0
+    MAX_BACKOFF = 60.0
+    
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        burst: float,
+        background_reserve: float = 0.25,
+        min_rate: Optional[float] = None,
+        shared: Optional[SharedBucket] = None
+    ):
+        self.name = name
+        self.shared = shared
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate if min_rate is not None else rate / 10
+        self.burst = burst
+        self.tokens = burst
+        self.reserve = max(1.0, burst * background_reserve)
+        self.blocked_until = 0.0
+        self._backoff = self.INITIAL_BACKOFF
+        self._updated = time.monotonic()
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+    
+    @property
+    def queue_depth(self) -> int:
+        """Number of requests waiting for a token"""
+        return sum(1 for _, _, fut in self._waiters if not fut.done())
+    
+    async def acquire(self, priority: Priority = Priority.USER):
+        """Wait until a request of the given priority may be sent"""
+        self._loop = asyncio.get_running_loop()
+        future = self._loop.create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._seq), future))
+        self._dispatch()
+        await future
+    
+    def on_success(self):
+        """Record a successful call and recover the rate additively"""
+        self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+        self._backoff = self.INITIAL_BACKOFF
+    
+    def on_throttled(self, retry_after: Optional[float] = None):
+        """Record a throttling response and back off"""
+        delay = retry_after if retry_after is not None else self._backoff
+        self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+        self.rate = max(self.min_rate, self.rate * 0.5)
+        self._backoff = min(self.MAX_BACKOFF, self._backoff * 2)
+        if self.shared is not None:
+            self.shared.block(time.time() + delay)
+        
+        logger.warning(
+            f"{self.name} throttled: pausing {delay:.1f}s, rate now {self.rate:.2f}/s"
+        )
+        self._dispatch()
+    
+    def snapshot(self) -> dict:
+        """Adaptive rate and any pending pause, for checkpointing"""
+        return {
+            "rate": self.rate,
+            "backoff": self._backoff,
+            "blocked_until": time.time() + max(0.0, self.blocked_until - time.monotonic()),
+        }
+    
+    def restore(self, state: dict):
+        """Resume a throttled rate and pause from snapshot()"""
+        self.rate = min(self.max_rate, max(self.min_rate, float(state["rate"])))
+        self._backoff = min(self.MAX_BACKOFF, max(self.INITIAL_BACKOFF, float(state["backoff"])))
+        remaining = float(state["blocked_until"]) - time.time()
+        if remaining > 0:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + remaining)
+    
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def _dispatch(self):
+        """Grant tokens to waiters in priority order, then schedule the next wakeup"""
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+        
+        now = time.monotonic()
+        self._refill(now)
+        delay = None
+        
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                # Cancelled while waiting
+                heapq.heappop(self._waiters)
+                continue
+            
+            if now < self.blocked_until:
+                delay = self.blocked_until - now
+                break
+            
+            needed = 1.0 + (self.reserve if priority >= Priority.BACKGROUND else 0.0)
+            if self.tokens < needed:
+                delay = (needed - self.tokens) / self.rate
+                break
+            
+            if self.shared is not None:
+                wait = self.shared.take(needed, self.rate)
+                if wait > 0:
+                    delay = wait
+                    break
+            
+            heapq.heappop(self._waiters)
+            self.tokens -= 1.0
+            future.set_result(None)
+        
+        if delay is not None and self._loop is not None:
+            self._wakeup = self._loop.call_later(delay, self._dispatch)
@@ -0,0 +1,165 @@
+"""
+Handler Work Pool
+Bounded concurrency and queueing for agent message handlers, with capacity
+held back for interval jobs and explicit load shedding when queues fill up
+"""
+
+import os
+import time
+import asyncio
+import logging
+import functools
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from common import metrics
+
+logger = logging.getLogger(__name__)
+
+# Sends an error response for a request that was not admitted
+ShedCallback = Callable[..., Awaitable[None]]
+
+OVERLOADED = "Agent overloaded, request shed - retry later"
+
+shed_requests = metrics.registry.counter(
+    "mcg_handler_shed_total", "Messages rejected because their work queue was full"
+)
+queue_wait = metrics.registry.histogram(
+    "mcg_handler_queue_wait_seconds", "Time messages waited for a worker slot"
+)
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+@dataclass
+class Lane:
+    """Concurrency limit and bounded queue for one message type"""
+    name: str
+    concurrency: int
+    max_queue: int
+    waiting: int = 0
+    running: int = 0
+    semaphore: Optional[asyncio.Semaphore] = field(default=None, repr=False)
+
+
+class WorkPool:
+    """
+    Per-agent pool of worker slots.
+
+    Each message type gets a lane with its own concurrency limit and queue
+    bound. Admitted messages run as background tasks, so the agent's dispatch
+    loop never blocks on a slow handler. Messages arriving at a full lane are
+    answered immediately through the lane's shed callback. Interval jobs draw
+    from the same pool, but `interval_reserve` slots are never handed to
+    messages, so periodic work keeps running under a message burst.
+
+    Limits can be overridden per agent and lane from the environment, e.g.
+    MARKET_ANALYST_WORK_CAPACITY or MARKET_ANALYST_ANALYSIS_CONCURRENCY.
+    """
+
+    def __init__(self, agent: str, capacity: int = 32, interval_reserve: int = 4):
+        prefix = agent.upper()
+        self.agent = agent
+        self.capacity = _env_int(f"{prefix}_WORK_CAPACITY", capacity)
+        self.interval_reserve = min(
+            _env_int(f"{prefix}_INTERVAL_RESERVE", interval_reserve), self.capacity - 1
+        )
+        self.active = 0
+        self.lanes: Dict[str, Lane] = {}
+        self._condition: Optional[asyncio.Condition] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def queue_depth(self) -> int:
+        """Messages admitted but still waiting for a slot, across all lanes"""
+        return sum(lane.waiting for lane in self.lanes.values())
+
+    def lane(self, name: str, concurrency: int = 8, max_queue: int = 64) -> Lane:
+        """Declare a lane; limits may be overridden from the environment"""
+        if name not in self.lanes:
+            prefix = f"{self.agent.upper()}_{name.upper()}"
+            lane = Lane(
+                name=name,
+                concurrency=max(1, _env_int(f"{prefix}_CONCURRENCY", concurrency)),
+                max_queue=max(0, _env_int(f"{prefix}_MAX_QUEUE", max_queue))
+            )
+            self.lanes[name] = lane
+            metrics.track_queue(f"{self.agent}.{name}", lambda: lane.waiting)
+        return self.lanes[name]
+
+    def message(self, lane_name: str, handler, shed: ShedCallback):
+        """Wrap a message handler so it runs in the given lane"""
+        lane = self.lane(lane_name)
+
+        @functools.wraps(handler)
+        async def wrapper(ctx, sender: str, msg):
+            if lane.waiting >= lane.max_queue:
+                shed_requests.inc(agent=self.agent, lane=lane.name)
+                ctx.logger.warning(
+                    f"⚠️ {lane.name} queue full ({lane.waiting} waiting) - shedding request from {sender[:8]}..."
+                )
+                try:
+                    await shed(ctx, sender, msg)
+                except Exception as e:
+                    ctx.logger.error(f"❌ Failed to send overload response: {e}")
+                return
+
+            lane.waiting += 1
+            task = asyncio.create_task(self._run(lane, handler, ctx, sender, msg))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        return wrapper
+
+    def interval(self, handler):
+        """Wrap an interval job so it draws on the reserved capacity"""
+        @functools.wraps(handler)
+        async def wrapper(ctx):
+            await self._acquire(reserved=True)
+            try:
+                await handler(ctx)
+            finally:
+                await self._release()
+
+        return wrapper
+
+    async def _run(self, lane: Lane, handler, ctx, sender: str, msg):
+        if lane.semaphore is None:
+            lane.semaphore = asyncio.Semaphore(lane.concurrency)
+
+        queued_at = time.perf_counter()
+        acquired = False
+        try:
+            async with lane.semaphore:
+                await self._acquire(reserved=False)
+                acquired = True
+                lane.waiting -= 1
+                lane.running += 1
+                queue_wait.observe(time.perf_counter() - queued_at, agent=self.agent, lane=lane.name)
+                try:
+                    await handler(ctx, sender, msg)
+                finally:
+                    lane.running -= 1
+                    await self._release()
+        except Exception as e:
+            # The handler's own error handling has already run; keep the task quiet
+            logger.error(f"❌ {self.agent}.{lane.name} handler failed: {e}")
+        finally:
+            if not acquired:
+                lane.waiting -= 1
+
+    async def _acquire(self, reserved: bool):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+
+        limit = self.capacity if reserved else self.capacity - self.interval_reserve
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < limit)
+            self.active += 1
+
+    async def _release(self):
+        async with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
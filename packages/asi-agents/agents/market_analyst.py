@@ -5,13 +5,21 @@ Uses MeTTa knowledge graphs for structured reasoning
 """
 
 import os
+import math
+import time
+import asyncio
 import logging
-from typing import Optional, Dict, List
+from dataclasses import dataclass, replace
+from typing import Dict, Optional, List
 from datetime import datetime
 
 from uagents import Agent, Context, Model
-from uagents.setup import fund_agent_if_low
-import requests
+
+from common import addressbook, checkpoint, graphql, logs, metrics, opensea, priceboard, profiling, records, workpool
+from common.ranking import Ranking
+from common.records import Market
+from common.resilience import Fetched, VersionedCache
+from common.scheduler import Priority
 
 # Setup logging
 logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
@@ -61,131 +69,275 @@ class MarketAnalysisResponse(Model):
     recommendation: str
     reasoning: List[str]
     timestamp: str
+    data_stale: bool = False  # True if any input was served from a stale cache
+    data_age_seconds: Optional[float] = None  # Age of the oldest input
+    error: Optional[str] = None
+
+
+class TopOpportunitiesRequest(Model):
+    """Request the best-scoring open markets right now"""
+    limit: int = 10
+
+
+class Opportunity(Model):
+    """One open market and why it scores well"""
+    market_address: str
+    collection_slug: str
+    score: float
+    recommendation: str  # Side with the edge: buy_yes or buy_no
+    sentiment: str
+    confidence: float
+    floor_price: float
+    target_price: float
+    fair_yes_probability: float  # From the floor's distance to the target and time left
+    implied_yes_probability: float  # From the market's share totals
+    volume_eth: float
+    resolves_in_seconds: int
+
+
+class TopOpportunitiesResponse(Model):
+    """Top markets, best first"""
+    opportunities: List[Opportunity]
+    market_count: int  # Open markets currently ranked
+    updated_at: Optional[str]  # Last full refresh of the ranking
+    timestamp: str
+    error: Optional[str] = None
+
+
+# Prometheus metrics endpoint (0 disables)
+METRICS_PORT = int(os.getenv("MARKET_ANALYST_METRICS_PORT", "9101"))
+
+# Analysis results are reused while the market's trade count and floor price bucket are unchanged
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", "60"))
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", "2048"))
+ANALYSIS_PRICE_BUCKET = float(os.getenv("ANALYSIS_PRICE_BUCKET", "0.005"))  # Relative bucket width
+
+analysis_cache = VersionedCache("analysis", ANALYSIS_CACHE_TTL, ANALYSIS_CACHE_SIZE)
+
+# Open market ranking for TopOpportunitiesRequest, rebuilt in the background
+OPPORTUNITY_REFRESH = float(os.getenv("OPPORTUNITY_REFRESH", "60"))  # 0 disables
+OPPORTUNITY_MARKET_LIMIT = int(os.getenv("OPPORTUNITY_MARKET_LIMIT", "1000"))
+OPPORTUNITY_MAX_RESULTS = int(os.getenv("OPPORTUNITY_MAX_RESULTS", "50"))
+OPPORTUNITY_OPENSEA_SHARE = float(os.getenv("OPPORTUNITY_OPENSEA_SHARE", "0.25"))  # Of the OpenSea rate limit, spent on refreshes
+
+opportunities: Ranking[Opportunity] = Ranking()
+opportunities_updated_at: Optional[datetime] = None
+opportunity_cursor = 0  # Where the next refresh resumes among collections needing an OpenSea fetch
 
+# Bounded handler concurrency (see common/workpool.py)
+pool = workpool.WorkPool("market_analyst")
 
-# Create Agent
-agent = Agent(
-    name="mcg_market_analyst",
-    seed=os.getenv("MARKET_ANALYST_SEED", "market_analyst_default_seed"),
-    port=int(os.getenv("MARKET_ANALYST_PORT", "8001")),
-    endpoint=[f"http://localhost:{os.getenv('MARKET_ANALYST_PORT', '8001')}/submit"]
-)
+# Warm restart state (see common/checkpoint.py)
+checkpoints = checkpoint.Checkpointer("market_analyst")
 
-logger.info(f"✅ Market Analyst Agent initialized")
-logger.info(f"📡 Agent Address: {agent.address}")
 
 
 # Helper Functions
-async def fetch_floor_price(collection_slug: str) -> float:
-    """Fetch current floor price from OpenSea"""
-    try:
-        url = f"https://api.opensea.io/api/v2/collections/{collection_slug}/stats"
-        headers = {}
-        
-        api_key = os.getenv("OPENSEA_API_KEY")
-        if api_key:
-            headers["X-API-KEY"] = api_key
-        
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
-        floor_price = data.get('total', {}).get('floor_price', 0)
-        
-        return float(floor_price) if floor_price else 0.0
-        
-    except Exception as e:
-        logger.error(f"Failed to fetch floor price: {e}")
-        return 0.0
+async def fetch_floor_price(collection_slug: str, priority: Priority = Priority.USER) -> Fetched[Optional[float]]:
+    """Fetch current floor price, preferring the oracle's shared price board"""
+    entry = priceboard.board.read(collection_slug, max_age=priceboard.PRICE_BOARD_MAX_AGE)
+    if entry is not None:
+        return Fetched(value=entry.price, age=entry.age)
+    
+    return await opensea.get_floor_price(collection_slug, priority)
 
 
-async def fetch_market_data(market_address: str) -> Dict:
+async def fetch_market_data(market_address: str) -> Fetched[Optional[Market]]:
     """Fetch market data from GraphQL indexer"""
     query = """
     query GetMarket($id: ID!) {
         Market(where: {id: {_eq: $id}}) {
+            collectionSlug
             yesSharesTotal
             noSharesTotal
             totalVolume
             totalTrades
             targetPrice
+            resolutionTimestamp
             status
         }
     }
     """
     
-    try:
-        endpoint = os.getenv("GRAPHQL_ENDPOINT", "http://localhost:8080/v1/graphql")
-        response = requests.post(
-            endpoint,
-            json={
-                "query": query,
-                "variables": {"id": market_address.lower()}
-            },
-            timeout=10
-        )
-        
-        data = response.json()
-        markets = data.get('data', {}).get('Market', [])
-        
-        return markets[0] if markets else {}
-        
-    except Exception as e:
-        logger.error(f"Failed to fetch market data: {e}")
-        return {}
+    result = await graphql.query(query, {"id": market_address.lower()})
+    markets = (result.value or {}).get('Market', [])
+    
+    return replace(result, value=Market.from_indexer(markets[0]) if markets else None)
 
 
-def analyze_sentiment(market_data: Dict) -> tuple:
-    """Analyze market sentiment based on share ratios"""
-    yes_shares = int(market_data.get('yesSharesTotal', 0))
-    no_shares = int(market_data.get('noSharesTotal', 0))
-    total_shares = yes_shares + no_shares
+async def fetch_trade_count(market_address: str) -> Fetched[Optional[int]]:
+    """Fetch only a market's trade count, for checking a cached analysis cheaply"""
+    query = """
+    query GetMarketTrades($id: ID!) {
+        Market(where: {id: {_eq: $id}}) {
+            totalTrades
+        }
+    }
+    """
+    
+    result = await graphql.query(query, {"id": market_address.lower()})
+    markets = (result.value or {}).get('Market', [])
+    
+    return replace(result, value=int(markets[0].get('totalTrades') or 0) if markets else None)
+
+
+async def quick_analysis_version(market_address: str, collection_slug: str) -> Optional[Fetched[tuple]]:
+    """
+    An analysis' cache version from the price board's floor and the market's
+    trade count alone, so a cache hit skips OpenSea and the full market
+    query. None when either input is unavailable or stale.
+    """
+    entry = priceboard.board.read(collection_slug, max_age=priceboard.PRICE_BOARD_MAX_AGE)
+    if entry is None:
+        return None
+    
+    trades = await fetch_trade_count(market_address)
+    if trades.stale or trades.value is None:
+        return None
     
-    if total_shares == 0:
-        return "neutral", 0.5, "hold"
+    return Fetched(value=(trades.value, price_bucket(entry.price)), age=max(entry.age, trades.age or 0.0))
+
+
+@dataclass(frozen=True)
+class SentimentParams:
+    """Tunable inputs of analyze_sentiment (see backtest/ for evaluating them)"""
+    bullish_threshold: float = 0.6  # YES share above this is bullish
+    bearish_threshold: float = 0.4  # YES share below this is bearish
+    base_confidence: float = 0.5
+    confidence_per_trade: float = 0.05
+    max_confidence: float = 0.95
+
+
+@dataclass(frozen=True)
+class PredictionParams:
+    """Tunable inputs of predict_price"""
+    bullish_move: float = 0.1  # Predicted rise at full confidence
+    bearish_move: float = 0.1  # Predicted fall at full confidence
+
+
+def analyze_sentiment(market: Market, params: SentimentParams = SentimentParams()) -> tuple:
+    """Analyze market sentiment based on share ratios"""
+    yes_percentage = market.yes_fraction
     
-    yes_percentage = yes_shares / total_shares
+    if yes_percentage is None:
+        return "neutral", params.base_confidence, "hold"
     
     # Determine sentiment
-    if yes_percentage > 0.6:
+    if yes_percentage > params.bullish_threshold:
         sentiment = "bullish"
         recommendation = "buy_yes"
-    elif yes_percentage < 0.4:
+    elif yes_percentage < params.bearish_threshold:
         sentiment = "bearish"
         recommendation = "buy_no"
     else:
         sentiment = "neutral"
         recommendation = "hold"
     
-    # Calculate confidence based on volume
-    volume = int(market_data.get('totalVolume', 0))
-    trades = int(market_data.get('totalTrades', 0))
-    
-    # Higher volume and trades = higher confidence
-    confidence = min(0.95, 0.5 + (trades * 0.05))
+    # Higher trade count = higher confidence
+    confidence = min(params.max_confidence, params.base_confidence + (market.total_trades * params.confidence_per_trade))
     
     return sentiment, confidence, recommendation
 
 
-def predict_price(floor_price: float, sentiment: str, confidence: float) -> Optional[float]:
+def predict_price(
+    floor_price: Optional[float],
+    sentiment: str,
+    confidence: float,
+    params: PredictionParams = PredictionParams()
+) -> Optional[float]:
     """Predict future price based on sentiment"""
-    if floor_price == 0:
+    if not floor_price:
         return None
     
     # Simple prediction model
     if sentiment == "bullish":
-        multiplier = 1.0 + (0.1 * confidence)  # Up to 10% increase
+        multiplier = 1.0 + (params.bullish_move * confidence)  # Up to 10% increase by default
     elif sentiment == "bearish":
-        multiplier = 1.0 - (0.1 * confidence)  # Up to 10% decrease
+        multiplier = 1.0 - (params.bearish_move * confidence)  # Up to 10% decrease by default
     else:
         multiplier = 1.0  # No change
     
     return floor_price * multiplier
 
 
+@dataclass(frozen=True)
+class OpportunityParams:
+    """Tunable inputs of score_opportunity"""
+    daily_volatility: float = 0.05     # Assumed floor volatility behind the fair YES probability
+    liquidity_reference: float = 10.0  # ETH volume treated as fully liquid
+    min_time: float = 3600.0           # Markets resolving sooner than this are hard to act on
+    horizon: float = 7 * 86400.0       # Edges resolving further out than this are discounted
+    sentiment_weight: float = 0.5      # Bonus (or penalty) when crowd sentiment agrees (or not)
+
+
+def fair_yes_probability(floor_price: float, target_price: float, seconds_left: float, daily_volatility: float) -> float:
+    """Chance the floor ends above target, treating it as a driftless log-normal walk"""
+    days = max(seconds_left, 60.0) / 86400
+    z = math.log(floor_price / target_price) / (daily_volatility * math.sqrt(days))
+    return 0.5 * (1.0 + math.erf(z / math.sqrt(2)))
+
+
+def score_opportunity(
+    market_address: str,
+    market: Market,
+    floor_price: Optional[float],
+    now: float,
+    params: OpportunityParams = OpportunityParams()
+) -> Optional[Opportunity]:
+    """Score an open market by mispricing, sentiment, liquidity and time left; None if unscorable"""
+    target_price = market.target_price_eth
+    seconds_left = market.resolution_timestamp - now
+    if not floor_price or target_price <= 0 or seconds_left <= 0:
+        return None
+    
+    implied_yes = market.yes_fraction
+    if implied_yes is None:
+        implied_yes = 0.5
+    fair_yes = fair_yes_probability(floor_price, target_price, seconds_left, params.daily_volatility)
+    mispricing = fair_yes - implied_yes
+    
+    sentiment, confidence, _ = analyze_sentiment(market)
+    recommendation = "buy_yes" if mispricing > 0 else "buy_no"
+    agrees = (sentiment, recommendation) in (("bullish", "buy_yes"), ("bearish", "buy_no"))
+    disagrees = (sentiment, recommendation) in (("bullish", "buy_no"), ("bearish", "buy_yes"))
+    
+    volume = market.total_volume_eth
+    liquidity = min(1.0, math.log1p(volume) / math.log1p(params.liquidity_reference))
+    timing = min(1.0, seconds_left / params.min_time) * min(1.0, params.horizon / seconds_left)
+    conviction = 1.0 + params.sentiment_weight * confidence * (agrees - disagrees)
+    
+    return Opportunity(
+        market_address=market_address,
+        collection_slug=market.collection_slug,
+        score=abs(mispricing) * (0.5 + 0.5 * liquidity) * timing * conviction,
+        recommendation=recommendation,
+        sentiment=sentiment,
+        confidence=confidence,
+        floor_price=floor_price,
+        target_price=target_price,
+        fair_yes_probability=fair_yes,
+        implied_yes_probability=implied_yes,
+        volume_eth=volume,
+        resolves_in_seconds=int(seconds_left)
+    )
+
+
+def rank_market(market_address: str, market: Market, floor_price: Optional[float]):
+    """Insert, move or drop one market in the opportunity ranking"""
+    key = market_address.lower()
+    opportunity = None
+    if market.status == 'Open':
+        opportunity = score_opportunity(key, market, floor_price, time.time())
+    
+    if opportunity is None:
+        opportunities.remove(key)
+    else:
+        opportunities.update(key, opportunity.score, opportunity)
+
+
 def generate_reasoning(
     floor_price: float,
-    market_data: Dict,
+    market: Market,
     sentiment: str,
     confidence: float
 ) -> List[str]:
@@ -196,23 +348,16 @@ def generate_reasoning(
     reasoning.append(f"Current floor price: {floor_price:.4f} ETH")
     
     # Market activity
-    yes_shares = int(market_data.get('yesSharesTotal', 0))
-    no_shares = int(market_data.get('noSharesTotal', 0))
-    total_shares = yes_shares + no_shares
-    
-    if total_shares > 0:
-        yes_pct = (yes_shares / total_shares) * 100
-        reasoning.append(f"Market sentiment: {yes_pct:.1f}% bullish")
+    if market.yes_fraction is not None:
+        reasoning.append(f"Market sentiment: {market.yes_fraction * 100:.1f}% bullish")
     else:
         reasoning.append("No trading activity yet")
     
     # Volume
-    volume = int(market_data.get('totalVolume', 0)) / 1e18
-    reasoning.append(f"Total volume: {volume:.2f} ETH")
+    reasoning.append(f"Total volume: {market.total_volume_eth:.2f} ETH")
     
     # Trades
-    trades = int(market_data.get('totalTrades', 0))
-    reasoning.append(f"Number of trades: {trades}")
+    reasoning.append(f"Number of trades: {market.total_trades}")
     
     # Confidence
     reasoning.append(f"Analysis confidence: {confidence*100:.0f}%")
@@ -223,33 +368,105 @@ def generate_reasoning(
     return reasoning
 
 
+def price_bucket(floor_price: Optional[float]) -> Optional[int]:
+    """Log-scale bucket of a floor price; moves within one bucket keep a cached analysis valid"""
+    if not floor_price or floor_price <= 0:
+        return None
+    return math.floor(math.log(floor_price) / math.log1p(ANALYSIS_PRICE_BUCKET))
+
+
+def describe_staleness(floor: Fetched, market: Fetched) -> List[str]:
+    """Explain degraded inputs so callers are not misled by fallback values"""
+    notes = []
+    
+    if floor.value is None:
+        notes.append(f"⚠️ Floor price unavailable ({floor.error or 'no floor'}) - no price prediction")
+    elif floor.stale:
+        notes.append(f"⚠️ Floor price is {floor.age:.0f}s old (OpenSea degraded)")
+    
+    if market.stale:
+        if market.value:
+            notes.append(f"⚠️ Market data is {market.age:.0f}s old (indexer degraded)")
+        else:
+            notes.append(f"⚠️ Market data unavailable ({market.error})")
+    
+    return notes
+
+
+async def shed_analysis_request(ctx: Context, sender: str, msg: AnalyzeMarketRequest):
+    """Tell the caller its analysis request was not admitted"""
+    await ctx.send(sender, MarketAnalysisResponse(
+        market_address=msg.market_address,
+        collection_slug=msg.collection_slug,
+        current_floor_price=0.0,
+        predicted_price=None,
+        confidence=0.0,
+        sentiment="unknown",
+        recommendation="hold",
+        reasoning=[],
+        timestamp=datetime.utcnow().isoformat(),
+        error=workpool.OVERLOADED
+    ))
+
+
 # Event Handlers
-@agent.on_event("startup")
 async def startup(ctx: Context):
     """Initialize agent on startup"""
     ctx.logger.info(f"📊 Market Analyst Agent starting...")
+    agent = get_agent()
     ctx.logger.info(f"📡 Address: {agent.address}")
     
+    metrics.start_server(METRICS_PORT)
+    
     # Fund agent if needed (testnet only)
     try:
+        from uagents.setup import fund_agent_if_low
         await fund_agent_if_low(agent.wallet.address())
         ctx.logger.info("✅ Agent funded")
     except:
         ctx.logger.warning("⚠️ Could not fund agent (requires testnet)")
 
 
-@agent.on_message(model=AnalyzeMarketRequest)
+@metrics.timed("market_analyst")
 async def handle_analysis_request(ctx: Context, sender: str, msg: AnalyzeMarketRequest):
     """Handle market analysis requests"""
     ctx.logger.info(f"📥 Analysis request for {msg.collection_slug} from {sender[:8]}...")
     
     try:
+        # Reuse the last analysis if its inputs have not meaningfully changed
+        cache_key = (msg.market_address.lower(), msg.collection_slug, msg.include_prediction)
+        quick = await quick_analysis_version(msg.market_address, msg.collection_slug)
+        cached = analysis_cache.get(cache_key, quick.value) if quick else None
+        if cached is not None:
+            await ctx.send(sender, cached.copy(update={
+                "timestamp": datetime.utcnow().isoformat(),
+                "data_age_seconds": quick.age
+            }))
+            ctx.logger.info(f"✅ Analysis sent from cache: {cached.sentiment}")
+            return
+        
         # Fetch data
         ctx.logger.info("📡 Fetching floor price from OpenSea...")
-        floor_price = await fetch_floor_price(msg.collection_slug)
+        floor = await fetch_floor_price(msg.collection_slug)
+        floor_price = floor.value or 0.0
         
         ctx.logger.info("📡 Fetching market data from indexer...")
-        market_data = await fetch_market_data(msg.market_address)
+        market = await fetch_market_data(msg.market_address)
+        market_data = market.value or Market()
+        
+        version = (market_data.total_trades, price_bucket(floor.value))
+        cacheable = not (floor.stale or market.stale)
+        ages = [f.age for f in (floor, market) if f.age is not None]
+        
+        # Without a board price the cache could not be checked above
+        cached = analysis_cache.get(cache_key, version) if cacheable and quick is None else None
+        if cached is not None:
+            await ctx.send(sender, cached.copy(update={
+                "timestamp": datetime.utcnow().isoformat(),
+                "data_age_seconds": max(ages) if ages else None
+            }))
+            ctx.logger.info(f"✅ Analysis sent from cache: {cached.sentiment}")
+            return
         
         # Analyze
         ctx.logger.info("🧠 Analyzing market sentiment...")
@@ -258,10 +475,11 @@ async def handle_analysis_request(ctx: Context, sender: str, msg: AnalyzeMarketR
         # Predict
         predicted_price = None
         if msg.include_prediction:
-            predicted_price = predict_price(floor_price, sentiment, confidence)
+            predicted_price = predict_price(floor.value, sentiment, confidence)
         
         # Generate reasoning
         reasoning = generate_reasoning(floor_price, market_data, sentiment, confidence)
+        reasoning.extend(describe_staleness(floor, market))
         
         # Create response
         response = MarketAnalysisResponse(
@@ -273,8 +491,17 @@ async def handle_analysis_request(ctx: Context, sender: str, msg: AnalyzeMarketR
             sentiment=sentiment,
             recommendation=recommendation,
             reasoning=reasoning,
-            timestamp=datetime.utcnow().isoformat()
+            timestamp=datetime.utcnow().isoformat(),
+            data_stale=floor.stale or market.stale,
+            data_age_seconds=max(ages) if ages else None
         )
+        if cacheable:
+            analysis_cache.put(cache_key, version, response)
+            # Fresh inputs for a ranked market: move it now rather than at the next refresh.
+            # Only when the request names the market's own collection, so callers cannot
+            # rank a market against another collection's floor
+            if msg.market_address.lower() in opportunities and market_data.collection_slug == msg.collection_slug:
+                rank_market(msg.market_address, market_data, floor.value)
         
         # Send response
         await ctx.send(sender, response)
@@ -284,7 +511,7 @@ async def handle_analysis_request(ctx: Context, sender: str, msg: AnalyzeMarketR
         ctx.logger.error(f"❌ Analysis failed: {e}")
 
 
-@agent.on_interval(period=300.0)
+@metrics.timed("market_analyst")
 async def periodic_scan(ctx: Context):
     """Scan markets every 5 minutes"""
     ctx.logger.info("🔄 Running periodic market scan...")
@@ -300,30 +527,181 @@ async def periodic_scan(ctx: Context):
         }
         """
         
-        endpoint = os.getenv("GRAPHQL_ENDPOINT", "http://localhost:8080/v1/graphql")
-        response = requests.post(
-            endpoint,
-            json={"query": query},
-            timeout=10
-        )
+        result = await graphql.query(query)
+        if result.value is None:
+            ctx.logger.error(f"Scan failed: {result.error}")
+            return
         
-        data = response.json()
-        markets = data.get('data', {}).get('Market', [])
+        markets = records.markets(result.value.get('Market', []))
         
         ctx.logger.info(f"📊 Found {len(markets)} active markets")
         
         # Log floor prices
         for market in markets[:3]:  # Top 3 only
-            floor_price = await fetch_floor_price(market['collectionSlug'])
-            if floor_price > 0:
-                ctx.logger.info(f"💰 {market['collectionSlug']}: {floor_price:.4f} ETH")
+            floor = await fetch_floor_price(market.collection_slug, Priority.BACKGROUND)
+            if floor.value:
+                ctx.logger.info(f"💰 {market.collection_slug}: {floor.value:.4f} ETH")
         
     except Exception as e:
         ctx.logger.error(f"Scan failed: {e}")
 
 
+@metrics.timed("market_analyst")
+async def handle_top_opportunities(ctx: Context, sender: str, msg: TopOpportunitiesRequest):
+    """Answer from the precomputed ranking; no upstream calls"""
+    limit = max(1, min(msg.limit, OPPORTUNITY_MAX_RESULTS))
+    top = opportunities.top(limit)
+    
+    await ctx.send(sender, TopOpportunitiesResponse(
+        opportunities=[opportunity for _, opportunity in top],
+        market_count=len(opportunities),
+        updated_at=opportunities_updated_at.isoformat() if opportunities_updated_at else None,
+        timestamp=datetime.utcnow().isoformat(),
+        error=None if opportunities_updated_at else "Ranking not built yet - retry shortly"
+    ))
+    ctx.logger.info(f"🏆 Sent top {len(top)} opportunities to {sender[:8]}...")
+
+
+@metrics.timed("market_analyst")
+async def opportunity_floors(slugs: List[str]) -> Dict[str, Optional[float]]:
+    """
+    Floor prices for a ranking refresh, within OPPORTUNITY_OPENSEA_SHARE of the OpenSea rate limit.
+    
+    The price board and the OpenSea cache are read first. Collections on
+    neither, or only stale in the cache, take turns at OpenSea across
+    refreshes; until their turn they rank on the stale value or none.
+    """
+    global opportunity_cursor
+    
+    floors: Dict[str, Optional[float]] = {}
+    due = []
+    for slug in slugs:
+        entry = priceboard.board.read(slug, max_age=priceboard.PRICE_BOARD_MAX_AGE)
+        if entry is not None:
+            floors[slug] = entry.price
+            continue
+        cached = opensea.floor_cache.peek(slug)
+        if cached is not None:
+            floors[slug] = cached.value
+        if cached is None or cached.stale:
+            due.append(slug)
+    
+    budget = max(1, int(OPPORTUNITY_REFRESH * opensea.scheduler.max_rate * OPPORTUNITY_OPENSEA_SHARE))
+    turn = min(len(due), budget)
+    if turn:
+        start = opportunity_cursor % len(due)
+        opportunity_cursor = start + turn
+        batch = (due[start:] + due[:start])[:turn]
+        fetched = await asyncio.gather(*[opensea.get_floor_price(slug, Priority.BACKGROUND) for slug in batch])
+        for slug, floor in zip(batch, fetched):
+            floors[slug] = floor.value
+    
+    return floors
+
+
+async def refresh_opportunities(ctx: Context):
+    """Re-score every open market and drop closed ones from the ranking"""
+    global opportunities_updated_at
+    
+    query = """
+    query GetOpenMarkets($limit: Int!) {
+        Market(where: {status: {_eq: "Open"}}, limit: $limit) {
+            marketAddress
+            collectionSlug
+            targetPrice
+            resolutionTimestamp
+            yesSharesTotal
+            noSharesTotal
+            totalVolume
+            totalTrades
+        }
+    }
+    """
+    
+    try:
+        result = await graphql.query(query, {"limit": OPPORTUNITY_MARKET_LIMIT})
+        if result.value is None:
+            ctx.logger.error(f"Opportunity refresh failed: {result.error}")
+            return
+        
+        markets = records.markets(result.value.get('Market', []))
+        slugs = sorted({m.collection_slug for m in markets})
+        floor_by_slug = await opportunity_floors(slugs)
+        
+        open_markets = set()
+        for market in markets:
+            key = market.market_address.lower()
+            open_markets.add(key)
+            rank_market(key, market, floor_by_slug.get(market.collection_slug))
+        
+        for key in opportunities.keys():
+            if key not in open_markets:
+                opportunities.remove(key)
+        
+        opportunities_updated_at = datetime.utcnow()
+        ctx.logger.info(f"🏆 Ranked {len(opportunities)} of {len(markets)} open markets")
+        
+    except Exception as e:
+        ctx.logger.error(f"Opportunity refresh failed: {e}")
+
+
+# Agent Factory
+_agent: Optional[Agent] = None
+
+
+def create_agent() -> Agent:
+    """Build the agent and register its handlers"""
+    agent = Agent(
+        name="mcg_market_analyst",
+        seed=os.getenv("MARKET_ANALYST_SEED", "market_analyst_default_seed"),
+        port=int(os.getenv("MARKET_ANALYST_PORT", "8001")),
+        endpoint=[f"http://localhost:{os.getenv('MARKET_ANALYST_PORT', '8001')}/submit"],
+        resolve=addressbook.resolver_from_env()
+    )
+    
+    # Restore checkpointed state before anything else runs
+    checkpoints.register("opensea.floor_cache", opensea.floor_cache.snapshot, opensea.floor_cache.restore)
+    checkpoints.register("opensea.scheduler", opensea.scheduler.snapshot, opensea.scheduler.restore)
+    checkpoints.register("graphql.cache", graphql.cache.snapshot, graphql.cache.restore)
+    checkpoints.attach(agent)
+    
+    agent.on_event("startup")(startup)
+    pool.lane("analysis", concurrency=8, max_queue=32)
+    agent.on_message(model=AnalyzeMarketRequest)(
+        pool.message("analysis", handle_analysis_request, shed_analysis_request)
+    )
+    agent.on_interval(period=300.0)(pool.interval(periodic_scan))
+    # Served from precomputed state, so it needs no lane
+    agent.on_message(model=TopOpportunitiesRequest)(handle_top_opportunities)
+    if OPPORTUNITY_REFRESH > 0:
+        agent.on_interval(period=OPPORTUNITY_REFRESH)(pool.interval(refresh_opportunities))
+    
+    # Runtime profiling control (see common/profiling.py)
+    profiling.register_control(agent)
+    
+    logger.info(f"✅ Market Analyst Agent initialized")
+    logger.info(f"📡 Agent Address: {agent.address}")
+    return agent
+
+
+def get_agent() -> Agent:
+    """The agent for this process, created on first use"""
+    global _agent
+    if _agent is None:
+        _agent = create_agent()
+    return _agent
+
+
+def __getattr__(name: str):
+    # `from market_analyst import agent` still works, but only builds the agent when asked
+    if name == "agent":
+        return get_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 # Main entry point
 if __name__ == "__main__":
+    logs.configure()
     logger.info("🚀 Starting Market Analyst Agent...")
-    agent.run()
+    get_agent().run()
 
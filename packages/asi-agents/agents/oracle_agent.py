@@ -5,14 +5,22 @@ Provides verified NFT floor price data for market resolution
 """
 
 import os
+import time
+import math
+import asyncio
 import logging
-from typing import Optional, List
+from dataclasses import asdict, dataclass
+from decimal import Decimal
+from functools import lru_cache
+from typing import Optional, List, Dict
 from datetime import datetime
 from statistics import median
 
 from uagents import Agent, Context, Model
-from uagents.setup import fund_agent_if_low
-import requests
+
+from common import addressbook, checkpoint, graphql, logs, metrics, opensea, priceboard, profiling, records, workpool
+from common.records import Market
+from common.scheduler import Priority
 
 # Setup logging
 logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
@@ -33,50 +41,207 @@ class PriceResponse(Model):
     sources: List[str]
     confidence: float
     timestamp: str
+    error: Optional[str] = None
+
+
+class BatchPriceRequest(Model):
+    """Request price data for many collections in one message"""
+    collection_slugs: List[str]
+    max_age: float = 300.0  # Serve cached prices younger than this (seconds)
+
+
+class BatchPriceResult(Model):
+    """Per-collection entry of a batch price response"""
+    collection_slug: str
+    floor_price: Optional[float]
+    confidence: float
+    source_count: int
+    age_seconds: Optional[float]
+    stale: bool
+    error: Optional[str] = None
+
+
+class BatchPriceResponse(Model):
+    """Aggregated price data for a batch of collections"""
+    results: List[BatchPriceResult]
+    timestamp: str
+
+
+class PriceSubscribe(Model):
+    """Subscribe to pushed price updates for a collection"""
+    collection_slug: str
+    threshold: Optional[float] = None  # Relative move that triggers a push
+    heartbeat: Optional[float] = None  # Max seconds between pushes
+    max_age: float = 300.0  # The first push reuses a cached price only if younger than this (seconds)
+
+
+class PriceUnsubscribe(Model):
+    """Stop pushed price updates for a collection"""
+    collection_slug: str
+
+
+# Subscription Configuration
+PUSH_THRESHOLD = float(os.getenv("ORACLE_PUSH_THRESHOLD", "0.01"))  # 1% move
+PUSH_HEARTBEAT = float(os.getenv("ORACLE_PUSH_HEARTBEAT", "600"))  # 10 minutes
+REFRESH_PERIOD = float(os.getenv("ORACLE_REFRESH_PERIOD", "60"))  # 1 minute
+
+# Batch Configuration
+BATCH_CONCURRENCY = int(os.getenv("ORACLE_BATCH_CONCURRENCY", "8"))
+
+
+@dataclass
+class Subscription:
+    """Push state for a single subscriber"""
+    threshold: float
+    heartbeat: float
+    last_price: Optional[float] = None
+    last_sent: float = 0.0
+
+
+# Subscription registry: collection slug -> subscriber address -> Subscription
+subscriptions: Dict[str, Dict[str, Subscription]] = {}
+
+@dataclass
+class CachedPrice:
+    """Latest aggregated price and when it was fetched"""
+    response: PriceResponse
+    fetched_at: float
+    
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
 
+# Latest aggregated price per collection
+latest_prices: Dict[str, CachedPrice] = {}
 
-# Create Agent
-agent = Agent(
-    name="mcg_oracle",
-    seed=os.getenv("ORACLE_SEED", "oracle_default_seed"),
-    port=int(os.getenv("ORACLE_PORT", "8004")),
-    endpoint=[f"http://localhost:{os.getenv('ORACLE_PORT', '8004')}/submit"]
+
+# Monitoring Configuration
+MONITOR_MIN_INTERVAL = float(os.getenv("ORACLE_MONITOR_MIN_INTERVAL", "60"))  # Most urgent collections
+MONITOR_MAX_INTERVAL = float(os.getenv("ORACLE_MONITOR_MAX_INTERVAL", "1800"))  # Idle collections
+MONITOR_HORIZON = float(os.getenv("ORACLE_MONITOR_HORIZON", "86400"))  # Resolutions further out add no urgency
+MONITOR_FAST_MOVE = float(os.getenv("ORACLE_MONITOR_FAST_MOVE", "0.02"))  # Relative move between polls
+MONITOR_TICK = float(os.getenv("ORACLE_MONITOR_TICK", "30"))
+MONITOR_MAX_PER_TICK = int(os.getenv("ORACLE_MONITOR_MAX_PER_TICK", "10"))
+MONITOR_SET_REFRESH = float(os.getenv("ORACLE_MONITOR_SET_REFRESH", "300"))
+MONITOR_MARKET_LIMIT = int(os.getenv("ORACLE_MONITOR_MARKET_LIMIT", "1000"))
+
+
+@dataclass
+class MonitoredCollection:
+    """Polling state for a collection referenced by open markets"""
+    slug: str
+    total_volume: int = 0  # Wei, summed over open markets
+    open_markets: int = 0
+    next_resolution: Optional[float] = None  # Earliest resolution timestamp
+    interval: float = MONITOR_MAX_INTERVAL
+    last_polled: float = 0.0
+    last_price: Optional[float] = None
+    moving: bool = False
+
+
+# Monitoring set: collection slug -> MonitoredCollection, rebuilt from the indexer
+monitored: Dict[str, MonitoredCollection] = {}
+
+
+# On-chain Publishing Configuration (disabled unless both are set)
+FLOOR_ORACLE_ADDRESS = os.getenv("NFT_FLOOR_ORACLE_ADDRESS", "")
+REPORTER_PRIVATE_KEY = os.getenv("ORACLE_REPORTER_PRIVATE_KEY", "")
+PUBLISH_DEVIATION = float(os.getenv("ORACLE_PUBLISH_DEVIATION", "0.005"))  # 0.5% from the on-chain value
+PUBLISH_MARGIN = float(os.getenv("ORACLE_PUBLISH_MARGIN", "300"))  # Refresh this long before on-chain prices go stale
+PUBLISH_INTERVAL = float(os.getenv("ORACLE_PUBLISH_INTERVAL", "30"))
+PUBLISH_TX_TIMEOUT = float(os.getenv("ORACLE_PUBLISH_TX_TIMEOUT", "300"))  # Give up on an unmined publish after this
+
+FLOOR_ORACLE_ABI = [
+    {
+        "inputs": [
+            {"name": "collectionSlug", "type": "string"},
+            {"name": "priceWei", "type": "uint256"}
+        ],
+        "name": "setFloorPrice",
+        "outputs": [],
+        "stateMutability": "nonpayable",
+        "type": "function"
+    },
+    {
+        "inputs": [{"name": "collectionSlug", "type": "string"}],
+        "name": "getFloorPrice",
+        "outputs": [
+            {"name": "price", "type": "uint256"},
+            {"name": "timestamp", "type": "uint256"},
+            {"name": "isValid", "type": "bool"}
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [],
+        "name": "stalenessThreshold",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
+
+
+@dataclass
+class OnchainPrice:
+    """Last known NftFloorOracle value for a collection"""
+    price_wei: int
+    updated_at: float  # 0 if never set
+
+
+@dataclass
+class PendingPublish:
+    """A setFloorPrice transaction sent but not yet mined"""
+    tx_hash: str
+    nonce: int
+    price_wei: int
+    sent_at: float
+
+
+# Latest aggregated price per collection waiting to be considered for publishing
+publish_queue: Dict[str, int] = {}
+
+# On-chain state as last read or optimistically written
+onchain_prices: Dict[str, OnchainPrice] = {}
+
+# At most one unmined publish per collection
+inflight_publishes: Dict[str, PendingPublish] = {}
+
+publish_outcomes = metrics.registry.counter(
+    "mcg_oracle_publishes_total", "setFloorPrice decisions by outcome (sent, confirmed, reverted, failed, dropped)"
 )
 
-logger.info(f"✅ Oracle Agent initialized")
-logger.info(f"📡 Agent Address: {agent.address}")
+
+# Prometheus metrics endpoint (0 disables)
+METRICS_PORT = int(os.getenv("ORACLE_METRICS_PORT", "9104"))
+
+# Bounded handler concurrency (see common/workpool.py)
+pool = workpool.WorkPool("oracle")
+
+# Warm restart state (see common/checkpoint.py)
+checkpoints = checkpoint.Checkpointer("oracle")
+
 
 
 # Helper Functions
-async def fetch_opensea_price(collection_slug: str) -> Optional[float]:
+async def fetch_opensea_price(collection_slug: str, priority: Priority = Priority.USER) -> Optional[float]:
     """Fetch price from OpenSea"""
     try:
-        url = f"https://api.opensea.io/api/v2/collections/{collection_slug}/stats"
-        headers = {}
-        
-        api_key = os.getenv("OPENSEA_API_KEY")
-        if api_key:
-            headers["X-API-KEY"] = api_key
-        
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
-        floor_price = data.get('total', {}).get('floor_price', 0)
-        
-        return float(floor_price) if floor_price else None
+        return await opensea.fetch_floor_price(collection_slug, priority)
         
     except Exception as e:
         logger.error(f"OpenSea fetch failed: {e}")
         return None
 
 
-async def fetch_multi_source_prices(collection_slug: str) -> List[float]:
+async def fetch_multi_source_prices(collection_slug: str, priority: Priority = Priority.USER) -> List[float]:
     """Fetch prices from multiple sources"""
     prices = []
     
     # Source 1: OpenSea
-    opensea_price = await fetch_opensea_price(collection_slug)
+    opensea_price = await fetch_opensea_price(collection_slug, priority)
     if opensea_price:
         prices.append(opensea_price)
         logger.info(f"  OpenSea: {opensea_price:.4f} ETH")
@@ -120,22 +285,365 @@ def calculate_confidence(prices: List[float]) -> float:
     return confidence
 
 
+async def aggregate_price(collection_slug: str, priority: Priority = Priority.USER) -> Optional[PriceResponse]:
+    """Fetch and aggregate the price for a collection"""
+    prices = await fetch_multi_source_prices(collection_slug, priority)
+    
+    if not prices:
+        return None
+    
+    # Aggregate prices (use median for outlier resistance)
+    if len(prices) > 1:
+        aggregated_price = median(prices)
+    else:
+        aggregated_price = prices[0]
+    
+    response = PriceResponse(
+        collection_slug=collection_slug,
+        floor_price=aggregated_price,
+        source_count=len(prices),
+        sources=["OpenSea"],  # Expand as more sources are added
+        confidence=calculate_confidence(prices),
+        timestamp=datetime.utcnow().isoformat()
+    )
+    latest_prices[collection_slug] = CachedPrice(response=response, fetched_at=time.time())
+    
+    # Share with co-located agents (see common/priceboard.py)
+    priceboard.board.publish(collection_slug, aggregated_price, response.confidence, response.source_count)
+    
+    # Coalesce: only the newest price per collection is considered for the chain
+    if publishing_enabled():
+        publish_queue[collection_slug] = to_wei(aggregated_price)
+    
+    return response
+
+
+def monitor_interval(collection: MonitoredCollection, max_volume: int, now: float) -> float:
+    """Polling interval from time to resolution, share of volume and recent movement"""
+    if collection.next_resolution is None:
+        time_weight = 0.0
+    else:
+        remaining = collection.next_resolution - now
+        time_weight = 1.0 if remaining <= 0 else max(0.0, 1.0 - remaining / MONITOR_HORIZON)
+    
+    volume_weight = 0.0
+    if max_volume > 0 and collection.total_volume > 0:
+        volume_weight = math.sqrt(collection.total_volume / max_volume)
+    
+    weight = min(1.0, time_weight + 0.5 * volume_weight)
+    if collection.moving:
+        weight = max(weight, 0.75)
+    
+    # Geometric interpolation: weight 0 -> max interval, weight 1 -> min interval
+    return MONITOR_MAX_INTERVAL * (MONITOR_MIN_INTERVAL / MONITOR_MAX_INTERVAL) ** weight
+
+
+def update_intervals(now: float):
+    """Recompute every collection's polling interval"""
+    max_volume = max((c.total_volume for c in monitored.values()), default=0)
+    for collection in monitored.values():
+        collection.interval = monitor_interval(collection, max_volume, now)
+
+
+def due_collections(now: float) -> List[MonitoredCollection]:
+    """Collections due for a poll, most overdue (relative to their interval) first"""
+    due = [c for c in monitored.values() if now - c.last_polled >= c.interval]
+    due.sort(key=lambda c: (now - c.last_polled) / c.interval, reverse=True)
+    return due
+
+
+async def fetch_open_markets() -> Optional[List[Market]]:
+    """Fetch open markets with the fields that drive monitoring priority"""
+    query = """
+    query GetMonitoredMarkets($limit: Int!) {
+        Market(where: {status: {_eq: "Open"}}, limit: $limit) {
+            collectionSlug
+            totalVolume
+            resolutionTimestamp
+        }
+    }
+    """
+    
+    result = await graphql.query(query, {"limit": MONITOR_MARKET_LIMIT})
+    if result.value is None:
+        logger.error(f"Failed to fetch open markets: {result.error}")
+        return None
+    
+    return records.markets(result.value.get('Market', []))
+
+
+def publishing_enabled() -> bool:
+    return bool(FLOOR_ORACLE_ADDRESS and REPORTER_PRIVATE_KEY)
+
+
+def to_wei(price_eth: float) -> int:
+    """Exact wei for a float ETH price (via its shortest decimal repr)"""
+    return int(Decimal(repr(price_eth)) * 10**18)
+
+
+@lru_cache(maxsize=None)
+def get_reporter():
+    """Reporter account, floor oracle contract and nonce tracker, created on first publish"""
+    from eth_account import Account
+    from common import rpc
+    
+    w3 = rpc.get_web3()
+    account = Account.from_key(REPORTER_PRIVATE_KEY)
+    contract = w3.eth.contract(address=w3.to_checksum_address(FLOOR_ORACLE_ADDRESS), abi=FLOOR_ORACLE_ABI)
+    logger.info(f"🔐 Reporter wallet: {account.address}")
+    return account, contract, rpc.NonceTracker(account.address)
+
+
+@lru_cache(maxsize=1)
+def onchain_staleness() -> float:
+    """NftFloorOracle.stalenessThreshold, read once"""
+    _, contract, _ = get_reporter()
+    return float(contract.functions.stalenessThreshold().call())
+
+
+async def read_onchain_price(collection_slug: str) -> OnchainPrice:
+    """On-chain value for a collection, read once and then tracked locally"""
+    known = onchain_prices.get(collection_slug)
+    if known is not None:
+        return known
+    
+    _, contract, _ = get_reporter()
+    price_wei, updated_at, _ = await asyncio.to_thread(contract.functions.getFloorPrice(collection_slug).call)
+    known = OnchainPrice(price_wei=price_wei, updated_at=float(updated_at))
+    onchain_prices[collection_slug] = known
+    return known
+
+
+def needs_publish(onchain: OnchainPrice, price_wei: int, staleness: float, now: float) -> bool:
+    """Publish on a meaningful deviation, or before the on-chain value goes stale"""
+    if onchain.updated_at == 0 or onchain.price_wei == 0:
+        return True
+    
+    if now >= onchain.updated_at + staleness - PUBLISH_MARGIN:
+        return True
+    
+    return abs(price_wei - onchain.price_wei) / onchain.price_wei >= PUBLISH_DEVIATION
+
+
+async def send_floor_price(collection_slug: str, price_wei: int) -> PendingPublish:
+    """Sign and broadcast setFloorPrice without waiting for it to be mined"""
+    account, contract, nonces = get_reporter()
+    nonce = await nonces.reserve()
+    
+    def send() -> str:
+        from common import rpc
+        
+        w3 = rpc.get_web3()
+        tx = contract.functions.setFloorPrice(collection_slug, price_wei).build_transaction({
+            'from': account.address,
+            'nonce': nonce
+        })
+        signed_tx = account.sign_transaction(tx)
+        return w3.eth.send_raw_transaction(signed_tx.rawTransaction).hex()
+    
+    try:
+        tx_hash = await asyncio.to_thread(send)
+    except Exception:
+        # The nonce may or may not have been consumed; ask the node next time
+        nonces.resync()
+        raise
+    
+    return PendingPublish(tx_hash=tx_hash, nonce=nonce, price_wei=price_wei, sent_at=time.time())
+
+
+async def settle_inflight_publishes(ctx: Context):
+    """Record mined publishes and give up on ones stuck past the timeout"""
+    from common import rpc
+    
+    w3 = rpc.get_web3()
+    now = time.time()
+    
+    for slug, pending in list(inflight_publishes.items()):
+        try:
+            receipt = await asyncio.to_thread(w3.eth.get_transaction_receipt, pending.tx_hash)
+        except Exception:
+            receipt = None  # Not mined yet (or not visible to this node)
+        
+        if receipt is not None:
+            del inflight_publishes[slug]
+            if receipt.status == 1:
+                publish_outcomes.inc(outcome="confirmed")
+            else:
+                # Forget the optimistic value so the next cycle re-reads the chain
+                onchain_prices.pop(slug, None)
+                publish_outcomes.inc(outcome="reverted")
+                ctx.logger.error(f"❌ setFloorPrice({slug}) reverted: {pending.tx_hash}")
+            continue
+        
+        if now - pending.sent_at > PUBLISH_TX_TIMEOUT:
+            del inflight_publishes[slug]
+            onchain_prices.pop(slug, None)
+            get_reporter()[2].resync()
+            publish_outcomes.inc(outcome="dropped")
+            ctx.logger.warning(f"⚠️ setFloorPrice({slug}) not mined after {PUBLISH_TX_TIMEOUT:.0f}s - will retry")
+
+
+def dump_monitored() -> List[Dict]:
+    """Monitoring schedule for checkpointing"""
+    return [asdict(collection) for collection in monitored.values()]
+
+
+def load_monitored(data: List[Dict]):
+    """Restore the monitoring schedule, keeping anything rebuilt since startup"""
+    for fields in data:
+        monitored.setdefault(fields["slug"], MonitoredCollection(**fields))
+
+
+def dump_latest_prices() -> Dict:
+    """Latest aggregated prices for checkpointing"""
+    return {
+        slug: {"response": cached.response.dict(), "fetched_at": cached.fetched_at}
+        for slug, cached in latest_prices.items()
+    }
+
+
+def load_latest_prices(data: Dict):
+    """Restore checkpointed prices, keeping any fetched since startup"""
+    for slug, entry in data.items():
+        latest_prices.setdefault(slug, CachedPrice(
+            response=PriceResponse(**entry["response"]),
+            fetched_at=entry["fetched_at"]
+        ))
+
+
+def dump_subscriptions() -> Dict:
+    """Subscriber push state for checkpointing"""
+    return {
+        slug: {address: asdict(subscription) for address, subscription in subscribers.items()}
+        for slug, subscribers in subscriptions.items()
+    }
+
+
+def load_subscriptions(data: Dict):
+    """Restore subscribers, keeping any that re-subscribed since startup"""
+    for slug, subscribers in data.items():
+        for address, fields in subscribers.items():
+            subscriptions.setdefault(slug, {}).setdefault(address, Subscription(**fields))
+
+
+def should_push(subscription: Subscription, price: float, now: float) -> bool:
+    """Decide whether a subscriber needs a new price push"""
+    if subscription.last_price is None:
+        return True
+    
+    if now - subscription.last_sent >= subscription.heartbeat:
+        return True
+    
+    if subscription.last_price == 0:
+        return price != 0
+    
+    move = abs(price - subscription.last_price) / subscription.last_price
+    return move > subscription.threshold
+
+
+async def resolve_batch_entry(
+    collection_slug: str,
+    max_age: float,
+    semaphore: asyncio.Semaphore
+) -> BatchPriceResult:
+    """Resolve one slug of a batch, serving from cache when fresh enough"""
+    cached = latest_prices.get(collection_slug)
+    
+    if cached is not None and cached.age <= max_age:
+        metrics.record_cache("oracle_prices", "hit")
+    else:
+        metrics.record_cache("oracle_prices", "miss")
+        async with semaphore:
+            try:
+                await aggregate_price(collection_slug)
+            except Exception as e:
+                logger.error(f"Batch fetch failed for {collection_slug}: {e}")
+        
+        # Fall back to the previous (stale) value if the refresh failed
+        cached = latest_prices.get(collection_slug, cached)
+    
+    if cached is None:
+        return BatchPriceResult(
+            collection_slug=collection_slug,
+            floor_price=None,
+            confidence=0.0,
+            source_count=0,
+            age_seconds=None,
+            stale=True,
+            error="No price data available"
+        )
+    
+    age = cached.age
+    return BatchPriceResult(
+        collection_slug=collection_slug,
+        floor_price=cached.response.floor_price,
+        confidence=cached.response.confidence,
+        source_count=cached.response.source_count,
+        age_seconds=round(age, 1),
+        stale=age > max_age
+    )
+
+
+async def push_price(ctx: Context, address: str, subscription: Subscription, response: PriceResponse):
+    """Send a price update to a subscriber and record what was sent"""
+    await ctx.send(address, response)
+    subscription.last_price = response.floor_price
+    subscription.last_sent = time.time()
+
+
+async def shed_price_request(ctx: Context, sender: str, msg):
+    """Tell the caller its price request (or subscription) was not admitted"""
+    await ctx.send(sender, PriceResponse(
+        collection_slug=msg.collection_slug,
+        floor_price=0.0,
+        source_count=0,
+        sources=[],
+        confidence=0.0,
+        timestamp=datetime.utcnow().isoformat(),
+        error=workpool.OVERLOADED
+    ))
+
+
+async def shed_batch_price_request(ctx: Context, sender: str, msg: BatchPriceRequest):
+    """Tell the caller its batch request was not admitted"""
+    results = [
+        BatchPriceResult(
+            collection_slug=slug,
+            floor_price=None,
+            confidence=0.0,
+            source_count=0,
+            age_seconds=None,
+            stale=False,
+            error=workpool.OVERLOADED
+        )
+        for slug in dict.fromkeys(msg.collection_slugs)
+    ]
+    await ctx.send(sender, BatchPriceResponse(results=results, timestamp=datetime.utcnow().isoformat()))
+
+
 # Event Handlers
-@agent.on_event("startup")
 async def startup(ctx: Context):
     """Initialize agent on startup"""
     ctx.logger.info(f"🔮 Oracle Agent starting...")
+    agent = get_agent()
     ctx.logger.info(f"📡 Address: {agent.address}")
     
+    metrics.start_server(METRICS_PORT)
+    priceboard.board.open_writer()
+    
+    if publishing_enabled():
+        ctx.logger.info(f"⛓️ Publishing floor prices to NftFloorOracle at {FLOOR_ORACLE_ADDRESS}")
+    
     # Fund agent if needed
     try:
+        from uagents.setup import fund_agent_if_low
         await fund_agent_if_low(agent.wallet.address())
         ctx.logger.info("✅ Agent funded")
     except:
         ctx.logger.warning("⚠️ Could not fund agent (requires testnet)")
 
 
-@agent.on_message(model=PriceRequest)
+@metrics.timed("oracle")
 async def handle_price_request(ctx: Context, sender: str, msg: PriceRequest):
     """Handle price requests"""
     ctx.logger.info(f"📥 Price request for {msg.collection_slug} from {sender[:8]}...")
@@ -143,63 +651,310 @@ async def handle_price_request(ctx: Context, sender: str, msg: PriceRequest):
     try:
         # Fetch from multiple sources
         ctx.logger.info("📡 Fetching prices from multiple sources...")
-        prices = await fetch_multi_source_prices(msg.collection_slug)
+        response = await aggregate_price(msg.collection_slug)
         
-        if not prices:
+        if response is None:
             ctx.logger.error("❌ No price data available")
             return
         
-        # Aggregate prices (use median for outlier resistance)
-        if len(prices) > 1:
-            aggregated_price = median(prices)
-        else:
-            aggregated_price = prices[0]
-        
-        # Calculate confidence
-        confidence = calculate_confidence(prices)
-        
-        # Create response
-        response = PriceResponse(
-            collection_slug=msg.collection_slug,
-            floor_price=aggregated_price,
-            source_count=len(prices),
-            sources=["OpenSea"],  # Expand as more sources are added
-            confidence=confidence,
+        # Send response
+        await ctx.send(sender, response)
+        ctx.logger.info(f"✅ Price: {response.floor_price:.4f} ETH (confidence: {response.confidence:.0%})")
+        
+    except Exception as e:
+        ctx.logger.error(f"❌ Price fetch failed: {e}")
+
+
+@metrics.timed("oracle")
+async def handle_batch_price_request(ctx: Context, sender: str, msg: BatchPriceRequest):
+    """Handle price requests for many collections at once"""
+    # Deduplicate while keeping the caller's order
+    slugs = list(dict.fromkeys(msg.collection_slugs))
+    ctx.logger.info(f"📥 Batch price request for {len(slugs)} collections from {sender[:8]}...")
+    
+    try:
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+        results = await asyncio.gather(*[
+            resolve_batch_entry(slug, msg.max_age, semaphore) for slug in slugs
+        ])
+        
+        response = BatchPriceResponse(
+            results=list(results),
             timestamp=datetime.utcnow().isoformat()
         )
         
-        # Send response
         await ctx.send(sender, response)
-        ctx.logger.info(f"✅ Price: {aggregated_price:.4f} ETH (confidence: {confidence:.0%})")
+        resolved = sum(1 for r in results if r.floor_price is not None)
+        ctx.logger.info(f"✅ Batch prices: {resolved}/{len(slugs)} resolved")
         
     except Exception as e:
-        ctx.logger.error(f"❌ Price fetch failed: {e}")
+        ctx.logger.error(f"❌ Batch price fetch failed: {e}")
 
 
-@agent.on_interval(period=1800.0)
-async def monitor_popular_collections(ctx: Context):
-    """Monitor popular collections every 30 minutes"""
-    ctx.logger.info("🔄 Monitoring popular collections...")
+@metrics.timed("oracle")
+async def handle_price_subscribe(ctx: Context, sender: str, msg: PriceSubscribe):
+    """Register a subscriber for pushed price updates"""
+    ctx.logger.info(f"📥 Price subscription for {msg.collection_slug} from {sender[:8]}...")
     
-    popular_collections = [
-        "boredapeyachtclub",
-        "azuki",
-        "doodles-official",
-        "pudgypenguins"
-    ]
+    subscription = Subscription(
+        threshold=msg.threshold if msg.threshold is not None else PUSH_THRESHOLD,
+        heartbeat=msg.heartbeat if msg.heartbeat is not None else PUSH_HEARTBEAT
+    )
+    subscriptions.setdefault(msg.collection_slug, {})[sender] = subscription
     
-    for slug in popular_collections:
+    # Push the current price right away, fetching unless a fresh one is cached.
+    # Prices restored from a checkpoint can be hours old: never push those as current
+    try:
+        cached = latest_prices.get(msg.collection_slug)
+        if cached is not None and cached.age <= msg.max_age:
+            metrics.record_cache("oracle_prices", "hit")
+            response = cached.response
+        else:
+            metrics.record_cache("oracle_prices", "miss")
+            response = await aggregate_price(msg.collection_slug)
+        
+        if response is not None:
+            await push_price(ctx, sender, subscription, response)
+        else:
+            ctx.logger.warning(f"⚠️ No fresh price for {msg.collection_slug} - first push waits for the next refresh")
+        
+    except Exception as e:
+        ctx.logger.error(f"❌ Initial push failed: {e}")
+    
+    ctx.logger.info(f"✅ {len(subscriptions[msg.collection_slug])} subscriber(s) for {msg.collection_slug}")
+
+
+@metrics.timed("oracle")
+async def handle_price_unsubscribe(ctx: Context, sender: str, msg: PriceUnsubscribe):
+    """Remove a subscriber"""
+    ctx.logger.info(f"📥 Price unsubscribe for {msg.collection_slug} from {sender[:8]}...")
+    
+    subscribers = subscriptions.get(msg.collection_slug, {})
+    subscribers.pop(sender, None)
+    
+    if not subscribers:
+        subscriptions.pop(msg.collection_slug, None)
+
+
+@metrics.timed("oracle")
+async def push_subscribed_prices(ctx: Context):
+    """Refresh each subscribed collection once and push meaningful changes"""
+    if not subscriptions:
+        return
+    
+    ctx.logger.info(f"🔄 Refreshing {len(subscriptions)} subscribed collections...")
+    
+    for slug, subscribers in list(subscriptions.items()):
+        try:
+            response = await aggregate_price(slug, Priority.BACKGROUND)
+            if response is None:
+                continue
+            
+            now = time.time()
+            pushed = 0
+            for address, subscription in list(subscribers.items()):
+                if should_push(subscription, response.floor_price, now):
+                    await push_price(ctx, address, subscription, response)
+                    pushed += 1
+            
+            if pushed:
+                ctx.logger.info(f"  {slug}: {response.floor_price:.4f} ETH pushed to {pushed} subscriber(s)")
+            
+        except Exception as e:
+            ctx.logger.error(f"  Failed to refresh {slug}: {e}")
+
+
+@metrics.timed("oracle")
+async def refresh_monitoring_set(ctx: Context):
+    """Rebuild the monitoring set from collections with open markets"""
+    markets = await fetch_open_markets()
+    if markets is None:
+        return
+    
+    stats: Dict[str, MonitoredCollection] = {}
+    for market in markets:
+        slug = market.collection_slug
+        if not slug:
+            continue
+        
+        entry = stats.setdefault(slug, MonitoredCollection(slug=slug))
+        entry.open_markets += 1
+        entry.total_volume += market.total_volume
+        
+        resolution = float(market.resolution_timestamp) or None
+        if resolution is not None and (entry.next_resolution is None or resolution < entry.next_resolution):
+            entry.next_resolution = resolution
+    
+    # Keep polling history for collections that are still referenced
+    for slug in list(monitored):
+        if slug not in stats:
+            del monitored[slug]
+    
+    for slug, entry in stats.items():
+        collection = monitored.setdefault(slug, entry)
+        collection.open_markets = entry.open_markets
+        collection.total_volume = entry.total_volume
+        collection.next_resolution = entry.next_resolution
+    
+    update_intervals(time.time())
+    
+    if monitored:
+        fastest = min(monitored.values(), key=lambda c: c.interval)
+        ctx.logger.info(
+            f"🔭 Monitoring {len(monitored)} collections from {len(markets)} open markets "
+            f"(fastest: {fastest.slug} every {fastest.interval:.0f}s)"
+        )
+
+
+@metrics.timed("oracle")
+async def poll_monitored_collections(ctx: Context):
+    """Refresh the collections whose polling interval has elapsed"""
+    now = time.time()
+    due = due_collections(now)[:MONITOR_MAX_PER_TICK]
+    if not due:
+        return
+    
+    for collection in due:
+        try:
+            response = await aggregate_price(collection.slug, Priority.BACKGROUND)
+            collection.last_polled = time.time()
+            if response is None:
+                continue
+            
+            previous = collection.last_price
+            collection.moving = bool(previous) and abs(response.floor_price - previous) / previous >= MONITOR_FAST_MOVE
+            collection.last_price = response.floor_price
+            ctx.logger.info(f"  {collection.slug}: {response.floor_price:.4f} ETH")
+            
+        except Exception as e:
+            collection.last_polled = time.time()
+            ctx.logger.error(f"  Failed to fetch {collection.slug}: {e}")
+    
+    update_intervals(time.time())
+
+
+@metrics.timed("oracle")
+async def publish_floor_prices(ctx: Context):
+    """Push prices to NftFloorOracle when they deviate or are about to go stale"""
+    if not publishing_enabled():
+        return
+    
+    try:
+        await settle_inflight_publishes(ctx)
+        staleness = await asyncio.to_thread(onchain_staleness)
+    except Exception as e:
+        ctx.logger.error(f"❌ Floor oracle unavailable: {e}")
+        return
+    
+    # Candidates: newly aggregated prices, plus tracked collections nearing staleness
+    now = time.time()
+    candidates = dict(publish_queue)
+    for slug in onchain_prices:
+        cached = latest_prices.get(slug)
+        if slug not in candidates and cached is not None and cached.age < PUBLISH_MARGIN:
+            candidates[slug] = to_wei(cached.response.floor_price)
+    
+    sent = 0
+    for slug, price_wei in candidates.items():
+        if slug in inflight_publishes:
+            continue  # Stays queued; the newest value goes out once this one is mined
+        
         try:
-            prices = await fetch_multi_source_prices(slug)
-            if prices:
-                price = median(prices) if len(prices) > 1 else prices[0]
-                ctx.logger.info(f"  {slug}: {price:.4f} ETH")
+            onchain = await read_onchain_price(slug)
+            if needs_publish(onchain, price_wei, staleness, now):
+                pending = await send_floor_price(slug, price_wei)
+            else:
+                pending = None
+            
+            # Drop the queued value unless a newer one arrived meanwhile
+            if publish_queue.get(slug) == price_wei:
+                del publish_queue[slug]
+            if pending is None:
+                continue
+            
+            inflight_publishes[slug] = pending
+            onchain_prices[slug] = OnchainPrice(price_wei=price_wei, updated_at=now)
+            publish_outcomes.inc(outcome="sent")
+            sent += 1
+            ctx.logger.info(f"⛓️ setFloorPrice({slug}, {price_wei / 1e18:.4f} ETH) nonce {pending.nonce}: {pending.tx_hash}")
+            
         except Exception as e:
-            ctx.logger.error(f"  Failed to fetch {slug}: {e}")
+            publish_outcomes.inc(outcome="failed")
+            ctx.logger.error(f"❌ Failed to publish {slug}: {e}")
+    
+    if sent:
+        ctx.logger.info(f"⛓️ Published {sent} floor price(s), {len(inflight_publishes)} in flight")
+
+
+# Agent Factory
+_agent: Optional[Agent] = None
+
+
+def create_agent() -> Agent:
+    """Build the agent and register its handlers"""
+    agent = Agent(
+        name="mcg_oracle",
+        seed=os.getenv("ORACLE_SEED", "oracle_default_seed"),
+        port=int(os.getenv("ORACLE_PORT", "8004")),
+        endpoint=[f"http://localhost:{os.getenv('ORACLE_PORT', '8004')}/submit"],
+        resolve=addressbook.resolver_from_env()
+    )
+    
+    # Restore checkpointed state before anything else runs
+    checkpoints.register("latest_prices", dump_latest_prices, load_latest_prices)
+    checkpoints.register("subscriptions", dump_subscriptions, load_subscriptions)
+    checkpoints.register("monitored", dump_monitored, load_monitored)
+    checkpoints.register("opensea.scheduler", opensea.scheduler.snapshot, opensea.scheduler.restore)
+    checkpoints.attach(agent)
+    
+    agent.on_event("startup")(startup)
+    pool.lane("price", concurrency=16, max_queue=64)
+    pool.lane("batch", concurrency=2, max_queue=8)
+    pool.lane("subscribe", concurrency=4, max_queue=32)
+    agent.on_message(model=PriceRequest)(
+        pool.message("price", handle_price_request, shed_price_request)
+    )
+    agent.on_message(model=BatchPriceRequest)(
+        pool.message("batch", handle_batch_price_request, shed_batch_price_request)
+    )
+    agent.on_message(model=PriceSubscribe)(
+        pool.message("subscribe", handle_price_subscribe, shed_price_request)
+    )
+    # Unsubscribing is constant-time and must never be shed
+    agent.on_message(model=PriceUnsubscribe)(handle_price_unsubscribe)
+    agent.on_interval(period=REFRESH_PERIOD)(pool.interval(push_subscribed_prices))
+    agent.on_interval(period=MONITOR_SET_REFRESH)(pool.interval(refresh_monitoring_set))
+    metrics.track_queue("oracle.monitor_due", lambda: len(due_collections(time.time())))
+    agent.on_interval(period=PUBLISH_INTERVAL)(pool.interval(publish_floor_prices))
+    metrics.track_queue("oracle.publish_pending", lambda: len(publish_queue))
+    agent.on_interval(period=MONITOR_TICK)(pool.interval(poll_monitored_collections))
+    
+    # Runtime profiling control (see common/profiling.py)
+    profiling.register_control(agent)
+    
+    logger.info(f"✅ Oracle Agent initialized")
+    logger.info(f"📡 Agent Address: {agent.address}")
+    return agent
+
+
+def get_agent() -> Agent:
+    """The agent for this process, created on first use"""
+    global _agent
+    if _agent is None:
+        _agent = create_agent()
+    return _agent
+
+
+def __getattr__(name: str):
+    # `from oracle_agent import agent` still works, but only builds the agent when asked
+    if name == "agent":
+        return get_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # Main entry point
 if __name__ == "__main__":
+    logs.configure()
     logger.info("🚀 Starting Oracle Agent...")
-    agent.run()
+    get_agent().run()
 
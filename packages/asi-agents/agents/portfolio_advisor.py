@@ -5,13 +5,19 @@ Analyzes user positions and generates actionable insights
 """
 
 import os
+import time
+import asyncio
 import logging
-from typing import List, Dict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, List, Dict
 from datetime import datetime
 
 from uagents import Agent, Context, Model
-from uagents.setup import fund_agent_if_low
-import requests
+
+from common import addressbook, checkpoint, graphql, logs, metrics, opensea, priceboard, profiling, records, workpool
+from common.records import WEI, Position
+from common.scheduler import Priority
 
 # Setup logging
 logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
@@ -35,22 +41,36 @@ class PortfolioAnalysisResponse(Model):
     recommendations: List[str]
     risk_score: float
     timestamp: str
+    # Daily share-weighted floor volatility (net shares x floor log-return std), not an ETH amount
+    exposure_volatility: Optional[float] = None
+    correlated_exposure: Optional[float] = None  # -1 (hedged) .. 1 (positions move together)
+    error: Optional[str] = None
+
+
+# Prometheus metrics endpoint (0 disables)
+METRICS_PORT = int(os.getenv("PORTFOLIO_ADVISOR_METRICS_PORT", "9103"))
 
+# Bounded handler concurrency (see common/workpool.py)
+pool = workpool.WorkPool("portfolio_advisor")
 
-# Create Agent
-agent = Agent(
-    name="mcg_portfolio_advisor",
-    seed=os.getenv("PORTFOLIO_ADVISOR_SEED", "portfolio_advisor_default_seed"),
-    port=int(os.getenv("PORTFOLIO_ADVISOR_PORT", "8003")),
-    endpoint=[f"http://localhost:{os.getenv('PORTFOLIO_ADVISOR_PORT', '8003')}/submit"]
-)
+# Warm restart state (see common/checkpoint.py)
+checkpoints = checkpoint.Checkpointer("portfolio_advisor")
+
+# Collection return covariance (see common/riskmodel.py)
+RISK_SAMPLE_INTERVAL = float(os.getenv("RISK_SAMPLE_INTERVAL", "300"))  # 0 disables sampling
+RISK_MAX_COLLECTIONS = int(os.getenv("RISK_MAX_COLLECTIONS", "500"))
+RISK_PAIR_THRESHOLD = float(os.getenv("RISK_PAIR_THRESHOLD", "0.5"))  # Correlation worth a hedging tip
+RISK_OPENSEA_SHARE = float(os.getenv("RISK_OPENSEA_SHARE", "0.25"))  # Of the OpenSea rate limit, spent on sampling
+RISK_HELD_TTL = float(os.getenv("RISK_HELD_TTL", "604800"))  # A held collection not seen in a portfolio for this long stops being sampled
+
+# Collections seen in analysed portfolios -> when last seen, sampled alongside those with open markets
+held_collections: Dict[str, float] = {}
+sampling_cursor = 0  # Where the next sample resumes among collections nobody holds
 
-logger.info(f"✅ Portfolio Advisor Agent initialized")
-logger.info(f"📡 Agent Address: {agent.address}")
 
 
 # Helper Functions
-async def fetch_user_positions(user_address: str) -> List[Dict]:
+async def fetch_user_positions(user_address: str) -> List[Position]:
     """Fetch user positions from GraphQL"""
     query = """
     query GetPositions($user: String!) {
@@ -65,27 +85,85 @@ async def fetch_user_positions(user_address: str) -> List[Dict]:
     }
     """
     
-    try:
-        endpoint = os.getenv("GRAPHQL_ENDPOINT", "http://localhost:8080/v1/graphql")
-        response = requests.post(
-            endpoint,
-            json={
-                "query": query,
-                "variables": {"user": user_address.lower()}
-            },
-            timeout=10
-        )
-        
-        data = response.json()
-        return data.get('data', {}).get('Position', [])
-        
-    except Exception as e:
-        logger.error(f"Failed to fetch positions: {e}")
+    result = await graphql.query(query, {"user": user_address.lower()})
+    if result.value is None:
+        logger.error(f"Failed to fetch positions: {result.error}")
         return []
+    
+    if result.stale:
+        logger.warning(f"Serving positions {result.age:.0f}s old (indexer degraded)")
+    
+    return records.positions(result.value.get('Position', []))
+
+
+async def fetch_market_collections(market_ids: List[str]) -> Dict[str, str]:
+    """Collection slug of each market, by market id"""
+    if not market_ids:
+        return {}
+    
+    query = """
+    query GetMarketCollections($ids: [String!]!) {
+        Market(where: {id: {_in: $ids}}) {
+            id
+            collectionSlug
+        }
+    }
+    """
+    
+    result = await graphql.query(query, {"ids": sorted(set(market_ids))})
+    if result.value is None:
+        logger.error(f"Failed to fetch market collections: {result.error}")
+        return {}
+    
+    return {m.id.lower(): m.collection_slug for m in records.markets(result.value.get('Market', []))}
 
 
-def calculate_risk_score(positions: List[Dict]) -> float:
-    """Calculate portfolio risk score (0-1)"""
+@lru_cache(maxsize=None)
+def get_risk_model():
+    """Process-wide covariance tracker, created on first use (numpy is imported here)"""
+    from common.riskmodel import CovarianceTracker
+    
+    return CovarianceTracker(interval=RISK_SAMPLE_INTERVAL or 300.0)
+
+
+def collection_exposures(positions: List[Position], collections: Dict[str, str]) -> Dict[str, float]:
+    """
+    Net directional exposure per collection, in shares.
+    
+    YES shares pay out when the floor ends above target and NO shares when
+    it ends below, so a position is long the collection by its net YES
+    shares. Each redeems for at most 1 ETH, but its value is not linear in
+    the floor, so this ranks exposure rather than pricing it.
+    """
+    exposures: Dict[str, float] = {}
+    for p in positions:
+        slug = collections.get(p.market_id)
+        if slug is None:
+            continue
+        exposures[slug] = exposures.get(slug, 0.0) + p.net_shares / WEI
+    return exposures
+
+
+@dataclass(frozen=True)
+class RiskParams:
+    """Tunable inputs of calculate_risk_score (see backtest/ for evaluating them)"""
+    single_position_risk: float = 0.8
+    two_position_risk: float = 0.6
+    few_position_risk: float = 0.4  # 3-4 positions
+    many_position_risk: float = 0.2
+    diversification_weight: float = 0.6
+    concentration_weight: float = 0.4
+    correlation_weight: float = 0.3  # Share of the score from correlated exposure, when it is known
+
+
+def calculate_risk_score(positions: List[Position], params: RiskParams = RiskParams(), correlation=None) -> float:
+    """
+    Calculate portfolio risk score (0-1)
+    
+    `correlation` is the portfolio's PortfolioRisk from the risk model, if
+    any of its collections are modelled; positions that reinforce each
+    other then raise the score and hedged ones lower it.
+    """
     if not positions:
         return 0.0
     
@@ -98,33 +176,39 @@ def calculate_risk_score(positions: List[Dict]) -> float:
     
     # Diversification score (more positions = better)
     if num_positions == 1:
-        diversification_risk = 0.8
+        diversification_risk = params.single_position_risk
     elif num_positions == 2:
-        diversification_risk = 0.6
+        diversification_risk = params.two_position_risk
     elif num_positions <= 4:
-        diversification_risk = 0.4
+        diversification_risk = params.few_position_risk
     else:
-        diversification_risk = 0.2
+        diversification_risk = params.many_position_risk
     
     # Concentration score
-    total_invested = sum(float(p.get('totalInvested', 0)) for p in positions)
+    total_invested = sum(p.total_invested for p in positions)
     if total_invested > 0:
-        max_position = max(float(p.get('totalInvested', 0)) for p in positions)
+        max_position = max(p.total_invested for p in positions)
         concentration = max_position / total_invested
         concentration_risk = concentration  # 1.0 = all in one position
     else:
         concentration_risk = 0.0
     
     # Combined risk score
-    risk_score = (diversification_risk * 0.6) + (concentration_risk * 0.4)
+    risk_score = (diversification_risk * params.diversification_weight) + (concentration_risk * params.concentration_weight)
+    
+    # Correlated exposure, weighted by how much of the portfolio the model covers
+    if correlation is not None:
+        weight = params.correlation_weight * correlation.modelled
+        risk_score = risk_score * (1 - weight) + max(0.0, correlation.correlated_exposure) * weight
     
     return min(1.0, risk_score)
 
 
 def generate_recommendations(
-    positions: List[Dict],
+    positions: List[Position],
     risk_score: float,
-    realized_pnl: float
+    realized_pnl: float,
+    correlation=None
 ) -> List[str]:
     """Generate personalized trading recommendations"""
     recommendations = []
@@ -147,13 +231,24 @@ def generate_recommendations(
     # Risk-based recommendations
     if risk_score > 0.7:
         recommendations.append("🔴 High risk score detected - consider reducing position sizes")
-        recommendations.append("🛡️ Hedge your positions by taking opposite sides in correlated markets")
+        if not (correlation and correlation.reinforcing_pairs):
+            recommendations.append("🛡️ Hedge your positions by taking opposite sides in correlated markets")
     elif risk_score > 0.5:
         recommendations.append("🟡 Moderate risk - monitor positions closely")
         recommendations.append("⚖️ Balance YES and NO positions to reduce directional risk")
     else:
         recommendations.append("🟢 Good risk management")
     
+    # Correlation-based recommendations
+    if correlation is not None:
+        for a, b, rho in correlation.reinforcing_pairs[:2]:
+            if rho > 0:
+                recommendations.append(f"🔗 {a} and {b} floors move together (ρ={rho:.2f}) and your bets point the same way - an opposite position in one hedges the other")
+            else:
+                recommendations.append(f"🔗 {a} and {b} floors move against each other (ρ={rho:.2f}) and your bets are opposed - one move hurts both")
+        if correlation.correlated_exposure < -0.3:
+            recommendations.append("🛡️ Your positions offset each other - correlated collections are hedged")
+    
     # P&L-based recommendations
     if realized_pnl > 0:
         recommendations.append(f"🎉 Positive realized P&L: {realized_pnl:.4f} ETH - great job!")
@@ -174,22 +269,41 @@ def generate_recommendations(
     return recommendations[:8]  # Top 8 recommendations
 
 
+async def shed_analysis_request(ctx: Context, sender: str, msg: PortfolioAnalysisRequest):
+    """Tell the caller its portfolio request was not admitted"""
+    await ctx.send(sender, PortfolioAnalysisResponse(
+        user_address=msg.user_address,
+        total_positions=0,
+        total_invested_eth=0.0,
+        current_value_eth=0.0,
+        unrealized_pnl_eth=0.0,
+        realized_pnl_eth=0.0,
+        recommendations=[],
+        risk_score=0.0,
+        timestamp=datetime.utcnow().isoformat(),
+        error=workpool.OVERLOADED
+    ))
+
+
 # Event Handlers
-@agent.on_event("startup")
 async def startup(ctx: Context):
     """Initialize agent on startup"""
     ctx.logger.info(f"💼 Portfolio Advisor Agent starting...")
+    agent = get_agent()
     ctx.logger.info(f"📡 Address: {agent.address}")
     
+    metrics.start_server(METRICS_PORT)
+    
     # Fund agent if needed
     try:
+        from uagents.setup import fund_agent_if_low
         await fund_agent_if_low(agent.wallet.address())
         ctx.logger.info("✅ Agent funded")
     except:
         ctx.logger.warning("⚠️ Could not fund agent (requires testnet)")
 
 
-@agent.on_message(model=PortfolioAnalysisRequest)
+@metrics.timed("portfolio_advisor")
 async def handle_analysis_request(ctx: Context, sender: str, msg: PortfolioAnalysisRequest):
     """Handle portfolio analysis requests"""
     ctx.logger.info(f"📥 Portfolio analysis request for {msg.user_address[:8]}... from {sender[:8]}...")
@@ -200,21 +314,30 @@ async def handle_analysis_request(ctx: Context, sender: str, msg: PortfolioAnaly
         positions = await fetch_user_positions(msg.user_address)
         
         # Calculate metrics
-        total_invested = sum(float(p.get('totalInvested', 0)) for p in positions) / 1e18
-        realized_pnl = sum(float(p.get('realizedPnL', 0)) for p in positions) / 1e18
+        total_invested = sum(p.total_invested for p in positions) / WEI
+        realized_pnl = sum(p.realized_pnl for p in positions) / WEI
         
         # For unrealized P&L, we'd need current market prices
         # Simplified for now
         unrealized_pnl = 0.0
         current_value = total_invested
         
+        # Correlated exposure across collections
+        collections = await fetch_market_collections([p.market_id for p in positions])
+        exposures = collection_exposures(positions, collections)
+        now = time.time()
+        held_collections.update((slug, now) for slug in exposures)
+        correlation = None
+        if RISK_SAMPLE_INTERVAL > 0 and exposures:
+            correlation = get_risk_model().portfolio_risk(exposures, RISK_PAIR_THRESHOLD)
+        
         # Calculate risk
-        risk_score = calculate_risk_score(positions)
+        risk_score = calculate_risk_score(positions, correlation=correlation)
         
         # Generate recommendations
         recommendations = []
         if msg.include_recommendations:
-            recommendations = generate_recommendations(positions, risk_score, realized_pnl)
+            recommendations = generate_recommendations(positions, risk_score, realized_pnl, correlation)
         
         # Create response
         response = PortfolioAnalysisResponse(
@@ -226,7 +349,9 @@ async def handle_analysis_request(ctx: Context, sender: str, msg: PortfolioAnaly
             realized_pnl_eth=realized_pnl,
             recommendations=recommendations,
             risk_score=risk_score,
-            timestamp=datetime.utcnow().isoformat()
+            timestamp=datetime.utcnow().isoformat(),
+            exposure_volatility=correlation.exposure_volatility if correlation else None,
+            correlated_exposure=correlation.correlated_exposure if correlation else None
         )
         
         # Send response
@@ -237,8 +362,148 @@ async def handle_analysis_request(ctx: Context, sender: str, msg: PortfolioAnaly
         ctx.logger.error(f"❌ Analysis failed: {e}")
 
 
+def expire_held_collections() -> List[str]:
+    """
+    Forget held collections not seen within RISK_HELD_TTL, keeping at most
+    RISK_MAX_COLLECTIONS, and return the rest, most recently seen first
+    """
+    cutoff = time.time() - RISK_HELD_TTL
+    recent = sorted(
+        ((slug, seen) for slug, seen in held_collections.items() if seen >= cutoff),
+        key=lambda item: item[1], reverse=True
+    )[:RISK_MAX_COLLECTIONS]
+    
+    held_collections.clear()
+    held_collections.update(recent)
+    return [slug for slug, _ in recent]
+
+
+def sampling_batch(slugs: List[str]) -> List[str]:
+    """
+    Collections to fetch from OpenSea this sample, within RISK_OPENSEA_SHARE of the rate limit.
+    
+    Held collections come first; the rest take turns across samples. A
+    collection skipped this time keeps its last floor, and its next
+    sample's return spans the gap.
+    """
+    global sampling_cursor
+    
+    budget = max(1, int(RISK_SAMPLE_INTERVAL * opensea.scheduler.max_rate * RISK_OPENSEA_SHARE))
+    held = [s for s in slugs if s in held_collections][:budget]
+    others = [s for s in slugs if s not in held_collections]
+    
+    turn = min(len(others), budget - len(held))
+    if turn <= 0:
+        return held
+    start = sampling_cursor % len(others)
+    sampling_cursor = start + turn
+    return held + (others[start:] + others[:start])[:turn]
+
+
+@metrics.timed("portfolio_advisor")
+async def sample_collection_prices(ctx: Context):
+    """Feed one floor price sample per collection into the risk model"""
+    query = """
+    query GetOpenMarketCollections($limit: Int!) {
+        Market(where: {status: {_eq: "Open"}}, limit: $limit) {
+            collectionSlug
+        }
+    }
+    """
+    
+    try:
+        result = await graphql.query(query, {"limit": RISK_MAX_COLLECTIONS})
+        held = expire_held_collections()
+        listed = set()
+        if result.value is not None:
+            listed.update(m.collection_slug for m in records.markets(result.value.get('Market', [])))
+        slugs = (held + sorted(listed.difference(held)))[:RISK_MAX_COLLECTIONS]
+        
+        prices = {}
+        missing = []
+        for slug in slugs:
+            entry = priceboard.board.read(slug, max_age=priceboard.PRICE_BOARD_MAX_AGE)
+            if entry is not None:
+                prices[slug] = entry.price
+            else:
+                missing.append(slug)
+        
+        batch = sampling_batch(missing)
+        floors = await asyncio.gather(*[opensea.get_floor_price(slug, Priority.BACKGROUND) for slug in batch])
+        prices.update((slug, floor.value) for slug, floor in zip(batch, floors) if floor.value)
+        
+        model = get_risk_model()
+        model.update(prices)
+        ctx.logger.info(f"📈 Risk model sampled {len(prices)}/{len(slugs)} collections ({model.samples} samples)")
+        
+    except Exception as e:
+        ctx.logger.error(f"Risk sampling failed: {e}")
+
+
+def dump_risk_model() -> Dict:
+    return {"model": get_risk_model().snapshot(), "held": dict(held_collections)}
+
+
+def load_risk_model(state: Dict):
+    get_risk_model().restore(state["model"])
+    held_collections.update(state["held"])
+    expire_held_collections()
+
+
+# Agent Factory
+_agent: Optional[Agent] = None
+
+
+def create_agent() -> Agent:
+    """Build the agent and register its handlers"""
+    agent = Agent(
+        name="mcg_portfolio_advisor",
+        seed=os.getenv("PORTFOLIO_ADVISOR_SEED", "portfolio_advisor_default_seed"),
+        port=int(os.getenv("PORTFOLIO_ADVISOR_PORT", "8003")),
+        endpoint=[f"http://localhost:{os.getenv('PORTFOLIO_ADVISOR_PORT', '8003')}/submit"],
+        resolve=addressbook.resolver_from_env()
+    )
+    
+    # Restore checkpointed state before anything else runs
+    checkpoints.register("graphql.cache", graphql.cache.snapshot, graphql.cache.restore)
+    if RISK_SAMPLE_INTERVAL > 0:
+        checkpoints.register("risk_model", dump_risk_model, load_risk_model, version=2)
+    checkpoints.attach(agent)
+    
+    agent.on_event("startup")(startup)
+    pool.lane("analysis", concurrency=8, max_queue=32)
+    agent.on_message(model=PortfolioAnalysisRequest)(
+        pool.message("analysis", handle_analysis_request, shed_analysis_request)
+    )
+    if RISK_SAMPLE_INTERVAL > 0:
+        agent.on_interval(period=RISK_SAMPLE_INTERVAL)(pool.interval(sample_collection_prices))
+    
+    # Runtime profiling control (see common/profiling.py)
+    profiling.register_control(agent)
+    
+    logger.info(f"✅ Portfolio Advisor Agent initialized")
+    logger.info(f"📡 Agent Address: {agent.address}")
+    return agent
+
+
+def get_agent() -> Agent:
+    """The agent for this process, created on first use"""
+    global _agent
+    if _agent is None:
+        _agent = create_agent()
+    return _agent
+
+
+def __getattr__(name: str):
+    # `from portfolio_advisor import agent` still works, but only builds the agent when asked
+    if name == "agent":
+        return get_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 # Main entry point
 if __name__ == "__main__":
+    logs.configure()
     logger.info("🚀 Starting Portfolio Advisor Agent...")
-    agent.run()
+    get_agent().run()
 
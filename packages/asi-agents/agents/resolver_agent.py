@@ -5,15 +5,19 @@ Executes on-chain transactions for trustless settlement
 """
 
 import os
+import time
+import asyncio
 import logging
-from typing import Optional, Dict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Optional, Dict, List
 from datetime import datetime
 
 from uagents import Agent, Context, Model
-from uagents.setup import fund_agent_if_low
-from web3 import Web3
-from eth_account import Account
-import requests
+
+from common import addressbook, checkpoint, graphql, jobqueue, logs, marketscan, metrics, opensea, profiling, records, workpool
+from common.records import Market
+from common.scheduler import Priority
 
 # Setup logging
 logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
@@ -75,56 +79,83 @@ MARKET_ABI = [
     }
 ]
 
-# Create Agent
-agent = Agent(
-    name="mcg_resolver",
-    seed=os.getenv("RESOLVER_SEED", "resolver_default_seed"),
-    port=int(os.getenv("RESOLVER_PORT", "8002")),
-    endpoint=[f"http://localhost:{os.getenv('RESOLVER_PORT', '8002')}/submit"]
-)
+# Prometheus metrics endpoint (0 disables)
+METRICS_PORT = int(os.getenv("RESOLVER_METRICS_PORT", "9102"))
+
+# On-chain market registry sync period (see common/marketscan.py; 0 disables)
+MARKET_SCAN_INTERVAL = float(os.getenv("MARKET_SCAN_INTERVAL", "60"))
+
+# Resolution job processing (see common/jobqueue.py)
+JOB_TICK = float(os.getenv("RESOLVER_JOB_TICK", "30"))          # Retries, broadcasts and receipt checks
+JOB_BATCH = int(os.getenv("RESOLVER_JOB_BATCH", "10"))          # Jobs advanced per tick
+TX_TIMEOUT = float(os.getenv("RESOLVER_TX_TIMEOUT", "180"))     # Re-sign with higher fees if not mined after this
+MAX_FEE_GWEI = float(os.getenv("RESOLVER_MAX_FEE_GWEI", "50"))  # Fee bumps stop here; then the last one is re-broadcast
+PRICE_MAX_AGE = float(os.getenv("RESOLVER_PRICE_MAX_AGE", "600"))  # An unsent final price older than this is re-fetched
 
-# Web3 Setup
-rpc_url = os.getenv("BASE_SEPOLIA_RPC", "https://sepolia.base.org")
-w3 = Web3(Web3.HTTPProvider(rpc_url))
+job_states = metrics.registry.gauge("mcg_resolver_jobs", "Resolution jobs by state")
+_job_locks: Dict[str, list] = {}  # market -> [lock, tasks holding or awaiting it]
 
+# Bounded handler concurrency (see common/workpool.py)
+pool = workpool.WorkPool("resolver")
+
+# Warm restart state (see common/checkpoint.py)
+checkpoints = checkpoint.Checkpointer("resolver")
+
+# Web3 Setup (clients are created on first use)
 resolver_pk = os.getenv("RESOLVER_PRIVATE_KEY", "")
-if resolver_pk:
+
+
+def get_web3():
+    """Web3 client for the configured RPC endpoint"""
+    from common import rpc
+    
+    return rpc.get_web3()
+
+
+@lru_cache(maxsize=None)
+def get_account():
+    """Resolver signing account, or None when no key is configured"""
+    if not resolver_pk:
+        logger.warning("⚠️ No resolver private key - resolution disabled")
+        return None
+    
+    from eth_account import Account
+    
     account = Account.from_key(resolver_pk)
     logger.info(f"🔐 Resolver wallet: {account.address}")
-else:
-    account = None
-    logger.warning("⚠️ No resolver private key - resolution disabled")
+    return account
 
-logger.info(f"✅ Resolver Agent initialized")
-logger.info(f"📡 Agent Address: {agent.address}")
 
 
 # Helper Functions
 async def fetch_floor_price(collection_slug: str) -> Optional[float]:
-    """Fetch current floor price from OpenSea"""
+    """Fetch current floor price from OpenSea at settlement priority (never from the shared board)"""
     try:
-        url = f"https://api.opensea.io/api/v2/collections/{collection_slug}/stats"
-        headers = {}
-        
-        api_key = os.getenv("OPENSEA_API_KEY")
-        if api_key:
-            headers["X-API-KEY"] = api_key
-        
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
-        floor_price = data.get('total', {}).get('floor_price', 0)
-        
-        return float(floor_price) if floor_price else None
+        return await opensea.fetch_floor_price(collection_slug, Priority.RESOLUTION)
         
     except Exception as e:
         logger.error(f"Failed to fetch floor price: {e}")
         return None
 
 
-async def fetch_market_data(market_address: str) -> Dict:
-    """Fetch market data from GraphQL"""
+def market_record_data(record: marketscan.MarketRecord) -> Market:
+    """Registry record as an indexer Market"""
+    return Market(
+        id=record.address,
+        market_address=record.address,
+        collection_slug=record.collection_slug,
+        target_price=record.target_price,
+        resolution_timestamp=record.resolution_timestamp,
+        status="Resolved" if record.resolved else "Open"
+    )
+
+
+async def fetch_market_data(market_address: str) -> Optional[Market]:
+    """Fetch market data from the on-chain registry, falling back to GraphQL"""
+    record = marketscan.scanner.get(market_address)
+    if record is not None:
+        return market_record_data(record)
+    
     query = """
     query GetMarket($id: ID!) {
         Market(where: {id: {_eq: $id}}) {
@@ -137,28 +168,18 @@ async def fetch_market_data(market_address: str) -> Dict:
     }
     """
     
-    try:
-        endpoint = os.getenv("GRAPHQL_ENDPOINT", "http://localhost:8080/v1/graphql")
-        response = requests.post(
-            endpoint,
-            json={
-                "query": query,
-                "variables": {"id": market_address.lower()}
-            },
-            timeout=10
-        )
-        
-        data = response.json()
-        markets = data.get('data', {}).get('Market', [])
-        
-        return markets[0] if markets else {}
-        
-    except Exception as e:
-        logger.error(f"Failed to fetch market data: {e}")
-        return {}
+    # Market configuration is immutable, so a stale cached copy is safe to use
+    result = await graphql.query(query, {"id": market_address.lower()})
+    if result.value is None:
+        logger.error(f"Failed to fetch market data: {result.error}")
+        return None
+    
+    markets = result.value.get('Market', [])
+    
+    return Market.from_indexer(markets[0]) if markets else None
 
 
-async def fetch_resolvable_markets() -> list:
+async def fetch_resolvable_markets() -> List[Market]:
     """Fetch markets ready for resolution"""
     current_timestamp = int(datetime.utcnow().timestamp())
     
@@ -180,158 +201,322 @@ async def fetch_resolvable_markets() -> list:
     """
     
     try:
-        endpoint = os.getenv("GRAPHQL_ENDPOINT", "http://localhost:8080/v1/graphql")
-        response = requests.post(
-            endpoint,
-            json={
-                "query": query,
-                "variables": {"currentTime": str(current_timestamp)}
-            },
-            timeout=10
-        )
-        
-        data = response.json()
-        return data.get('data', {}).get('Market', [])
+        data = await graphql.execute(query, {"currentTime": str(current_timestamp)})
+        markets = records.markets(data.get('Market', []))
         
     except Exception as e:
         logger.error(f"Failed to fetch resolvable markets: {e}")
-        return []
+        markets = []
+    
+    # Add due markets the indexer has not caught up with yet
+    known = {m.market_address.lower() for m in markets}
+    for record in marketscan.scanner.due(current_timestamp):
+        if len(markets) >= 10:
+            break
+        if record.address not in known:
+            markets.append(market_record_data(record))
+    
+    return markets
 
 
-async def resolve_market(market_address: str) -> MarketResolutionResponse:
-    """Resolve a market on-chain"""
+@asynccontextmanager
+async def job_lock(market_address: str):
+    """
+    Serializes work on one market between manual requests and the job tick.
+    
+    The lock is dropped once nobody holds or awaits it, so finished markets
+    do not keep one each for the life of the process.
+    """
+    key = market_address.lower()
+    entry = _job_locks.setdefault(key, [asyncio.Lock(), 0])
+    entry[1] += 1
     try:
-        # Get market contract
-        market_contract = w3.eth.contract(
-            address=Web3.to_checksum_address(market_address),
-            abi=MARKET_ABI
-        )
-        
-        # Check status
-        status = market_contract.functions.status().call()
-        if status != 0:  # 0 = Open
-            return MarketResolutionResponse(
-                market_address=market_address,
-                success=False,
-                transaction_hash=None,
-                final_price=None,
-                winning_outcome=None,
-                error="Market already resolved",
-                timestamp=datetime.utcnow().isoformat()
-            )
-        
-        # Check resolution time
-        resolution_time = market_contract.functions.resolutionTimestamp().call()
-        current_time = int(datetime.utcnow().timestamp())
-        
-        if current_time < resolution_time:
-            return MarketResolutionResponse(
-                market_address=market_address,
-                success=False,
-                transaction_hash=None,
-                final_price=None,
-                winning_outcome=None,
-                error=f"Resolution time not reached (in {resolution_time - current_time}s)",
-                timestamp=datetime.utcnow().isoformat()
-            )
-        
-        # Check if we are the resolver
-        if account:
-            resolver_address = market_contract.functions.resolver().call()
-            if resolver_address.lower() != account.address.lower():
-                return MarketResolutionResponse(
-                    market_address=market_address,
-                    success=False,
-                    transaction_hash=None,
-                    final_price=None,
-                    winning_outcome=None,
-                    error="Not authorized resolver",
-                    timestamp=datetime.utcnow().isoformat()
-                )
-        
-        # Fetch market data
-        market_data = await fetch_market_data(market_address)
-        collection_slug = market_data.get('collectionSlug')
-        target_price = int(market_data.get('targetPrice', 0))
-        
-        # Get floor price
-        floor_price = await fetch_floor_price(collection_slug)
-        
-        if floor_price is None:
-            return MarketResolutionResponse(
-                market_address=market_address,
-                success=False,
-                transaction_hash=None,
-                final_price=None,
-                winning_outcome=None,
-                error="Failed to fetch floor price",
-                timestamp=datetime.utcnow().isoformat()
-            )
-        
-        # Convert to wei
-        final_price_wei = w3.to_wei(floor_price, 'ether')
-        
-        # Determine winning outcome
-        winning_outcome = final_price_wei > target_price
-        
-        logger.info(f"Resolving market {market_address}")
-        logger.info(f"  Target Price: {w3.from_wei(target_price, 'ether')} ETH")
-        logger.info(f"  Final Price: {floor_price} ETH")
-        logger.info(f"  Winner: {'YES' if winning_outcome else 'NO'}")
-        
-        # Execute resolution if we have account
-        if not account:
-            return MarketResolutionResponse(
-                market_address=market_address,
-                success=False,
-                transaction_hash=None,
-                final_price=floor_price,
-                winning_outcome=winning_outcome,
-                error="No resolver account configured",
-                timestamp=datetime.utcnow().isoformat()
-            )
-        
-        # Build transaction
-        nonce = w3.eth.get_transaction_count(account.address)
-        
-        tx = market_contract.functions.resolveMarket(
-            final_price_wei
-        ).build_transaction({
-            'from': account.address,
-            'nonce': nonce,
-            'gas': 200000,
-            'gasPrice': w3.eth.gas_price
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            del _job_locks[key]
+
+
+@lru_cache(maxsize=None)
+def get_nonces():
+    """Nonce tracker for the resolver wallet"""
+    from common import rpc
+    
+    return rpc.NonceTracker(get_account().address)
+
+
+def update_job_gauges():
+    """Refresh the per-state job counts (read on the event loop, not by the metrics thread)"""
+    for state in jobqueue.STATES:
+        job_states.set(jobqueue.queue.count(state), state=state)
+
+
+async def price_job(job: jobqueue.ResolutionJob) -> jobqueue.ResolutionJob:
+    """Pre-flight checks and final price for a due job"""
+    w3 = get_web3()
+    account = get_account()
+    queue = jobqueue.queue
+    
+    market_contract = w3.eth.contract(
+        address=w3.to_checksum_address(job.market),
+        abi=MARKET_ABI
+    )
+    
+    # Check status
+    status = await asyncio.to_thread(market_contract.functions.status().call)
+    if status != 0:  # 0 = Open
+        return queue.confirmed(job, note="Market already resolved")
+    
+    # Check resolution time
+    resolution_time = await asyncio.to_thread(market_contract.functions.resolutionTimestamp().call)
+    current_time = int(datetime.utcnow().timestamp())
+    
+    if current_time < resolution_time:
+        wait = resolution_time - current_time
+        return queue.defer(job, wait, error=f"Resolution time not reached (in {wait}s)")
+    
+    # Check if we are the resolver
+    if account:
+        resolver_address = await asyncio.to_thread(market_contract.functions.resolver().call)
+        if resolver_address.lower() != account.address.lower():
+            return queue.failed(job, "Not authorized resolver")
+    
+    # Fetch market data
+    if job.collection_slug and job.target_price is not None:
+        collection_slug, target_price = job.collection_slug, job.target_price
+    else:
+        market_data = await fetch_market_data(job.market)
+        if market_data is None:
+            return queue.retry(job, "Market data unavailable")
+        collection_slug = market_data.collection_slug
+        target_price = market_data.target_price
+    
+    # Get floor price
+    floor_price = await fetch_floor_price(collection_slug)
+    
+    if floor_price is None:
+        return queue.retry(job, "Failed to fetch floor price")
+    
+    # Convert to wei
+    final_price_wei = w3.to_wei(floor_price, 'ether')
+    
+    logger.info(f"Resolving market {job.market}")
+    logger.info(f"  Target Price: {w3.from_wei(target_price, 'ether')} ETH")
+    logger.info(f"  Final Price: {floor_price} ETH")
+    logger.info(f"  Winner: {'YES' if final_price_wei > target_price else 'NO'}")
+    
+    return queue.priced(job, collection_slug, target_price, final_price_wei)
+
+
+async def submit_job(job: jobqueue.ResolutionJob) -> jobqueue.ResolutionJob:
+    """Simulate resolveMarket, then sign it, store it with its nonce and broadcast it"""
+    from common import rpc
+    
+    w3 = get_web3()
+    account = get_account()
+    nonces = get_nonces()
+    queue = jobqueue.queue
+    
+    market_contract = w3.eth.contract(
+        address=w3.to_checksum_address(job.market),
+        abi=MARKET_ABI
+    )
+    resolve_call = market_contract.functions.resolveMarket(job.final_price)
+    
+    # A revert costs gas and proves nothing; re-run the pre-flight checks instead
+    simulation = await rpc.fee_oracle.simulate(
+        ("resolveMarket", job.market, job.final_price), resolve_call, account.address
+    )
+    if not simulation.ok:
+        return queue.retry(job, f"Simulation reverted: {simulation.error}", state=jobqueue.DUE)
+    
+    nonce = await nonces.reserve()
+    try:
+        tx_params = await rpc.fee_oracle.tx_params(account.address, nonce, simulation)
+        signed_tx = account.sign_transaction(resolve_call.build_transaction(tx_params))
+    except Exception as e:
+        nonces.resync()
+        return queue.retry(job, f"Could not build transaction: {e}", state=jobqueue.DUE)
+    
+    # Persist before broadcasting, so a crash in between re-sends this exact transaction
+    job = queue.submitted(
+        job, w3.to_hex(signed_tx.hash), w3.to_hex(signed_tx.rawTransaction), nonce,
+        tx_params["gas"], tx_params["maxFeePerGas"], tx_params["maxPriorityFeePerGas"]
+    )
+    return await broadcast_job(job)
+
+
+async def replace_job(job: jobqueue.ResolutionJob) -> jobqueue.ResolutionJob:
+    """Re-sign a stuck transaction with the same nonce and higher fees, then broadcast it"""
+    from common import rpc
+    
+    w3 = get_web3()
+    account = get_account()
+    queue = jobqueue.queue
+    
+    fees = await rpc.fee_oracle.replacement_fees(
+        job.max_fee or 0, job.priority_fee or 0, cap=w3.to_wei(MAX_FEE_GWEI, 'gwei')
+    )
+    if fees is None or job.gas is None:
+        # At the fee cap (or a job stored before fees were kept): keep offering the last one
+        return await broadcast_job(job)
+    
+    market_contract = w3.eth.contract(address=w3.to_checksum_address(job.market), abi=MARKET_ABI)
+    try:
+        tx = market_contract.functions.resolveMarket(job.final_price).build_transaction({
+            "from": account.address,
+            "nonce": job.nonce,
+            "gas": job.gas,
+            "chainId": await asyncio.to_thread(rpc.chain_id),
+            **fees,
         })
+        signed_tx = account.sign_transaction(tx)
+    except Exception as e:
+        return queue.retry(job, f"Could not build replacement transaction: {e}")
+    
+    logger.info(
+        f"⛽ Replacing {job.tx_hash} (nonce {job.nonce}): max fee "
+        f"{w3.from_wei(job.max_fee or 0, 'gwei')} -> {w3.from_wei(fees['maxFeePerGas'], 'gwei')} gwei"
+    )
+    job = queue.replaced(
+        job, w3.to_hex(signed_tx.hash), w3.to_hex(signed_tx.rawTransaction),
+        fees["maxFeePerGas"], fees["maxPriorityFeePerGas"]
+    )
+    return await broadcast_job(job)
+
+
+async def broadcast_job(job: jobqueue.ResolutionJob) -> jobqueue.ResolutionJob:
+    """Send the stored signed transaction; repeating this is harmless"""
+    w3 = get_web3()
+    queue = jobqueue.queue
+    
+    try:
+        tx_hash = await asyncio.to_thread(w3.eth.send_raw_transaction, job.raw_tx)
+    except Exception as e:
+        # The node may already have it; the receipt and nonce checks sort that out
+        get_nonces().resync()
+        return queue.retry(job, f"Broadcast failed: {e}")
+    
+    return queue.defer(job, JOB_TICK, tx_hash=w3.to_hex(tx_hash), submitted_at=time.time(), error=None)
+
+
+def settle_job(job: jobqueue.ResolutionJob, receipt) -> jobqueue.ResolutionJob:
+    """Apply a mined receipt (of any transaction sent for the job's nonce) to a submitted job"""
+    tx_hash = get_web3().to_hex(receipt.transactionHash)
+    if receipt.status == 1:
+        logger.info(f"✅ Market resolved: {tx_hash}")
+        return jobqueue.queue.confirmed(job, tx_hash=tx_hash)
+    
+    # Re-run the pre-flight checks: someone else may have resolved it meanwhile
+    return jobqueue.queue.retry(job, "Transaction reverted", state=jobqueue.DUE)
+
+
+async def check_submitted_job(job: jobqueue.ResolutionJob) -> jobqueue.ResolutionJob:
+    """Settle a submitted job from a receipt, re-broadcast or replace it, or start over if it was dropped"""
+    w3 = get_web3()
+    account = get_account()
+    
+    # Any transaction sent with this nonce may be the one mined, newest most likely
+    for tx_hash in reversed(job.sent_hashes):
+        try:
+            receipt = await asyncio.to_thread(w3.eth.get_transaction_receipt, tx_hash)
+        except Exception:
+            continue  # Not mined (or not visible to this node)
+        if receipt is not None:
+            return settle_job(job, receipt)
+    
+    mined_nonce = await asyncio.to_thread(w3.eth.get_transaction_count, account.address, "latest")
+    if mined_nonce > job.nonce:
+        # Our nonce was used by another transaction, so none of ours can be mined
+        get_nonces().resync()
+        return jobqueue.queue.retry(job, "Transaction dropped", state=jobqueue.DUE)
+    
+    if time.time() - (job.submitted_at or 0) > TX_TIMEOUT:
+        # Still pending: a transaction stuck on its fee stays stuck when re-sent as-is
+        return await replace_job(job)
+    
+    if job.error:
+        return await broadcast_job(job)
+    
+    return jobqueue.queue.defer(job, JOB_TICK)
+
+
+async def advance_job(job: jobqueue.ResolutionJob, wait: bool = False) -> jobqueue.ResolutionJob:
+    """
+    Move a job through its states until it finishes or has to wait.
+    
+    With `wait`, a submitted transaction is awaited for up to two minutes;
+    otherwise its receipt is checked on a later tick.
+    """
+    while not job.terminal and job.next_attempt <= time.time():
+        if job.state == jobqueue.DUE:
+            job = await price_job(job)
         
-        # Sign and send
-        signed_tx = w3.eth.account.sign_transaction(tx, resolver_pk)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+        elif job.state == jobqueue.PRICED:
+            if time.time() - (job.priced_at or 0) > PRICE_MAX_AGE:
+                # Never settle on a floor price observed long before the transaction
+                job = jobqueue.queue.defer(job, 0, state=jobqueue.DUE, error="Final price expired - re-pricing")
+                continue
+            if not get_account():
+                break
+            job = await submit_job(job)
         
-        # Wait for confirmation
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
+        elif job.state == jobqueue.SUBMITTED:
+            job = await check_submitted_job(job)
         
-        if receipt.status == 1:
-            logger.info(f"✅ Market resolved: {tx_hash.hex()}")
-            
-            return MarketResolutionResponse(
-                market_address=market_address,
-                success=True,
-                transaction_hash=tx_hash.hex(),
-                final_price=floor_price,
-                winning_outcome=winning_outcome,
-                error=None,
-                timestamp=datetime.utcnow().isoformat()
-            )
+        if wait and job.state == jobqueue.SUBMITTED and not job.error:
+            w3 = get_web3()
+            try:
+                receipt = await asyncio.to_thread(w3.eth.wait_for_transaction_receipt, job.tx_hash, timeout=120)
+            except Exception:
+                break  # Still pending; the job tick keeps watching it
+            job = settle_job(job, receipt)
+    
+    return job
+
+
+def job_response(job: jobqueue.ResolutionJob) -> MarketResolutionResponse:
+    """Describe a job's current state as a resolution response"""
+    final_price = None
+    winning_outcome = None
+    if job.final_price is not None:
+        final_price = float(get_web3().from_wei(job.final_price, 'ether'))
+        winning_outcome = job.final_price > (job.target_price or 0)
+    
+    success = job.state == jobqueue.CONFIRMED and job.tx_hash is not None
+    error = None
+    if not success:
+        if job.state == jobqueue.PRICED and not get_account():
+            error = "No resolver account configured"
         else:
-            return MarketResolutionResponse(
-                market_address=market_address,
-                success=False,
-                transaction_hash=tx_hash.hex(),
-                final_price=floor_price,
-                winning_outcome=winning_outcome,
-                error="Transaction reverted",
-                timestamp=datetime.utcnow().isoformat()
-            )
+            error = job.error or f"Resolution {job.state}"
+    
+    return MarketResolutionResponse(
+        market_address=job.market,
+        success=success,
+        transaction_hash=job.tx_hash,
+        final_price=final_price,
+        winning_outcome=winning_outcome,
+        error=error,
+        timestamp=datetime.utcnow().isoformat()
+    )
+
+
+@metrics.timed("resolver")
+async def resolve_market(market_address: str) -> MarketResolutionResponse:
+    """Resolve a market on-chain, resuming its stored job if it has one"""
+    try:
+        async with job_lock(market_address):
+            job = jobqueue.queue.enqueue(market_address)
+            if job.state == jobqueue.FAILED:
+                # An explicit request gets a fresh set of attempts
+                job = jobqueue.queue.reopen(job)
+            
+            job = await advance_job(job, wait=True)
+        
+        return job_response(job)
             
     except Exception as e:
         logger.error(f"Resolution error: {e}", exc_info=True)
@@ -347,22 +532,67 @@ async def resolve_market(market_address: str) -> MarketResolutionResponse:
         )
 
 
+async def run_due_jobs(ctx: Context):
+    """Advance every job whose next step is due"""
+    if not get_account():
+        update_job_gauges()
+        return
+    
+    for job in jobqueue.queue.ready(time.time(), limit=JOB_BATCH):
+        async with job_lock(job.market):
+            # A manual request may have moved it on while we waited
+            job = jobqueue.queue.get(job.market)
+            before = job.state
+            
+            try:
+                job = await advance_job(job)
+            except Exception as e:
+                job = jobqueue.queue.retry(job, str(e))
+        
+        if job.state == jobqueue.CONFIRMED and before != jobqueue.CONFIRMED:
+            ctx.logger.info(f"✅ Market resolved: {job.market} ({job.tx_hash or job.error})")
+        elif job.state == jobqueue.FAILED:
+            ctx.logger.error(f"❌ Resolution failed: {job.market}: {job.error}")
+        elif job.state != before:
+            ctx.logger.info(f"⚖️ {job.market}: {before} → {job.state}")
+        elif job.error:
+            ctx.logger.warning(f"⚠️ {job.market} ({job.state}, attempt {job.attempts}): {job.error}")
+    
+    update_job_gauges()
+
+
+async def shed_resolve_request(ctx: Context, sender: str, msg: ResolveMarketRequest):
+    """Tell the caller its resolution request was not admitted"""
+    await ctx.send(sender, MarketResolutionResponse(
+        market_address=msg.market_address,
+        success=False,
+        transaction_hash=None,
+        final_price=None,
+        winning_outcome=None,
+        error=workpool.OVERLOADED,
+        timestamp=datetime.utcnow().isoformat()
+    ))
+
+
 # Event Handlers
-@agent.on_event("startup")
 async def startup(ctx: Context):
     """Initialize agent on startup"""
     ctx.logger.info(f"⚖️ Resolver Agent starting...")
+    agent = get_agent()
     ctx.logger.info(f"📡 Address: {agent.address}")
     
+    metrics.start_server(METRICS_PORT)
+    
     # Fund agent if needed
     try:
+        from uagents.setup import fund_agent_if_low
         await fund_agent_if_low(agent.wallet.address())
         ctx.logger.info("✅ Agent funded")
     except:
         ctx.logger.warning("⚠️ Could not fund agent (requires testnet)")
 
 
-@agent.on_message(model=ResolveMarketRequest)
+@metrics.timed("resolver")
 async def handle_resolve_request(ctx: Context, sender: str, msg: ResolveMarketRequest):
     """Handle manual resolution requests"""
     ctx.logger.info(f"📥 Resolution request for {msg.market_address} from {sender[:8]}...")
@@ -371,9 +601,9 @@ async def handle_resolve_request(ctx: Context, sender: str, msg: ResolveMarketRe
     await ctx.send(sender, response)
 
 
-@agent.on_interval(period=600.0)
+@metrics.timed("resolver")
 async def check_markets_for_resolution(ctx: Context):
-    """Check for markets ready for resolution every 10 minutes"""
+    """Queue markets ready for resolution every 10 minutes"""
     ctx.logger.info("🔄 Checking for markets ready for resolution...")
     
     try:
@@ -382,25 +612,103 @@ async def check_markets_for_resolution(ctx: Context):
         ctx.logger.info(f"Found {len(markets)} markets ready for resolution")
         
         for market in markets:
-            ctx.logger.info(f"⚖️ Resolving market: {market['marketAddress']}")
-            
-            try:
-                response = await resolve_market(market['marketAddress'])
-                
-                if response.success:
-                    ctx.logger.info(f"✅ Market resolved: {response.transaction_hash}")
-                else:
-                    ctx.logger.error(f"❌ Resolution failed: {response.error}")
-                    
-            except Exception as e:
-                ctx.logger.error(f"Error resolving {market['marketAddress']}: {e}")
+            # Markets that already have a job keep it, whatever its state
+            jobqueue.queue.enqueue(
+                market.market_address,
+                market.collection_slug or None,
+                market.target_price or None
+            )
+        
+        await run_due_jobs(ctx)
             
     except Exception as e:
         ctx.logger.error(f"Check failed: {e}")
 
 
+@metrics.timed("resolver")
+async def process_resolution_jobs(ctx: Context):
+    """Retry, broadcast and confirm queued resolutions"""
+    try:
+        await run_due_jobs(ctx)
+    except Exception as e:
+        ctx.logger.error(f"Job processing failed: {e}")
+
+
+async def shutdown(ctx: Context):
+    """Close the job database cleanly"""
+    jobqueue.queue.close()
+
+
+@metrics.timed("resolver")
+async def sync_market_registry(ctx: Context):
+    """Follow MarketFactory and Market logs so resolution does not depend on the indexer"""
+    try:
+        added = await marketscan.scanner.sync()
+        if added:
+            ctx.logger.info(f"🧭 {added} new market(s); {len(marketscan.scanner.open_markets())} open")
+    except Exception as e:
+        ctx.logger.error(f"Market registry sync failed: {e}")
+
+
+# Agent Factory
+_agent: Optional[Agent] = None
+
+
+def create_agent() -> Agent:
+    """Build the agent and register its handlers"""
+    agent = Agent(
+        name="mcg_resolver",
+        seed=os.getenv("RESOLVER_SEED", "resolver_default_seed"),
+        port=int(os.getenv("RESOLVER_PORT", "8002")),
+        endpoint=[f"http://localhost:{os.getenv('RESOLVER_PORT', '8002')}/submit"],
+        resolve=addressbook.resolver_from_env()
+    )
+    
+    # Restore checkpointed state before anything else runs
+    checkpoints.register("opensea.floor_cache", opensea.floor_cache.snapshot, opensea.floor_cache.restore)
+    checkpoints.register("opensea.scheduler", opensea.scheduler.snapshot, opensea.scheduler.restore)
+    checkpoints.register("graphql.cache", graphql.cache.snapshot, graphql.cache.restore)
+    checkpoints.register("market_registry", marketscan.scanner.snapshot, marketscan.scanner.restore)
+    checkpoints.attach(agent)
+    
+    agent.on_event("startup")(startup)
+    # One resolution at a time keeps transaction nonces sequential
+    pool.lane("resolve", concurrency=1, max_queue=16)
+    agent.on_message(model=ResolveMarketRequest)(
+        pool.message("resolve", handle_resolve_request, shed_resolve_request)
+    )
+    agent.on_interval(period=600.0)(pool.interval(check_markets_for_resolution))
+    agent.on_interval(period=JOB_TICK)(pool.interval(process_resolution_jobs))
+    agent.on_event("shutdown")(shutdown)
+    if MARKET_SCAN_INTERVAL > 0:
+        agent.on_interval(period=MARKET_SCAN_INTERVAL)(pool.interval(sync_market_registry))
+    
+    # Runtime profiling control (see common/profiling.py)
+    profiling.register_control(agent)
+    
+    logger.info(f"✅ Resolver Agent initialized")
+    logger.info(f"📡 Agent Address: {agent.address}")
+    return agent
+
+
+def get_agent() -> Agent:
+    """The agent for this process, created on first use"""
+    global _agent
+    if _agent is None:
+        _agent = create_agent()
+    return _agent
+
+
+def __getattr__(name: str):
+    # `from resolver_agent import agent` still works, but only builds the agent when asked
+    if name == "agent":
+        return get_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 # Main entry point
 if __name__ == "__main__":
+    logs.configure()
     logger.info("🚀 Starting Resolver Agent...")
-    agent.run()
+    get_agent().run()
 
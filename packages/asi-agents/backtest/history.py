@@ -0,0 +1,290 @@
+"""
+Backtest History
+Loads exported Market, Trade and floor price history from local files (as the
+agents' Market and Trade records, see agents/common/records.py) and
+replays it in chronological order into point-in-time snapshots.
+
+Files in the data directory (optionally gzipped, e.g. trades.jsonl.gz):
+  markets.jsonl       One indexer Market per line (resolved ones are scored)
+  trades.jsonl        One indexer Trade per line
+  floor_prices.csv    collectionSlug,timestamp,floorPrice (ETH)
+"""
+
+import os
+import csv
+import gzip
+import json
+import math
+import random
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from common.records import WEI, Market, Position, Trade
+
+
+@dataclass
+class Outcome:
+    """How a resolved market ended"""
+    yes_won: bool
+    final_price: float  # ETH
+    target_price: float  # ETH
+
+
+@dataclass
+class MarketSnapshot:
+    """A market as the analyst would have seen it at one point in time"""
+    market: str
+    timestamp: int
+    market_data: Market  # Share totals, volume and trade count as of `timestamp`
+    floor_price: Optional[float]
+
+
+@dataclass
+class PortfolioSnapshot:
+    """A user's open positions at one point in time and how they ended"""
+    user: str
+    timestamp: int
+    positions: List[Position]
+    realized_return: float  # P&L at resolution over capital invested
+
+
+@dataclass
+class History:
+    markets: Dict[str, Market] = field(default_factory=dict)
+    trades: List[Trade] = field(default_factory=list)  # Time-ordered
+    # slug -> (timestamps, prices), time-ordered
+    floors: Dict[str, Tuple[List[int], List[float]]] = field(default_factory=dict)
+
+    def floor_at(self, slug: str, timestamp: int) -> Optional[float]:
+        """Last floor price observed at or before `timestamp`"""
+        series = self.floors.get(slug)
+        if not series:
+            return None
+        i = bisect_right(series[0], timestamp)
+        return series[1][i - 1] if i else None
+
+    def outcome(self, market: Market) -> Optional[Outcome]:
+        if market.status != "Resolved":
+            return None
+
+        target = market.target_price / WEI
+        if market.final_price is not None:
+            final = market.final_price / WEI
+        else:
+            final = self.floor_at(market.collection_slug, market.resolution_timestamp)
+            if final is None:
+                return None
+
+        yes_won = market.winning_outcome
+        if yes_won is None:
+            yes_won = final > target
+        return Outcome(yes_won=bool(yes_won), final_price=final, target_price=target)
+
+
+@dataclass
+class Replay:
+    """Everything the scorer needs, independent of heuristic parameters"""
+    outcomes: Dict[str, Outcome]
+    markets: List[MarketSnapshot]
+    portfolios: List[PortfolioSnapshot]
+
+
+def _open(path: str):
+    if os.path.exists(path + ".gz"):
+        return gzip.open(path + ".gz", "rt")
+    return open(path)
+
+
+def _jsonl(path: str) -> Iterator[Dict]:
+    with _open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def load_history(directory: str) -> History:
+    """Read the three history files from `directory`"""
+    history = History()
+
+    for row in _jsonl(os.path.join(directory, "markets.jsonl")):
+        market = Market.from_indexer(row)
+        history.markets[market.id.lower()] = market
+
+    history.trades = [Trade.from_indexer(row) for row in _jsonl(os.path.join(directory, "trades.jsonl"))]
+    history.trades.sort(key=lambda t: (t.timestamp, t.block_number))
+
+    points: Dict[str, List[Tuple[int, float]]] = {}
+    with _open(os.path.join(directory, "floor_prices.csv")) as f:
+        for row in csv.DictReader(f):
+            points.setdefault(row["collectionSlug"], []).append((int(row["timestamp"]), float(row["floorPrice"])))
+    for slug, series in points.items():
+        series.sort()
+        history.floors[slug] = ([t for t, _ in series], [p for _, p in series])
+
+    return history
+
+
+def replay(history: History, interval: int = 3600, portfolio_interval: int = 86400) -> Replay:
+    """
+    Step through history every `interval` seconds, applying trades in order.
+
+    At each step every resolved-later market that is open at that time is
+    snapshotted with its running share totals, trade count, volume and the
+    floor price known then. Every `portfolio_interval` each user's open
+    positions in those markets are snapshotted together with the return
+    they went on to realize, assuming they were held to resolution.
+    """
+    outcomes = {}
+    for market_id, market in history.markets.items():
+        outcome = history.outcome(market)
+        if outcome is not None:
+            outcomes[market_id] = outcome
+
+    # (created, resolves, id, slug) for every scored market, by creation time
+    scored = sorted(
+        (m.created_at, m.resolution_timestamp, market_id, m.collection_slug)
+        for market_id, m in history.markets.items() if market_id in outcomes
+    )
+    if not scored or not history.trades:
+        return Replay(outcomes=outcomes, markets=[], portfolios=[])
+
+    start = max(scored[0][0], history.trades[0].timestamp)
+    end = max(resolves for _, resolves, _, _ in scored)
+
+    state: Dict[str, Market] = {}
+    # (user, market) -> [yes shares, no shares, ETH bought, net ETH spent]
+    positions: Dict[Tuple[str, str], List[int]] = {}
+    market_snapshots: List[MarketSnapshot] = []
+    portfolio_snapshots: List[PortfolioSnapshot] = []
+
+    next_trade = 0
+    next_portfolio = start
+    timestamp = int(math.ceil(start / interval) * interval)
+
+    while timestamp <= end:
+        while next_trade < len(history.trades) and history.trades[next_trade].timestamp <= timestamp:
+            trade = history.trades[next_trade]
+            next_trade += 1
+
+            market = state.get(trade.market_id)
+            if market is None:
+                market = state[trade.market_id] = Market(id=trade.market_id, market_address=trade.market_id)
+            market.yes_shares_total = trade.yes_shares_total
+            market.no_shares_total = trade.no_shares_total
+            market.total_volume += trade.eth_amount
+            market.total_trades += 1
+
+            position = positions.setdefault((trade.user_id, trade.market_id), [0, 0, 0, 0])
+            sign = 1 if trade.is_buy else -1
+            position[0 if trade.outcome else 1] += sign * trade.share_amount
+            if trade.is_buy:
+                position[2] += trade.eth_amount
+            position[3] += sign * trade.eth_amount
+
+        open_markets = set()
+        for created, resolves, market_id, slug in scored:
+            if created > timestamp:
+                break
+            if timestamp >= resolves or market_id not in state:
+                continue
+            open_markets.add(market_id)
+            market_snapshots.append(MarketSnapshot(
+                market=market_id,
+                timestamp=timestamp,
+                market_data=state[market_id].replace(),
+                floor_price=history.floor_at(slug, timestamp)
+            ))
+
+        if timestamp >= next_portfolio:
+            next_portfolio = timestamp + portfolio_interval
+            portfolio_snapshots.extend(_portfolios(positions, open_markets, outcomes, timestamp))
+
+        timestamp += interval
+
+    return Replay(outcomes=outcomes, markets=market_snapshots, portfolios=portfolio_snapshots)
+
+
+def _portfolios(positions, open_markets, outcomes, timestamp) -> List[PortfolioSnapshot]:
+    by_user: Dict[str, List[Tuple[str, List[int]]]] = {}
+    for (user, market_id), position in positions.items():
+        if market_id in open_markets and position[2] > 0:
+            by_user.setdefault(user, []).append((market_id, position))
+
+    snapshots = []
+    for user, held in by_user.items():
+        invested = sum(p[2] for _, p in held)
+        # Each winning share redeems for 1 ETH
+        payout = sum(p[0] if outcomes[m].yes_won else p[1] for m, p in held)
+        pnl = payout - sum(p[3] for _, p in held)
+        snapshots.append(PortfolioSnapshot(
+            user=user,
+            timestamp=timestamp,
+            positions=[
+                Position(market_id=m, user_id=user, yes_shares=p[0], no_shares=p[1], total_invested=p[2])
+                for m, p in held
+            ],
+            realized_return=pnl / invested
+        ))
+    return snapshots
+
+
+def write_synthetic(directory: str, num_markets: int = 200, days: int = 90, seed: int = 7):
+    """Generate a plausible history for trying the backtester without an indexer export"""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    slugs = [f"collection-{i}" for i in range(max(1, num_markets // 10))]
+    start = 1_700_000_000
+    end = start + days * 86400
+
+    # Hourly floor prices as a random walk per collection
+    floors = {}
+    with open(os.path.join(directory, "floor_prices.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["collectionSlug", "timestamp", "floorPrice"])
+        for slug in slugs:
+            price = rng.uniform(1, 30)
+            series = []
+            for t in range(start, end + 1, 3600):
+                price *= math.exp(rng.gauss(0, 0.01))
+                series.append((t, price))
+                writer.writerow([slug, t, f"{price:.6f}"])
+            floors[slug] = series
+
+    users = [f"0x{i:040x}" for i in range(1, num_markets * 2)]
+    with open(os.path.join(directory, "markets.jsonl"), "w") as markets_file, \
+            open(os.path.join(directory, "trades.jsonl"), "w") as trades_file:
+        for i in range(num_markets):
+            market_id = f"0x{0xabc000 + i:040x}"
+            slug = slugs[i % len(slugs)]
+            created = rng.randint(start, end - 14 * 86400)
+            resolves = created + rng.randint(3, 14) * 86400
+            floor_now = floors[slug][(created - start) // 3600][1]
+            target = floor_now * rng.uniform(0.9, 1.1)
+            final = floors[slug][min(len(floors[slug]) - 1, (resolves - start) // 3600)][1]
+
+            yes_total = no_total = 0
+            trade_count = rng.randint(5, 200)
+            for t in sorted(rng.randint(created, resolves - 1) for _ in range(trade_count)):
+                # Traders lean towards the side the floor is moving to
+                floor_then = floors[slug][(t - start) // 3600][1]
+                outcome = rng.random() < (0.65 if floor_then > target else 0.35)
+                shares = rng.randint(1, 20) * WEI
+                eth = int(shares * rng.uniform(0.3, 0.7))
+                if outcome:
+                    yes_total += shares
+                else:
+                    no_total += shares
+                trades_file.write(json.dumps({
+                    "market_id": market_id, "user_id": rng.choice(users), "outcome": outcome, "isBuy": True,
+                    "shareAmount": str(shares), "ethAmount": str(eth),
+                    "yesSharesTotal": str(yes_total), "noSharesTotal": str(no_total),
+                    "timestamp": str(t), "blockNumber": str(t // 2)
+                }) + "\n")
+
+            markets_file.write(json.dumps({
+                "id": market_id, "marketAddress": market_id, "collectionSlug": slug,
+                "targetPrice": str(int(target * WEI)), "resolutionTimestamp": str(resolves),
+                "status": "Resolved", "winningOutcome": final > target, "finalPrice": str(int(final * WEI)),
+                "createdAt": str(created)
+            }) + "\n")
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+"""
+Heuristic Backtester
+Replays exported Market, Trade and floor price history through the market
+analyst's analyze_sentiment/predict_price and the portfolio advisor's
+calculate_risk_score, scores them against how markets actually resolved,
+and sweeps their parameters across a process pool.
+
+Usage:
+  python backtest/run_backtest.py --data history/
+  python backtest/run_backtest.py --data history/ \\
+      --sweep sentiment.bullish_threshold=0.55:0.7:0.05 --sweep prediction.bullish_move=0.05,0.1,0.2
+  python backtest/run_backtest.py --synthetic 300 --data /tmp/mcg-history   # generate, then run
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field, fields, replace
+from typing import Dict, List, Optional
+
+BACKTEST_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BACKTEST_DIR)
+sys.path.insert(0, os.path.join(ROOT, "agents"))
+
+# Agents log at import; keep worker output to the results
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from history import Replay, load_history, replay, write_synthetic  # noqa: E402
+from market_analyst import PredictionParams, SentimentParams, analyze_sentiment, predict_price  # noqa: E402
+from portfolio_advisor import RiskParams, calculate_risk_score  # noqa: E402
+
+# Metrics where higher is better; everything else is minimized
+MAXIMIZE = {"hit_rate", "coverage", "price_skill", "risk_correlation"}
+
+
+@dataclass(frozen=True)
+class Params:
+    """One point in the parameter space"""
+    sentiment: SentimentParams = field(default_factory=SentimentParams)
+    prediction: PredictionParams = field(default_factory=PredictionParams)
+    risk: RiskParams = field(default_factory=RiskParams)
+
+
+# Set once per worker process by the pool initializer
+_replay: Optional[Replay] = None
+
+
+def _init_worker(data: Replay):
+    global _replay
+    _replay = data
+
+
+def score(params: Params, data: Optional[Replay] = None) -> Dict:
+    """Run every snapshot through the heuristics and score them against outcomes"""
+    data = data or _replay
+    outcomes = data.outcomes
+
+    decided = hits = 0
+    brier = 0.0
+    price_error = baseline_error = 0.0
+    priced = 0
+
+    for snapshot in data.markets:
+        outcome = outcomes[snapshot.market]
+        sentiment, confidence, recommendation = analyze_sentiment(snapshot.market_data, params.sentiment)
+
+        # Probability of YES implied by the call, for a calibration score
+        if recommendation == "buy_yes":
+            p_yes = confidence
+        elif recommendation == "buy_no":
+            p_yes = 1.0 - confidence
+        else:
+            p_yes = 0.5
+        brier += (p_yes - outcome.yes_won) ** 2
+
+        if recommendation != "hold":
+            decided += 1
+            hits += (recommendation == "buy_yes") == outcome.yes_won
+
+        predicted = predict_price(snapshot.floor_price, sentiment, confidence, params.prediction)
+        if predicted is not None and outcome.final_price > 0:
+            priced += 1
+            price_error += abs(predicted - outcome.final_price) / outcome.final_price
+            baseline_error += abs(snapshot.floor_price - outcome.final_price) / outcome.final_price
+
+    risks, swings = [], []
+    for snapshot in data.portfolios:
+        risks.append(calculate_risk_score(snapshot.positions, params.risk))
+        swings.append(abs(snapshot.realized_return))
+
+    total = len(data.markets)
+    return {
+        "snapshots": total,
+        "coverage": decided / total if total else 0.0,
+        "hit_rate": hits / decided if decided else 0.0,
+        "brier": brier / total if total else 0.0,
+        "price_mape": price_error / priced if priced else 0.0,
+        # Improvement over predicting "the floor stays where it is"
+        "price_skill": 1.0 - price_error / baseline_error if baseline_error else 0.0,
+        "portfolios": len(risks),
+        # Riskier portfolios should see larger swings at resolution
+        "risk_correlation": _correlation(risks, swings),
+    }
+
+
+def _correlation(xs: List[float], ys: List[float]) -> float:
+    n = len(xs)
+    if n < 2:
+        return 0.0
+    mean_x, mean_y = sum(xs) / n, sum(ys) / n
+    cov = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    var_y = sum((y - mean_y) ** 2 for y in ys)
+    return cov / (var_x * var_y) ** 0.5 if var_x and var_y else 0.0
+
+
+def parse_values(spec: str) -> List[float]:
+    """`a,b,c` or `start:stop:step` (inclusive)"""
+    if ":" in spec:
+        start, stop, step = (float(v) for v in spec.split(":"))
+        count = int(round((stop - start) / step)) + 1
+        return [round(start + i * step, 10) for i in range(count)]
+    return [float(v) for v in spec.split(",")]
+
+
+def build_grid(sweeps: List[str]) -> List[Params]:
+    """Cartesian product of `group.field=values` sweeps around the defaults"""
+    axes = []
+    base = Params()
+    for sweep in sweeps:
+        name, spec = sweep.split("=", 1)
+        group, field_name = name.split(".", 1)
+        target = getattr(base, group, None)
+        if target is None or field_name not in {f.name for f in fields(target)}:
+            raise SystemExit(f"Unknown parameter {name}")
+        axes.append([(group, field_name, value) for value in parse_values(spec)])
+
+    grid = []
+    for combination in itertools.product(*axes):
+        params = base
+        for group, field_name, value in combination:
+            params = replace(params, **{group: replace(getattr(params, group), **{field_name: value})})
+        grid.append(params)
+    return grid
+
+
+def describe(params: Params) -> str:
+    """Parameters that differ from the defaults"""
+    changed = []
+    defaults = Params()
+    for group in ("sentiment", "prediction", "risk"):
+        current, default = getattr(params, group), getattr(defaults, group)
+        for f in fields(current):
+            if getattr(current, f.name) != getattr(default, f.name):
+                changed.append(f"{group}.{f.name}={getattr(current, f.name):g}")
+    return " ".join(changed) or "defaults"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", required=True, help="Directory with markets.jsonl, trades.jsonl, floor_prices.csv")
+    parser.add_argument("--synthetic", type=int, metavar="MARKETS", help="Generate a synthetic history into --data first")
+    parser.add_argument("--days", type=int, default=90, help="Length of the synthetic history")
+    parser.add_argument("--interval", type=int, default=3600, help="Seconds between market snapshots")
+    parser.add_argument("--portfolio-interval", type=int, default=86400, help="Seconds between portfolio snapshots")
+    parser.add_argument("--sweep", action="append", default=[], help="group.field=values, e.g. sentiment.bullish_threshold=0.55:0.7:0.05")
+    parser.add_argument("--objective", default="brier", help="Metric to rank parameter sets by")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes for the sweep")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--output", help="Write every result as JSON")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        write_synthetic(args.data, args.synthetic, args.days)
+
+    started = time.perf_counter()
+    history = load_history(args.data)
+    data = replay(history, args.interval, args.portfolio_interval)
+    print(
+        f"Replayed {len(history.trades)} trades across {len(data.outcomes)} resolved markets: "
+        f"{len(data.markets)} market and {len(data.portfolios)} portfolio snapshots "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+    if not data.markets:
+        raise SystemExit("Nothing to score - no resolved markets with trades")
+
+    grid = build_grid(args.sweep)
+    started = time.perf_counter()
+    if len(grid) == 1 or args.workers <= 1:
+        results = [score(params, data) for params in grid]
+    else:
+        # The replay is shipped to each worker once, not with every task
+        with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(data,)) as executor:
+            results = list(executor.map(score, grid, chunksize=max(1, len(grid) // (args.workers * 4))))
+    print(f"Scored {len(grid)} parameter set(s) in {time.perf_counter() - started:.1f}s\n")
+
+    if results and args.objective not in results[0]:
+        raise SystemExit(f"Unknown objective {args.objective}; one of {', '.join(results[0])}")
+    ranked = sorted(zip(grid, results), key=lambda r: r[1][args.objective], reverse=args.objective in MAXIMIZE)
+
+    print(f"{'brier':>7} {'hit':>6} {'cover':>6} {'mape':>7} {'skill':>7} {'risk r':>7}  parameters")
+    for params, result in ranked[:args.top]:
+        print(
+            f"{result['brier']:>7.4f} {result['hit_rate']:>6.1%} {result['coverage']:>6.1%} "
+            f"{result['price_mape']:>7.2%} {result['price_skill']:>+7.3f} {result['risk_correlation']:>+7.3f}  {describe(params)}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump([{"params": asdict(p), "metrics": r} for p, r in ranked], f, indent=2)
+        print(f"\nSaved results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
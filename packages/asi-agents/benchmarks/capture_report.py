@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""
+Capture Report
+Summarises an upstream capture (see agents/common/capture.py): calls, error
+rate, rate and latency percentiles per upstream operation, so a recorded
+session's traffic shape can be checked before it is replayed.
+
+Usage:
+  python benchmarks/capture_report.py captures/upstream.jsonl.gz
+"""
+
+import os
+import sys
+import gzip
+import json
+import argparse
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+
+from run_benchmarks import percentile  # noqa: E402
+
+
+def load(path: str) -> List[Dict]:
+    entries = []
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                if "capture" not in entry:
+                    entries.append(entry)
+    except (EOFError, json.JSONDecodeError):
+        print(f"(capture ends in a partial record after {len(entries)} calls)")
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="Capture file written with UPSTREAM_CAPTURE=record")
+    args = parser.parse_args()
+
+    entries = load(args.path)
+    if not entries:
+        raise SystemExit("Empty capture")
+
+    groups: Dict[Tuple[str, str], List[Dict]] = defaultdict(list)
+    for entry in entries:
+        groups[(entry["u"], entry["o"])].append(entry)
+    duration = max(e["t"] + e["l"] for e in entries) or 1.0
+    distinct = len({e["k"] for e in entries})
+
+    print(f"{len(entries)} calls ({distinct} distinct requests) over {duration:.1f}s\n")
+    print(f"{'upstream':<9} {'operation':<28} {'calls':>7} {'/s':>7} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for (upstream, operation), group in sorted(groups.items(), key=lambda g: -len(g[1])):
+        latencies = sorted(e["l"] * 1000 for e in group)
+        errors = sum(1 for e in group if "e" in e)
+        print(
+            f"{upstream:<9} {operation[:28]:<28} {len(group):>7} {len(group) / duration:>7.2f} {errors / len(group):>7.1%} "
+            f"{percentile(latencies, 50):>8.1f} {percentile(latencies, 95):>8.1f} {percentile(latencies, 99):>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+"""
+Cold Start Import Budget
+Measures what each agent module costs to import and to build its agent, in a
+fresh interpreter per agent, and fails when a budget is exceeded or a heavy
+dependency is loaded before it is needed.
+
+Usage:
+  python benchmarks/import_budget.py
+  python benchmarks/import_budget.py --top 15 --budgets budgets.json
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENTS_DIR = os.path.join(os.path.dirname(BENCH_DIR), "agents")
+
+AGENT_MODULES = ["market_analyst", "resolver_agent", "portfolio_advisor", "oracle_agent"]
+
+# Milliseconds, per agent: "import" is the module import, "create" is create_agent()
+DEFAULT_BUDGETS: Dict[str, Dict[str, float]] = {
+    "market_analyst": {"import": 1500.0, "create": 500.0},
+    "resolver_agent": {"import": 1500.0, "create": 500.0},
+    "portfolio_advisor": {"import": 1500.0, "create": 500.0},
+    "oracle_agent": {"import": 1500.0, "create": 500.0},
+}
+
+# Modules that must not be loaded by importing or building an agent; they are
+# only needed once a request actually reaches the network, the chain or the risk model
+FORBIDDEN_AT_IMPORT = ["web3", "eth_account", "requests", "numpy"]
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+PROBE = """
+import sys, time, json
+sys.path.insert(0, {agents_dir!r})
+t0 = time.perf_counter()
+import {module} as m
+t1 = time.perf_counter()
+after_import = set(sys.modules)
+m.create_agent()
+t2 = time.perf_counter()
+print("@@PROBE@@" + json.dumps({{
+    "import_ms": (t1 - t0) * 1000,
+    "create_ms": (t2 - t1) * 1000,
+    "after_import": sorted(after_import),
+    "after_create": sorted(sys.modules),
+}}))
+"""
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, float, int]]:
+    """Parse -X importtime output into (module, cumulative ms, depth)"""
+    rows = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            _, cumulative, indent, module = match.groups()
+            rows.append((module, int(cumulative) / 1000, len(indent) // 2))
+    return rows
+
+
+def measure(module: str) -> Dict:
+    """Import and build one agent in a fresh interpreter"""
+    env = dict(os.environ)
+    env.setdefault("LOG_LEVEL", "WARNING")
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(agents_dir=AGENTS_DIR, module=module)],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=AGENTS_DIR,
+    )
+
+    probe = None
+    for line in proc.stdout.splitlines():
+        if line.startswith("@@PROBE@@"):
+            probe = json.loads(line[len("@@PROBE@@"):])
+
+    if proc.returncode != 0 or probe is None:
+        tail = "\n".join(proc.stderr.splitlines()[-5:])
+        return {"module": module, "error": tail or f"exit code {proc.returncode}"}
+
+    return {
+        "module": module,
+        "import_ms": probe["import_ms"],
+        "create_ms": probe["create_ms"],
+        "imports": parse_importtime(proc.stderr),
+        "after_import": set(probe["after_import"]),
+        "after_create": set(probe["after_create"]),
+    }
+
+
+def top_offenders(imports: List[Tuple[str, float, int]], n: int) -> List[Tuple[str, float]]:
+    """The n most expensive top-level packages by cumulative import time"""
+    costs: Dict[str, float] = {}
+    for module, cumulative, depth in imports:
+        if depth == 0:
+            root = module.split(".")[0]
+            costs[root] = costs.get(root, 0.0) + cumulative
+    return sorted(costs.items(), key=lambda item: item[1], reverse=True)[:n]
+
+
+def check(result: Dict, budgets: Dict[str, Dict[str, float]]) -> List[str]:
+    """Budget and forbidden-module violations for one agent"""
+    module = result["module"]
+    violations = []
+
+    budget = budgets.get(module, {})
+    for phase in ("import", "create"):
+        limit = budget.get(phase)
+        took = result[f"{phase}_ms"]
+        if limit is not None and took > limit:
+            violations.append(f"{phase} took {took:.0f}ms (budget {limit:.0f}ms)")
+
+    for name in FORBIDDEN_AT_IMPORT:
+        for phase in ("import", "create"):
+            if name in result[f"after_{phase}"]:
+                violations.append(f"'{name}' loaded during {phase}")
+                break
+
+    return violations
+
+
+def load_budgets(path: Optional[str]) -> Dict[str, Dict[str, float]]:
+    """Default budgets, overridden per agent from a JSON file"""
+    budgets = {module: dict(limits) for module, limits in DEFAULT_BUDGETS.items()}
+    if path:
+        with open(path) as f:
+            for module, limits in json.load(f).items():
+                budgets.setdefault(module, {}).update(limits)
+    return budgets
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check agent cold start import budgets")
+    parser.add_argument("--only", nargs="*", choices=AGENT_MODULES, help="Agents to measure")
+    parser.add_argument("--budgets", help="JSON file of {module: {import: ms, create: ms}}")
+    parser.add_argument("--top", type=int, default=10, help="Offending imports to list per agent")
+    args = parser.parse_args()
+
+    budgets = load_budgets(args.budgets)
+    failed = False
+
+    for module in args.only or AGENT_MODULES:
+        result = measure(module)
+        print(f"\n=== {module} ===")
+
+        if "error" in result:
+            print(f"❌ could not import: {result['error']}")
+            failed = True
+            continue
+
+        print(f"import {result['import_ms']:8.1f} ms   create_agent {result['create_ms']:8.1f} ms")
+        for name, cost in top_offenders(result["imports"], args.top):
+            print(f"  {cost:8.1f} ms  {name}")
+
+        violations = check(result, budgets)
+        for violation in violations:
+            print(f"❌ {violation}")
+        if not violations:
+            print("✅ within budget")
+        failed = failed or bool(violations)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+"""
+Fleet Load Generator
+Starts run_all_agents.py locally and floods the agents over the real uAgents
+transport with a configurable message mix, stepping the offered rate up to
+find the saturation point.
+
+Usage:
+  python benchmarks/loadgen.py --offline --rates 5 10 20 50 100
+  python benchmarks/loadgen.py --mix price=0.6 analysis=0.3 portfolio=0.1 --step-duration 60
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import logging
+import argparse
+import subprocess
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(ROOT, "agents"))
+
+from run_benchmarks import RESULTS_DIR, git_revision, percentile  # noqa: E402
+
+logger = logging.getLogger("loadgen")
+
+# Agent identities as configured for local runs (seed env var, default seed, port env var, default port)
+FLEET = {
+    "analyst": ("MARKET_ANALYST_SEED", "market_analyst_default_seed", "MARKET_ANALYST_PORT", 8001),
+    "resolver": ("RESOLVER_SEED", "resolver_default_seed", "RESOLVER_PORT", 8002),
+    "portfolio": ("PORTFOLIO_ADVISOR_SEED", "portfolio_advisor_default_seed", "PORTFOLIO_ADVISOR_PORT", 8003),
+    "oracle": ("ORACLE_SEED", "oracle_default_seed", "ORACLE_PORT", 8004),
+}
+
+DEFAULT_MIX = {"price": 0.5, "analysis": 0.3, "portfolio": 0.15, "resolve": 0.05}
+
+
+@dataclass
+class StepResult:
+    """Outcome of one offered-rate step"""
+    target_rate: float
+    sent: int = 0
+    received: int = 0
+    shed: int = 0
+    latencies: List[float] = field(default_factory=list)
+    by_kind: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    duration: float = 0.0
+    
+    def summary(self) -> Dict:
+        latencies = sorted(self.latencies)
+        dropped = self.sent - self.received - self.shed
+        return {
+            "target_rate": self.target_rate,
+            "achieved_rate": round(self.received / self.duration, 2) if self.duration else 0.0,
+            "sent": self.sent,
+            "received": self.received,
+            "drop_rate": round(dropped / self.sent, 4) if self.sent else 0.0,
+            "shed_rate": round(self.shed / self.sent, 4) if self.sent else 0.0,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "p95_ms_by_kind": {
+                kind: round(percentile(sorted(values), 95) * 1000, 1)
+                for kind, values in self.by_kind.items()
+            },
+        }
+
+
+class PendingRequests:
+    """Matches responses to outstanding requests by (kind, key), oldest first"""
+    
+    def __init__(self):
+        self._pending: Dict[Tuple[str, str], Deque[Tuple[float, StepResult]]] = defaultdict(deque)
+    
+    def add(self, kind: str, key: str, step: StepResult):
+        self._pending[(kind, key)].append((time.perf_counter(), step))
+        step.sent += 1
+    
+    def complete(self, kind: str, key: str, error: Optional[str] = None):
+        queue = self._pending.get((kind, key))
+        if not queue:
+            return
+        sent_at, step = queue.popleft()
+        if error is not None:
+            # Shed by the agent's work pool; counted apart from served requests
+            step.shed += 1
+            return
+        latency = time.perf_counter() - sent_at
+        step.received += 1
+        step.latencies.append(latency)
+        step.by_kind[kind].append(latency)
+
+
+def address_for(seed: str) -> str:
+    from uagents.crypto import Identity
+    return Identity.from_seed(seed, 0).address
+
+
+def wait_for_port(port: int, timeout: float) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return True
+        time.sleep(0.5)
+    return False
+
+
+def parse_mix(entries: Optional[List[str]]) -> Dict[str, float]:
+    if not entries:
+        return DEFAULT_MIX
+    mix = {}
+    for entry in entries:
+        kind, _, weight = entry.partition("=")
+        if kind not in DEFAULT_MIX:
+            raise SystemExit(f"Unknown message kind '{kind}' (choose from {', '.join(DEFAULT_MIX)})")
+        mix[kind] = float(weight)
+    return mix
+
+
+def find_knee(steps: List[Dict], max_drop: float, max_p95_ms: float) -> Optional[Dict]:
+    """First step where the fleet no longer keeps up with the offered rate"""
+    for step in steps:
+        if (
+            step["drop_rate"] + step["shed_rate"] > max_drop
+            or step["p95_ms"] > max_p95_ms
+            or step["achieved_rate"] < 0.9 * step["target_rate"]
+        ):
+            return step
+    return None
+
+
+def build_environment(args, client_address: str) -> Tuple[Dict[str, str], Dict[str, str], list]:
+    """Environment for the fleet subprocess plus the address book shared with the client"""
+    env = dict(os.environ)
+    stubs = []
+    
+    if args.offline:
+        from run_benchmarks import start_stubs
+        _, stubs = start_stubs(args)
+        env.update({k: os.environ[k] for k in (
+            "OPENSEA_API_URL", "GRAPHQL_ENDPOINT", "BASE_SEPOLIA_RPC", "RESOLVER_PRIVATE_KEY",
+            "OPENSEA_RATE_LIMIT", "OPENSEA_BURST", "OPENSEA_SHARED_BUCKET",
+        )})
+    
+    addresses = {}
+    rules = {client_address: f"http://127.0.0.1:{args.client_port}/submit"}
+    for name, (seed_var, default_seed, port_var, default_port) in FLEET.items():
+        address = address_for(env.get(seed_var, default_seed))
+        port = int(env.get(port_var, default_port))
+        addresses[name] = address
+        rules[address] = f"http://127.0.0.1:{port}/submit"
+    
+    env["AGENT_ENDPOINTS"] = ",".join(f"{a}={e}" for a, e in rules.items())
+    env["LOG_LEVEL"] = "WARNING"
+    # Every run starts cold so steps are comparable across runs
+    env["CHECKPOINT_DIR"] = ""
+    env["RESOLVER_JOB_DB"] = ""
+    # The RPC stub has no MarketFactory; markets come from the GraphQL stub
+    env["MARKET_SCAN_INTERVAL"] = "0"
+    return env, addresses, stubs
+
+
+async def drive(args, addresses: Dict[str, str], env: Dict[str, str]) -> List[Dict]:
+    """Run the client agent and step through the offered rates"""
+    from uagents import Agent, Context
+    from common.addressbook import LocalFirstResolver, parse_endpoints
+    from market_analyst import AnalyzeMarketRequest, MarketAnalysisResponse
+    from oracle_agent import PriceRequest, PriceResponse
+    from portfolio_advisor import PortfolioAnalysisRequest, PortfolioAnalysisResponse
+    from resolver_agent import MarketResolutionResponse, ResolveMarketRequest
+    
+    client = Agent(
+        name="mcg_loadgen",
+        seed=args.client_seed,
+        port=args.client_port,
+        endpoint=[f"http://127.0.0.1:{args.client_port}/submit"],
+        resolve=LocalFirstResolver(parse_endpoints(env["AGENT_ENDPOINTS"]))
+    )
+    
+    pending = PendingRequests()
+    mix = parse_mix(args.mix)
+    kinds, weights = list(mix), list(mix.values())
+    slugs = args.slugs
+    markets = [f"0x{i + 1:040x}" for i in range(args.markets)]
+    
+    @client.on_message(model=PriceResponse)
+    async def on_price(ctx: Context, sender: str, msg: PriceResponse):
+        pending.complete("price", msg.collection_slug, msg.error)
+    
+    @client.on_message(model=MarketAnalysisResponse)
+    async def on_analysis(ctx: Context, sender: str, msg: MarketAnalysisResponse):
+        pending.complete("analysis", msg.market_address, msg.error)
+    
+    @client.on_message(model=PortfolioAnalysisResponse)
+    async def on_portfolio(ctx: Context, sender: str, msg: PortfolioAnalysisResponse):
+        pending.complete("portfolio", msg.user_address, msg.error)
+    
+    @client.on_message(model=MarketResolutionResponse)
+    async def on_resolution(ctx: Context, sender: str, msg: MarketResolutionResponse):
+        pending.complete("resolve", msg.market_address)
+    
+    def make_message(kind: str) -> Tuple[str, str, object]:
+        market = random.choice(markets)
+        slug = random.choice(slugs)
+        if kind == "price":
+            return addresses["oracle"], slug, PriceRequest(collection_slug=slug)
+        if kind == "analysis":
+            return addresses["analyst"], market, AnalyzeMarketRequest(market_address=market, collection_slug=slug)
+        if kind == "portfolio":
+            user = f"0x{random.getrandbits(160):040x}"
+            return addresses["portfolio"], user, PortfolioAnalysisRequest(user_address=user)
+        return addresses["resolver"], market, ResolveMarketRequest(market_address=market)
+    
+    results: List[Dict] = []
+    done = asyncio.Event()
+    
+    @client.on_event("startup")
+    async def start_load(ctx: Context):
+        async def run_steps():
+            for rate in args.rates:
+                step = StepResult(target_rate=rate)
+                interval = 1.0 / rate
+                started = time.perf_counter()
+                next_send = started
+                
+                while time.perf_counter() - started < args.step_duration:
+                    kind = random.choices(kinds, weights)[0]
+                    destination, key, message = make_message(kind)
+                    pending.add(kind, key, step)
+                    asyncio.create_task(ctx.send(destination, message))
+                    
+                    next_send += interval
+                    await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+                
+                # Give in-flight requests until the timeout to come back
+                await asyncio.sleep(args.timeout)
+                step.duration = args.step_duration
+                summary = step.summary()
+                results.append(summary)
+                print(
+                    f"rate {rate:>7.1f}/s  achieved {summary['achieved_rate']:>7.1f}/s  "
+                    f"drop {summary['drop_rate']:>6.1%}  shed {summary['shed_rate']:>6.1%}  p50 {summary['p50_ms']:>8.1f}ms  "
+                    f"p95 {summary['p95_ms']:>8.1f}ms  p99 {summary['p99_ms']:>8.1f}ms"
+                )
+            done.set()
+        
+        asyncio.create_task(run_steps())
+    
+    client_task = asyncio.create_task(client.run_async())
+    await done.wait()
+    client_task.cancel()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rates", type=float, nargs="+", default=[5, 10, 20, 50, 100], help="Offered messages/s per step")
+    parser.add_argument("--step-duration", type=float, default=30.0)
+    parser.add_argument("--timeout", type=float, default=10.0, help="Seconds after a step before unanswered requests count as dropped")
+    parser.add_argument("--mix", nargs="*", help="kind=weight for price, analysis, portfolio, resolve")
+    parser.add_argument("--slugs", nargs="+", default=["boredapeyachtclub", "azuki", "doodles-official", "pudgypenguins"])
+    parser.add_argument("--markets", type=int, default=50)
+    parser.add_argument("--positions", type=int, default=20)
+    parser.add_argument("--client-port", type=int, default=8010)
+    parser.add_argument("--client-seed", default="mcg_loadgen_seed")
+    parser.add_argument("--startup-timeout", type=float, default=60.0)
+    parser.add_argument("--max-drop", type=float, default=0.01, help="Drop rate that marks saturation")
+    parser.add_argument("--max-p95-ms", type=float, default=5000.0, help="p95 latency that marks saturation")
+    parser.add_argument("--offline", action="store_true", help="Serve OpenSea, GraphQL and RPC from local stubs")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--opensea-rate", type=float, default=1000.0)
+    for upstream, latency in (("opensea", 0.05), ("graphql", 0.01), ("rpc", 0.005)):
+        parser.add_argument(f"--{upstream}-latency", type=float, default=latency)
+        parser.add_argument(f"--{upstream}-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/load-<revision>.json)")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING)
+    client_address = address_for(args.client_seed)
+    env, addresses, stubs = build_environment(args, client_address)
+    
+    fleet = subprocess.Popen([sys.executable, "run_all_agents.py"], cwd=ROOT, env=env)
+    try:
+        for name, (_, _, port_var, default_port) in FLEET.items():
+            if not wait_for_port(int(env.get(port_var, default_port)), args.startup_timeout):
+                raise SystemExit(f"{name} agent did not start listening in time")
+        
+        steps = asyncio.run(drive(args, addresses, env))
+    finally:
+        fleet.terminate()
+        try:
+            fleet.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            fleet.kill()
+        for stub in stubs:
+            stub.stop()
+    
+    knee = find_knee(steps, args.max_drop, args.max_p95_ms)
+    if knee:
+        print(f"\n📉 Saturation at {knee['target_rate']:.1f} msg/s offered ({knee['achieved_rate']:.1f} msg/s achieved)")
+    else:
+        print("\n✅ No saturation within the tested rates")
+    
+    results = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "mix": parse_mix(args.mix),
+        "offline": args.offline,
+        "steps": steps,
+        "saturation": knee,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"load-{results['revision']}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved results to {output}")
+
+
+if __name__ == "__main__":
+    main()
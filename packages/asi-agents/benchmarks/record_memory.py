@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+"""
+Record Memory Benchmark
+Compares indexer rows kept as the raw GraphQL dicts with the slotted Market,
+Position and Trade records (see agents/common/records.py): retained memory
+per record, the one-off cost of parsing, and the cost of the heuristics
+reading fields from each form.
+
+Usage:
+  python benchmarks/record_memory.py
+  python benchmarks/record_memory.py --count 50000 --repeat 20
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENTS_DIR = os.path.join(os.path.dirname(BENCH_DIR), "agents")
+sys.path.insert(0, AGENTS_DIR)
+
+from common import records  # noqa: E402
+from common.records import WEI  # noqa: E402
+
+
+def wei(rng: random.Random, low: float, high: float) -> str:
+    return str(int(rng.uniform(low, high) * WEI))
+
+
+def market_rows(n: int, rng: random.Random) -> List[Dict]:
+    return [{
+        "id": f"0x{i:040x}",
+        "marketAddress": f"0x{i:040x}",
+        "collectionSlug": f"collection-{i % 200}",
+        "targetPrice": wei(rng, 0.1, 50),
+        "resolutionTimestamp": str(1_700_000_000 + i * 600),
+        "status": "Open",
+        "yesSharesTotal": wei(rng, 0, 5000),
+        "noSharesTotal": wei(rng, 0, 5000),
+        "totalVolume": wei(rng, 0, 500),
+        "totalTrades": str(rng.randint(0, 2000)),
+        "createdAt": str(1_690_000_000 + i * 600),
+    } for i in range(n)]
+
+
+def position_rows(n: int, rng: random.Random) -> List[Dict]:
+    return [{
+        "market_id": f"0x{i % 1000:040x}",
+        "user_id": f"0x{i // 1000:040x}",
+        "yesShares": wei(rng, 0, 100),
+        "noShares": wei(rng, 0, 100),
+        "totalInvested": wei(rng, 0, 10),
+        "realizedPnL": wei(rng, -5, 5),
+        "updatedAt": str(1_700_000_000 + i),
+    } for i in range(n)]
+
+
+def trade_rows(n: int, rng: random.Random) -> List[Dict]:
+    return [{
+        "market_id": f"0x{i % 1000:040x}",
+        "user_id": f"0x{rng.randrange(5000):040x}",
+        "outcome": rng.random() < 0.5,
+        "isBuy": rng.random() < 0.8,
+        "shareAmount": wei(rng, 0, 50),
+        "ethAmount": wei(rng, 0, 5),
+        "yesSharesTotal": wei(rng, 0, 5000),
+        "noSharesTotal": wei(rng, 0, 5000),
+        "timestamp": str(1_700_000_000 + i * 12),
+        "blockNumber": str(9_000_000 + i),
+        "transactionHash": f"0x{rng.getrandbits(256):064x}",
+    } for i in range(n)]
+
+
+def retained(build: Callable[[], List]) -> Tuple[List, int]:
+    """Build a list and measure the memory it keeps alive"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def timed(fn: Callable[[], object], repeat: int) -> float:
+    """Best of `repeat` runs, seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# The field reads analyze_sentiment, calculate_risk_score and the backtest replay make, per form
+
+def read_market_dicts(rows: List[Dict]) -> float:
+    total = 0.0
+    for m in rows:
+        yes, no = int(m.get("yesSharesTotal", 0)), int(m.get("noSharesTotal", 0))
+        if yes + no:
+            total += yes / (yes + no) + int(m.get("totalTrades", 0)) + int(m["totalVolume"]) / WEI
+    return total
+
+
+def read_market_records(items: List[records.Market]) -> float:
+    total = 0.0
+    for m in items:
+        fraction = m.yes_fraction
+        if fraction is not None:
+            total += fraction + m.total_trades + m.total_volume / WEI
+    return total
+
+
+def read_position_dicts(rows: List[Dict]) -> float:
+    return sum(
+        int(p.get("totalInvested", 0)) / WEI + int(p.get("realizedPnL", 0)) / WEI
+        + (int(p.get("yesShares", 0)) - int(p.get("noShares", 0))) / WEI
+        for p in rows
+    )
+
+
+def read_position_records(items: List[records.Position]) -> float:
+    return sum(p.total_invested / WEI + p.realized_pnl / WEI + p.net_shares / WEI for p in items)
+
+
+def read_trade_dicts(rows: List[Dict]) -> int:
+    return sum(int(t["ethAmount"]) if t["isBuy"] else -int(t["ethAmount"]) for t in rows)
+
+
+def read_trade_records(items: List[records.Trade]) -> int:
+    return sum(t.eth_amount if t.is_buy else -t.eth_amount for t in items)
+
+
+KINDS = [
+    ("Market", market_rows, records.markets, read_market_dicts, read_market_records),
+    ("Position", position_rows, records.positions, read_position_dicts, read_position_records),
+    ("Trade", trade_rows, records.trades, read_trade_dicts, read_trade_records),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=20000, help="Records of each kind")
+    parser.add_argument("--repeat", type=int, default=10, help="Timing runs; the best is reported")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{args.count} records of each kind, best of {args.repeat} runs\n")
+    print(f"{'record':<9} {'dict B':>8} {'slots B':>8} {'saved':>7} {'parse ms':>9} "
+          f"{'dict read ms':>13} {'rec read ms':>12} {'pays off after':>15}")
+
+    for name, generate, parse, read_dicts, read_records in KINDS:
+        # Records are measured after their source rows are dropped, as at the
+        # agents' I/O boundary, so strings they share with the rows count too
+        rows, dict_bytes = retained(lambda: generate(args.count, random.Random(args.seed)))
+        parsed, record_bytes = retained(lambda: parse(generate(args.count, random.Random(args.seed))))
+
+        if read_dicts(rows) != read_records(parsed):
+            raise SystemExit(f"{name}: dict and record reads disagree")
+
+        parse_time = timed(lambda: parse(rows), args.repeat)
+        dict_read = timed(lambda: read_dicts(rows), args.repeat)
+        record_read = timed(lambda: read_records(parsed), args.repeat)
+        saving = dict_read - record_read
+        payoff = f"{parse_time / saving:.1f} reads" if saving > 0 else "never"
+
+        per_dict, per_record = dict_bytes / args.count, record_bytes / args.count
+        print(
+            f"{name:<9} {per_dict:>8.0f} {per_record:>8.0f} {1 - per_record / per_dict:>7.0%} {parse_time * 1000:>9.1f} "
+            f"{dict_read * 1000:>13.1f} {record_read * 1000:>12.1f} {payoff:>15}"
+        )
+
+    print("\nBytes are retained memory per record, including its field values (the wei ints for records).")
+    print("'pays off after' is how many passes of the heuristics over the same rows recover the parse.")
+
+
+if __name__ == "__main__":
+    main()
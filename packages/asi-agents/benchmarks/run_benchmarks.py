@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+"""
+Offline Handler Benchmarks
+Drives every agent handler in-process against local stand-ins for OpenSea,
+the GraphQL indexer and a JSON-RPC node, and reports throughput, latency
+percentiles and allocations per handler.
+
+Usage:
+  python benchmarks/run_benchmarks.py
+  python benchmarks/run_benchmarks.py --opensea-latency 0.2 --graphql-error-rate 0.05
+  python benchmarks/run_benchmarks.py --compare benchmarks/results/<commit>.json
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import subprocess
+import tracemalloc
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(ROOT, "agents"))
+
+from stubs import (  # noqa: E402
+    GraphQLStub,
+    JsonRpcStub,
+    OpenSeaStub,
+    StubBehaviour,
+    make_fixture,
+)
+
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Throwaway key used only against the local RPC stub
+BENCH_PRIVATE_KEY = "0x" + "11" * 32
+SENDER = "agent1qbenchmarksender000000000000000000000000000000000000000000"
+
+
+class BenchContext:
+    """Stand-in for uagents.Context that records sends instead of dispatching them"""
+    
+    def __init__(self):
+        self.logger = logging.getLogger("bench.ctx")
+        self.sent = 0
+    
+    async def send(self, destination: str, message):
+        self.sent += 1
+
+
+@dataclass
+class Case:
+    """One handler driven by the benchmark"""
+    name: str
+    call: Callable[[BenchContext, int], Awaitable]
+    iterations: Optional[int] = None
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(q / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+async def run_case(case: Case, iterations: int, concurrency: int, alloc_iterations: int,
+                   reset: Optional[Callable[[], None]]) -> Dict:
+    """Measure latency/throughput, then allocations in a separate traced pass"""
+    ctx = BenchContext()
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def one(i: int):
+        async with semaphore:
+            if reset:
+                reset()
+            start = time.perf_counter()
+            await case.call(ctx, i)
+            latencies.append(time.perf_counter() - start)
+    
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(iterations)))
+    wall = time.perf_counter() - wall_start
+    
+    tracemalloc.start()
+    peaks = []
+    for i in range(alloc_iterations):
+        if reset:
+            reset()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        await case.call(ctx, i)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    
+    latencies.sort()
+    return {
+        "calls": iterations,
+        "throughput_per_s": round(iterations / wall, 2) if wall else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "alloc_peak_kib": round(sum(peaks) / len(peaks) / 1024, 2) if peaks else 0.0,
+        "messages_sent": ctx.sent,
+    }
+
+
+def git_revision() -> str:
+    try:
+        sha = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+        dirty = subprocess.call(["git", "diff", "--quiet", "HEAD"], cwd=ROOT) != 0
+        return f"{sha}-dirty" if dirty else sha
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def start_stubs(args):
+    """Start the stubs and point the agents' configuration at them"""
+    from eth_account import Account
+    from web3 import Web3
+    
+    resolver_address = Account.from_key(BENCH_PRIVATE_KEY).address
+    data = make_fixture(args.markets, args.positions, resolver_address)
+    
+    opensea = OpenSeaStub(StubBehaviour(args.opensea_latency, args.jitter, args.opensea_error_rate)).start()
+    graphql = GraphQLStub(StubBehaviour(args.graphql_latency, args.jitter, args.graphql_error_rate), data).start()
+    rpc = JsonRpcStub(StubBehaviour(args.rpc_latency, args.jitter, args.rpc_error_rate), data, resolver_address).start()
+    
+    for signature, field_name in [
+        ("status()", "status"),
+        ("resolver()", "resolver"),
+        ("resolutionTimestamp()", "resolutionTimestamp"),
+        ("targetPrice()", "targetPrice"),
+    ]:
+        selector = "0x" + Web3.keccak(text=signature)[:4].hex().removeprefix("0x")
+        rpc.register_call(selector, rpc.market_word(field_name))
+    
+    os.environ.update({
+        "OPENSEA_API_URL": opensea.api_url,
+        "GRAPHQL_ENDPOINT": graphql.endpoint,
+        "BASE_SEPOLIA_RPC": rpc.url,
+        "RESOLVER_PRIVATE_KEY": BENCH_PRIVATE_KEY,
+        "OPENSEA_RATE_LIMIT": str(args.opensea_rate),
+        "OPENSEA_BURST": str(args.opensea_rate),
+        # Not the host-wide bucket, which a running fleet may be drawing on
+        "OPENSEA_SHARED_BUCKET": "",
+        "LOG_LEVEL": "WARNING",
+        "MARKET_ANALYST_METRICS_PORT": "0",
+        "RESOLVER_METRICS_PORT": "0",
+        "PORTFOLIO_ADVISOR_METRICS_PORT": "0",
+        "ORACLE_METRICS_PORT": "0",
+        # Handlers are measured against the upstreams, not the shared board
+        "PRICE_BOARD_PATH": "",
+        # In-memory job queue, so resolutions are not remembered between iterations
+        "RESOLVER_JOB_DB": "",
+    })
+    return data, [opensea, graphql, rpc]
+
+
+def build_cases(data) -> List[Case]:
+    """One case per agent handler and interval job"""
+    import market_analyst
+    import oracle_agent
+    import portfolio_advisor
+    import resolver_agent
+    
+    slugs = sorted({m["collectionSlug"] for m in data.markets}) or ["azuki"]
+    markets = data.markets
+    due = [m for m in markets if int(m["resolutionTimestamp"]) <= time.time()] or markets
+    batch = [f"collection-{i}" for i in range(100)]
+    
+    for i, slug in enumerate(slugs):
+        oracle_agent.subscriptions.setdefault(slug, {})[f"{SENDER}{i}"] = oracle_agent.Subscription(
+            threshold=oracle_agent.PUSH_THRESHOLD, heartbeat=oracle_agent.PUSH_HEARTBEAT
+        )
+    
+    async def poll_all_monitored(ctx):
+        # Make every collection due so each iteration polls the full set
+        for collection in oracle_agent.monitored.values():
+            collection.last_polled = 0.0
+        await oracle_agent.poll_monitored_collections(ctx)
+    
+    return [
+        Case("oracle.handle_price_request", lambda ctx, i: oracle_agent.handle_price_request(
+            ctx, SENDER, oracle_agent.PriceRequest(collection_slug=slugs[i % len(slugs)]))),
+        Case("oracle.handle_batch_price_request", lambda ctx, i: oracle_agent.handle_batch_price_request(
+            ctx, SENDER, oracle_agent.BatchPriceRequest(collection_slugs=batch)), iterations=20),
+        Case("oracle.handle_price_subscribe", lambda ctx, i: oracle_agent.handle_price_subscribe(
+            ctx, f"{SENDER}-sub{i}", oracle_agent.PriceSubscribe(collection_slug=slugs[i % len(slugs)]))),
+        Case("oracle.handle_price_unsubscribe", lambda ctx, i: oracle_agent.handle_price_unsubscribe(
+            ctx, f"{SENDER}-sub{i}", oracle_agent.PriceUnsubscribe(collection_slug=slugs[i % len(slugs)]))),
+        Case("oracle.push_subscribed_prices", lambda ctx, i: oracle_agent.push_subscribed_prices(ctx), iterations=20),
+        Case("oracle.refresh_monitoring_set", lambda ctx, i: oracle_agent.refresh_monitoring_set(ctx), iterations=20),
+        Case("oracle.poll_monitored_collections", lambda ctx, i: poll_all_monitored(ctx), iterations=20),
+        Case("market_analyst.handle_analysis_request", lambda ctx, i: market_analyst.handle_analysis_request(
+            ctx, SENDER, market_analyst.AnalyzeMarketRequest(
+                market_address=markets[i % len(markets)]["marketAddress"],
+                collection_slug=markets[i % len(markets)]["collectionSlug"]))),
+        Case("market_analyst.periodic_scan", lambda ctx, i: market_analyst.periodic_scan(ctx), iterations=20),
+        Case("market_analyst.refresh_opportunities", lambda ctx, i: market_analyst.refresh_opportunities(ctx), iterations=20),
+        # Runs after the refresh case, so the ranking is populated
+        Case("market_analyst.handle_top_opportunities", lambda ctx, i: market_analyst.handle_top_opportunities(
+            ctx, SENDER, market_analyst.TopOpportunitiesRequest(limit=10))),
+        Case("resolver.handle_resolve_request", lambda ctx, i: resolver_agent.handle_resolve_request(
+            ctx, SENDER, resolver_agent.ResolveMarketRequest(market_address=due[i % len(due)]["marketAddress"]))),
+        Case("resolver.check_markets_for_resolution", lambda ctx, i: resolver_agent.check_markets_for_resolution(ctx), iterations=10),
+        Case("portfolio_advisor.handle_analysis_request", lambda ctx, i: portfolio_advisor.handle_analysis_request(
+            ctx, SENDER, portfolio_advisor.PortfolioAnalysisRequest(user_address=f"0x{i:040x}"))),
+    ]
+
+
+def reset_caches():
+    """Clear shared caches so every call takes the full upstream path"""
+    from common import graphql, jobqueue, opensea
+    import market_analyst
+    import oracle_agent
+    
+    opensea.floor_cache.clear()
+    graphql.cache.clear()
+    oracle_agent.latest_prices.clear()
+    market_analyst.analysis_cache.clear()
+    jobqueue.queue.close()  # Drops the in-memory job table
+
+
+def compare(results: Dict, baseline_path: str, threshold: float) -> bool:
+    """Print deltas against a saved run; return False on a regression beyond threshold"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    
+    print(f"\nCompared with {baseline.get('revision')} ({os.path.basename(baseline_path)}):")
+    print(f"{'handler':45} {'p50 Δ':>9} {'p95 Δ':>9} {'thr Δ':>9}")
+    ok = True
+    
+    for name, current in results["handlers"].items():
+        base = baseline.get("handlers", {}).get(name)
+        if not base:
+            print(f"{name:45} {'new':>9}")
+            continue
+        
+        def delta(key):
+            return (current[key] - base[key]) / base[key] if base[key] else 0.0
+        
+        p50, p95, thr = delta("p50_ms"), delta("p95_ms"), delta("throughput_per_s")
+        flag = ""
+        if p95 > threshold or thr < -threshold:
+            ok = False
+            flag = "  ⚠️ regression"
+        print(f"{name:45} {p50:>+9.1%} {p95:>+9.1%} {thr:>+9.1%}{flag}")
+    
+    return ok
+
+
+async def main_async(args) -> Dict:
+    data, stubs = start_stubs(args)
+    logging.basicConfig(level=logging.WARNING)
+    cases = build_cases(data)
+    
+    results = {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {k: v for k, v in vars(args).items() if k not in ("compare", "output")},
+        "handlers": {},
+    }
+    
+    try:
+        for case in cases:
+            if args.only and not any(part in case.name for part in args.only):
+                continue
+            iterations = min(args.iterations, case.iterations or args.iterations)
+            result = await run_case(
+                case, iterations, args.concurrency, args.alloc_iterations,
+                None if args.warm else reset_caches
+            )
+            results["handlers"][case.name] = result
+            print(
+                f"{case.name:45} {result['throughput_per_s']:>9.1f}/s  "
+                f"p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  "
+                f"p99 {result['p99_ms']:>8.2f}ms  alloc {result['alloc_peak_kib']:>8.1f}KiB"
+            )
+    finally:
+        for stub in stubs:
+            stub.stop()
+    
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--alloc-iterations", type=int, default=10)
+    parser.add_argument("--warm", action="store_true", help="Keep caches between calls")
+    parser.add_argument("--only", nargs="*", help="Run handlers whose name contains any of these")
+    parser.add_argument("--markets", type=int, default=50)
+    parser.add_argument("--positions", type=int, default=20)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--opensea-rate", type=float, default=1000.0, help="Scheduler rate limit during the run")
+    for upstream, latency in (("opensea", 0.05), ("graphql", 0.01), ("rpc", 0.005)):
+        parser.add_argument(f"--{upstream}-latency", type=float, default=latency)
+        parser.add_argument(f"--{upstream}-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/<revision>.json)")
+    parser.add_argument("--compare", help="Baseline results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative p95/throughput change treated as a regression")
+    args = parser.parse_args()
+    
+    results = asyncio.run(main_async(args))
+    
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['revision']}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved results to {output}")
+    
+    if args.compare and not compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Upstream Stubs
+Local stand-ins for OpenSea, the GraphQL indexer and an Ethereum JSON-RPC node,
+each with configurable latency and error rate
+"""
+
+import json
+import time
+import random
+import re
+import zlib
+import threading
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+@dataclass
+class StubBehaviour:
+    """Latency and failure injection for one stub"""
+    latency: float = 0.0       # Mean added latency in seconds
+    jitter: float = 0.0        # Uniform +/- jitter in seconds
+    error_rate: float = 0.0    # Probability of answering with HTTP 500
+    throttle_rate: float = 0.0 # Probability of answering with HTTP 429
+    
+    def delay(self):
+        wait = self.latency + random.uniform(-self.jitter, self.jitter)
+        if wait > 0:
+            time.sleep(wait)
+    
+    def failure(self) -> Optional[int]:
+        roll = random.random()
+        if roll < self.error_rate:
+            return 500
+        if roll < self.error_rate + self.throttle_rate:
+            return 429
+        return None
+
+
+class StubServer:
+    """Threaded HTTP server running a JSON handler on a free local port"""
+    
+    def __init__(self, name: str, behaviour: StubBehaviour):
+        self.name = name
+        self.behaviour = behaviour
+        self.requests = 0
+        stub = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self, body: Optional[bytes]):
+                stub.requests += 1
+                stub.behaviour.delay()
+                
+                status = stub.behaviour.failure()
+                if status is not None:
+                    self.send_response(status)
+                    if status == 429:
+                        self.send_header("Retry-After", "0")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                
+                code, payload = stub.handle(self.command, self.path, body)
+                data = json.dumps(payload).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def do_GET(self):
+                self._respond(None)
+            
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                self._respond(self.rfile.read(length))
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name=f"stub-{name}", daemon=True)
+    
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+    
+    def start(self) -> "StubServer":
+        self.thread.start()
+        return self
+    
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def handle(self, method: str, path: str, body: Optional[bytes]) -> Tuple[int, Dict]:
+        raise NotImplementedError
+
+
+class OpenSeaStub(StubServer):
+    """GET /api/v2/collections/<slug>/stats"""
+    
+    PATH = re.compile(r"^/api/v2/collections/([^/]+)/stats")
+    
+    def __init__(self, behaviour: StubBehaviour, floor_prices: Optional[Dict[str, float]] = None):
+        super().__init__("opensea", behaviour)
+        self.floor_prices = floor_prices or {}
+    
+    @property
+    def api_url(self) -> str:
+        return f"{self.url}/api/v2"
+    
+    def handle(self, method, path, body):
+        match = self.PATH.match(path)
+        if not match:
+            return 404, {"errors": ["not found"]}
+        
+        slug = match.group(1)
+        # Unknown slugs get a stable pseudo-random floor so every slug resolves
+        price = self.floor_prices.get(slug, 1.0 + zlib.crc32(slug.encode()) % 1000 / 100)
+        return 200, {"total": {"floor_price": price, "volume": 1234.5, "sales": 42}}
+
+
+@dataclass
+class IndexerData:
+    """Fixture data served by the GraphQL stub"""
+    markets: List[Dict] = field(default_factory=list)
+    positions: List[Dict] = field(default_factory=list)
+
+
+def make_fixture(num_markets: int, num_positions: int, resolver: str) -> IndexerData:
+    """Generate markets and positions shaped like the indexer's schema"""
+    slugs = ["boredapeyachtclub", "azuki", "doodles-official", "pudgypenguins", "milady", "cryptopunks"]
+    now = int(time.time())
+    markets = []
+    
+    for i in range(num_markets):
+        address = f"0x{i + 1:040x}"
+        markets.append({
+            "id": address,
+            "marketAddress": address,
+            "resolver": resolver.lower(),
+            "collectionSlug": slugs[i % len(slugs)],
+            "targetPrice": str(int((5 + i % 20) * 10**18)),
+            "resolutionTimestamp": str(now - 60 if i % 2 == 0 else now + 86400 * (1 + i % 30)),
+            "status": "Open",
+            "yesSharesTotal": str(int((100 + i * 7 % 300) * 10**18)),
+            "noSharesTotal": str(int((100 + i * 13 % 300) * 10**18)),
+            "totalVolume": str(int((10 + i % 50) * 10**18)),
+            "totalTrades": 5 + i % 40,
+            "createdAt": str(now - 86400 * 7),
+        })
+    
+    positions = []
+    for i in range(num_positions):
+        market = markets[i % len(markets)] if markets else {"id": "0x0"}
+        positions.append({
+            "market_id": market["id"],
+            "yesShares": str(int((i % 5) * 10**18)),
+            "noShares": str(int((i % 3) * 10**18)),
+            "totalInvested": str(int((1 + i % 7) * 10**17)),
+            "realizedPnL": str(int((i % 5 - 2) * 10**16)),
+            "updatedAt": str(now),
+        })
+    
+    return IndexerData(markets=markets, positions=positions)
+
+
+class GraphQLStub(StubServer):
+    """POST /v1/graphql answering the queries the agents send"""
+    
+    def __init__(self, behaviour: StubBehaviour, data: IndexerData):
+        super().__init__("graphql", behaviour)
+        self.data = data
+        self._by_id = {m["id"]: m for m in data.markets}
+    
+    @property
+    def endpoint(self) -> str:
+        return f"{self.url}/v1/graphql"
+    
+    def handle(self, method, path, body):
+        request = json.loads(body or b"{}")
+        query = request.get("query", "")
+        variables = request.get("variables") or {}
+        
+        if "Position" in query:
+            return 200, {"data": {"Position": self.data.positions}}
+        
+        if "$ids" in query:
+            ids = set(variables.get("ids", []))
+            return 200, {"data": {"Market": [m for m in self.data.markets if m["id"] in ids]}}
+        
+        if "$id" in query:
+            market = self._by_id.get(variables.get("id", ""))
+            return 200, {"data": {"Market": [market] if market else []}}
+        
+        markets = [m for m in self.data.markets if m["status"] == "Open"]
+        if "currentTime" in variables:
+            now = int(variables["currentTime"])
+            markets = [m for m in markets if int(m["resolutionTimestamp"]) <= now]
+        
+        inline = re.search(r"limit:\s*(\d+)", query)
+        limit = variables.get("limit") or (int(inline.group(1)) if inline else None)
+        if limit:
+            markets = markets[:int(limit)]
+        return 200, {"data": {"Market": markets}}
+
+
+def _word(value: int) -> str:
+    return "0x" + format(value, "064x")
+
+
+class JsonRpcStub(StubServer):
+    """Minimal Ethereum node answering the calls made by the resolver"""
+    
+    def __init__(self, behaviour: StubBehaviour, data: IndexerData, resolver: str, chain_id: int = 84532):
+        super().__init__("rpc", behaviour)
+        self.chain_id = chain_id
+        self.resolver = resolver
+        self.block = 1_000_000
+        self.nonce = 0
+        self._markets = {m["id"]: m for m in data.markets}
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Callable[[Dict], str]] = {}
+    
+    def register_call(self, selector: str, fn: Callable[[Dict], str]):
+        """Answer eth_call for a 4-byte selector (0x-prefixed hex)"""
+        self._calls[selector] = fn
+    
+    def market_word(self, field_name: str) -> Callable[[Dict], str]:
+        def answer(market: Dict) -> str:
+            if field_name == "status":
+                return _word(0)
+            if field_name == "resolver":
+                return _word(int(self.resolver, 16))
+            return _word(int(market.get(field_name, 0)))
+        return answer
+    
+    def handle(self, method, path, body):
+        request = json.loads(body or b"{}")
+        if isinstance(request, list):
+            return 200, [self._dispatch(r) for r in request]
+        return 200, self._dispatch(request)
+    
+    def _dispatch(self, request: Dict) -> Dict:
+        method = request.get("method")
+        params = request.get("params") or []
+        result = self._result(method, params)
+        return {"jsonrpc": "2.0", "id": request.get("id"), "result": result}
+    
+    def _result(self, method: str, params: List):
+        with self._lock:
+            self.block += 1
+            if method == "eth_chainId":
+                return hex(self.chain_id)
+            if method == "eth_blockNumber":
+                return hex(self.block)
+            if method == "eth_gasPrice":
+                return hex(10**9)
+            if method == "eth_maxPriorityFeePerGas":
+                return hex(10**8)
+            if method == "eth_estimateGas":
+                return hex(80_000)
+            if method == "eth_getTransactionCount":
+                return hex(self.nonce)
+            if method == "eth_getBlockByNumber":
+                return {
+                    "number": hex(self.block),
+                    "hash": "0x" + format(self.block, "064x"),
+                    "parentHash": "0x" + format(self.block - 1, "064x"),
+                    "timestamp": hex(int(time.time())),
+                    "baseFeePerGas": hex(10**9),
+                    "gasLimit": hex(30_000_000),
+                    "gasUsed": hex(15_000_000),
+                    "transactions": [],
+                }
+            if method == "eth_sendRawTransaction":
+                self.nonce += 1
+                return "0x" + format(self.nonce, "064x")
+            if method == "eth_getTransactionReceipt":
+                return {
+                    "transactionHash": params[0],
+                    "status": "0x1",
+                    "blockNumber": hex(self.block),
+                    "blockHash": "0x" + format(self.block, "064x"),
+                    "transactionIndex": "0x0",
+                    "gasUsed": hex(60_000),
+                    "cumulativeGasUsed": hex(60_000),
+                    "effectiveGasPrice": hex(10**9),
+                    "logs": [],
+                    "logsBloom": "0x" + "0" * 512,
+                    "from": self.resolver,
+                    "to": params[0][:42],
+                    "contractAddress": None,
+                    "type": "0x2",
+                }
+            if method == "eth_getLogs":
+                return []
+        
+        if method == "eth_call":
+            call = params[0]
+            selector = (call.get("data") or call.get("input") or "0x")[:10]
+            market = self._markets.get((call.get("to") or "").lower(), {})
+            answer = self._calls.get(selector)
+            return answer(market) if answer else "0x"
+        
+        return None
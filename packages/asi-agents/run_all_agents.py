@@ -1,31 +1,44 @@
 """
 Run All MCG.FUN ASI Agents
 Starts all 4 agents concurrently for local testing
+
+Usage:
+  python run_all_agents.py                    # all agents
+  python run_all_agents.py oracle resolver    # a subset
 """
 
+import argparse
 import asyncio
+import importlib
 import logging
+import os
 import sys
 from typing import List
 
-# Import all agents
-from agents.market_analyst import agent as market_analyst
-from agents.resolver_agent import agent as resolver
-from agents.portfolio_advisor import agent as portfolio_advisor
-from agents.oracle_agent import agent as oracle
-
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('agents.log')
-    ]
-)
+# Shared modules in agents/common are imported as `common`, as when agents run standalone
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "agents"))
+
+# Agent modules are imported on demand so a subset starts without loading the rest
+AGENTS = {
+    "analyst": ("market_analyst", "📊", "Market Analyst"),
+    "resolver": ("resolver_agent", "⚖️ ", "Resolver"),
+    "portfolio": ("portfolio_advisor", "💼", "Portfolio Advisor"),
+    "oracle": ("oracle_agent", "🔮", "Oracle"),
+}
+
+# Setup logging: records are written by a background thread (see agents/common/logs.py)
+from common import logs  # noqa: E402
+
+logs.configure()
 logger = logging.getLogger(__name__)
 
 
+def load_agent(key: str):
+    """Import an agent module and build its agent"""
+    module_name = AGENTS[key][0]
+    return importlib.import_module(module_name).get_agent()
+
+
 async def run_agent(agent, name: str):
     """Run a single agent with error handling"""
     try:
@@ -36,27 +49,26 @@ async def run_agent(agent, name: str):
         raise
 
 
-async def main():
-    """Run all agents concurrently"""
+async def main(selected: List[str]):
+    """Run the selected agents concurrently"""
     logger.info("=" * 60)
     logger.info("🚀 MCG.FUN ASI Alliance Agents")
     logger.info("=" * 60)
     logger.info("")
-    logger.info("Starting all 4 autonomous agents...")
+    logger.info(f"Starting {len(selected)} autonomous agent(s)...")
     logger.info("")
     
-    # Create tasks for all agents
+    agents = {key: load_agent(key) for key in selected}
+    
+    # Create tasks for the selected agents
     tasks: List[asyncio.Task] = [
-        asyncio.create_task(run_agent(market_analyst, "Market Analyst")),
-        asyncio.create_task(run_agent(resolver, "Resolver")),
-        asyncio.create_task(run_agent(portfolio_advisor, "Portfolio Advisor")),
-        asyncio.create_task(run_agent(oracle, "Oracle")),
+        asyncio.create_task(run_agent(agent, AGENTS[key][2]))
+        for key, agent in agents.items()
     ]
     
-    logger.info(f"📊 Market Analyst:    {market_analyst.address}")
-    logger.info(f"⚖️  Resolver:          {resolver.address}")
-    logger.info(f"💼 Portfolio Advisor: {portfolio_advisor.address}")
-    logger.info(f"🔮 Oracle:            {oracle.address}")
+    for key, agent in agents.items():
+        _, icon, name = AGENTS[key]
+        logger.info(f"{icon} {name + ':':<19} {agent.address}")
     logger.info("")
     logger.info("✨ All agents running!")
     logger.info("💬 Agents are discoverable via Agentverse")
@@ -82,12 +94,17 @@ async def main():
         logger.info("👋 All agents stopped successfully")
 
 
+def parse_args() -> List[str]:
+    parser = argparse.ArgumentParser(description="Run MCG.FUN agents locally")
+    parser.add_argument("agents", nargs="*", choices=list(AGENTS), help="Agents to start (default: all)")
+    return parser.parse_args().agents or list(AGENTS)
+
+
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        asyncio.run(main(parse_args()))
     except KeyboardInterrupt:
         logger.info("👋 Goodbye!")
     except Exception as e:
         logger.error(f"Fatal error: {e}", exc_info=True)
         sys.exit(1)
-
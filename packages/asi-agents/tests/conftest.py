@@ -0,0 +1,14 @@
+"""
+Shared test setup: agent modules import each other as top-level `common.*`,
+as they do when run from agents/, and the benchmarks are importable by name.
+"""
+
+import os
+import sys
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for directory in ("agents", "benchmarks"):
+    path = os.path.join(PACKAGE_DIR, directory)
+    if path not in sys.path:
+        sys.path.insert(0, path)
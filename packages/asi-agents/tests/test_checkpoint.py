@@ -0,0 +1,91 @@
+"""
+Warm restart snapshots (common/checkpoint.py)
+"""
+
+import shutil
+
+import pytest
+
+from common.checkpoint import HEADER, Checkpointer
+
+
+@pytest.fixture
+def state():
+    return {"prices": {"azuki": 6.5}, "cursor": 3}
+
+
+def checkpointer(directory, state, agent="analyst", max_age=3600, version=1):
+    ckpt = Checkpointer(agent, directory=str(directory), max_age=max_age)
+    ckpt.register("prices", lambda: state["prices"], lambda data: state.update(prices=data), version=version)
+    ckpt.register("cursor", lambda: state["cursor"], lambda data: state.update(cursor=data))
+    return ckpt
+
+
+def test_round_trip(tmp_path, state):
+    assert checkpointer(tmp_path, state).save() > HEADER.size
+
+    restored = {"prices": {}, "cursor": 0}
+    assert checkpointer(tmp_path, restored).restore() == 2
+    assert restored == state
+
+
+def test_missing_checkpoint_starts_cold(tmp_path, state):
+    assert checkpointer(tmp_path, state).restore() == 0
+
+
+@pytest.mark.parametrize("damage", [
+    lambda raw: raw[:HEADER.size - 1],               # Truncated header
+    lambda raw: raw[:-1],                            # Truncated body
+    lambda raw: raw[:-1] + bytes([raw[-1] ^ 0xFF]),  # Flipped bits
+    lambda raw: b"XXXX" + raw[4:],                   # Foreign file
+])
+def test_corrupt_checkpoint_starts_cold(tmp_path, state, damage):
+    ckpt = checkpointer(tmp_path, state)
+    ckpt.save()
+    with open(ckpt.path, "rb") as f:
+        raw = f.read()
+    with open(ckpt.path, "wb") as f:
+        f.write(damage(raw))
+
+    restored = {"prices": {}, "cursor": 0}
+    assert checkpointer(tmp_path, restored).restore() == 0
+    assert restored == {"prices": {}, "cursor": 0}
+
+
+def test_expired_checkpoint_starts_cold(tmp_path, state):
+    checkpointer(tmp_path, state).save()
+    assert checkpointer(tmp_path, state, max_age=-1).restore() == 0
+
+
+def test_another_agents_checkpoint_is_ignored(tmp_path, state):
+    analyst = checkpointer(tmp_path, state)
+    analyst.save()
+    oracle = checkpointer(tmp_path, state, agent="oracle")
+    shutil.copy(analyst.path, oracle.path)
+
+    assert oracle.restore() == 0
+
+
+def test_changed_section_version_is_skipped(tmp_path, state):
+    checkpointer(tmp_path, state).save()
+
+    restored = {"prices": {}, "cursor": 0}
+    assert checkpointer(tmp_path, restored, version=2).restore() == 1
+    assert restored == {"prices": {}, "cursor": 3}
+
+
+def test_failing_loader_does_not_block_other_sections(tmp_path, state):
+    checkpointer(tmp_path, state).save()
+
+    restored = {"cursor": 0}
+    ckpt = Checkpointer("analyst", directory=str(tmp_path))
+    ckpt.register("prices", lambda: None, lambda data: 1 / 0)
+    ckpt.register("cursor", lambda: None, lambda data: restored.update(cursor=data))
+    assert ckpt.restore() == 1
+    assert restored == {"cursor": 3}
+
+
+def test_disabled_without_directory(state):
+    ckpt = checkpointer("", state)
+    assert ckpt.save() is None
+    assert ckpt.restore() == 0
@@ -0,0 +1,29 @@
+"""
+Cold start import budget (see benchmarks/import_budget.py), enforced in the test suite
+"""
+
+import pytest
+
+import import_budget
+
+
+@pytest.mark.parametrize("module", import_budget.AGENT_MODULES)
+def test_agent_within_import_budget(module):
+    pytest.importorskip("uagents")
+    result = import_budget.measure(module)
+    assert "error" not in result, f"{module} could not be imported: {result.get('error')}"
+
+    violations = import_budget.check(result, import_budget.load_budgets(None))
+    assert not violations, f"{module}: " + "; ".join(violations)
+
+
+def test_check_reports_budget_and_forbidden_modules():
+    result = {
+        "module": "market_analyst",
+        "import_ms": 2000.0,
+        "create_ms": 10.0,
+        "after_import": {"json"},
+        "after_create": {"json", "web3"},
+    }
+    violations = import_budget.check(result, import_budget.load_budgets(None))
+    assert violations == ["import took 2000ms (budget 1500ms)", "'web3' loaded during create"]
@@ -0,0 +1,114 @@
+"""
+Durable resolution jobs (common/jobqueue.py)
+"""
+
+import sqlite3
+import time
+
+import pytest
+
+from common import jobqueue
+from common.jobqueue import CONFIRMED, DUE, FAILED, PRICED, SUBMITTED, JobQueue
+
+MARKET = "0xAbC0000000000000000000000000000000000001"
+WEI = 10 ** 18
+
+
+@pytest.fixture
+def queue():
+    q = JobQueue("")
+    yield q
+    q.close()
+
+
+def test_enqueue_is_idempotent_and_lower_cases(queue):
+    job = queue.enqueue(MARKET, "azuki", 5 * WEI)
+    again = queue.enqueue(MARKET.lower(), "other", 1)
+
+    assert job.market == MARKET.lower()
+    assert (again.state, again.collection_slug, again.target_price) == (DUE, "azuki", 5 * WEI)
+
+
+def test_happy_path_transitions(queue):
+    job = queue.enqueue(MARKET)
+    job = queue.priced(job, "azuki", 5 * WEI, 6 * WEI)
+    assert job.state == PRICED and job.priced_at is not None
+
+    job = queue.submitted(job, "0x01", "0xraw", nonce=7, gas=100000, max_fee=30, priority_fee=2)
+    job = queue.replaced(job, "0x02", "0xraw2", max_fee=40, priority_fee=3)
+    assert job.sent_hashes == ["0x01", "0x02"]
+
+    job = queue.confirmed(job, tx_hash="0x01")
+    stored = queue.get(MARKET)
+    assert stored.terminal
+    assert (stored.state, stored.tx_hash, stored.raw_tx, stored.final_price) == (CONFIRMED, "0x01", None, 6 * WEI)
+
+
+def test_wei_amounts_beyond_sqlite_integers_round_trip(queue):
+    job = queue.enqueue(MARKET)
+    queue.priced(job, "azuki", 2 ** 70, 2 ** 80)
+
+    stored = queue.get(MARKET)
+    assert (stored.target_price, stored.final_price) == (2 ** 70, 2 ** 80)
+
+
+def test_retry_backs_off_then_fails(queue, monkeypatch):
+    monkeypatch.setattr(jobqueue, "MAX_ATTEMPTS", 3)
+    job = queue.priced(queue.enqueue(MARKET), "azuki", 1, 2)
+
+    job = queue.retry(job, "boom", state=DUE)
+    assert (job.state, job.attempts, job.error) == (DUE, 1, "boom")
+    assert job.next_attempt > time.time() + jobqueue.RETRY_BASE * 0.7
+
+    job = queue.retry(job, "boom")
+    job = queue.retry(job, "boom")
+    assert job.state == FAILED
+    assert job.error == "boom (after 3 attempts)"
+
+
+def test_ready_skips_terminal_and_future_jobs(queue):
+    due = queue.enqueue("0x1")
+    later = queue.defer(queue.enqueue("0x2"), 3600)
+    queue.failed(queue.enqueue("0x3"), "not authorized")
+    queue.submitted(queue.enqueue("0x4"), "0x04", "0xraw", 1, 1, 1, 1)
+
+    ready = {job.market for job in queue.ready(time.time())}
+    assert ready == {due.market, "0x4"}
+    assert later.market not in ready
+    assert queue.count(FAILED) == 1 and queue.count(SUBMITTED) == 1
+
+
+def test_reopen_restarts_a_failed_job(queue):
+    job = queue.failed(queue.enqueue(MARKET), "gave up")
+    job = queue.reopen(job)
+
+    assert (job.state, job.attempts, job.error) == (DUE, 0, None)
+
+
+def test_state_survives_reopening_the_database(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    first = JobQueue(path)
+    first.submitted(first.enqueue(MARKET), "0x01", "0xraw", 7, 1, 1, 1)
+    first.close()
+
+    second = JobQueue(path)
+    job = second.get(MARKET)
+    assert (job.state, job.nonce, job.raw_tx) == (SUBMITTED, 7, "0xraw")
+    second.close()
+
+
+def test_older_databases_gain_added_columns(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE jobs (market TEXT PRIMARY KEY, state TEXT NOT NULL, collection_slug TEXT, "
+               "target_price TEXT, final_price TEXT, tx_hash TEXT, raw_tx TEXT, nonce INTEGER, "
+               "attempts INTEGER NOT NULL DEFAULT 0, next_attempt REAL NOT NULL DEFAULT 0, "
+               "submitted_at REAL, error TEXT, updated_at REAL NOT NULL DEFAULT 0)")
+    db.execute("INSERT INTO jobs (market, state) VALUES (?, ?)", (MARKET.lower(), DUE))
+    db.commit()
+    db.close()
+
+    queue = JobQueue(path)
+    job = queue.priced(queue.get(MARKET), "azuki", 1, 2)
+    assert queue.get(MARKET).priced_at == job.priced_at
+    queue.close()
@@ -0,0 +1,106 @@
+"""
+Shared price board (common/priceboard.py): seqlock slots in a memory-mapped file
+"""
+
+import os
+import time
+
+import pytest
+
+from common import priceboard
+from common.priceboard import HEADER_SIZE, SEQ, SLOT_SIZE, PriceBoard
+
+
+@pytest.fixture
+def board_path(tmp_path):
+    return str(tmp_path / "price-board")
+
+
+@pytest.fixture
+def writer(board_path):
+    board = PriceBoard(board_path, slots=16)
+    yield board
+    board.close()
+
+
+def reader_for(path: str) -> PriceBoard:
+    return PriceBoard(path, slots=16)
+
+
+def test_publish_then_read_in_another_board(writer, board_path):
+    assert writer.publish("azuki", 6.5, 0.9, 3, timestamp=1000.0)
+
+    reader = reader_for(board_path)
+    entry = reader.read("azuki")
+    assert (entry.price, entry.confidence, entry.source_count, entry.timestamp) == (6.5, 0.9, 3, 1000.0)
+    assert reader.read("missing") is None
+    reader.close()
+
+
+def test_reader_sees_later_updates(writer, board_path):
+    writer.publish("azuki", 6.5, 0.9, 3)
+    reader = reader_for(board_path)
+    reader.read("azuki")
+
+    writer.publish("azuki", 7.0, 0.8, 2)
+    assert reader.read("azuki").price == 7.0
+    reader.close()
+
+
+def test_sequence_number_is_even_after_publish(writer):
+    for i in range(3):
+        writer.publish("azuki", float(i + 1), 1.0, 1)
+
+    offset = HEADER_SIZE + writer._find("azuki", claim=False) * SLOT_SIZE
+    (seq,) = SEQ.unpack_from(writer._mm, offset)
+    assert seq == 6
+
+
+def test_read_retries_while_a_write_is_in_progress(writer, board_path):
+    writer.publish("azuki", 6.5, 0.9, 3)
+    offset = HEADER_SIZE + writer._find("azuki", claim=False) * SLOT_SIZE
+    (seq,) = SEQ.unpack_from(writer._mm, offset)
+
+    SEQ.pack_into(writer._mm, offset, seq + 1)  # Writer stopped mid-update
+    reader = reader_for(board_path)
+    assert reader.read("azuki") is None
+
+    SEQ.pack_into(writer._mm, offset, seq + 2)
+    assert reader.read("azuki").price == 6.5
+    reader.close()
+
+
+def test_max_age(writer, board_path):
+    writer.publish("old", 1.0, 1.0, 1, timestamp=time.time() - 120)
+    reader = reader_for(board_path)
+
+    assert reader.read("old", max_age=60) is None
+    assert reader.read("old", max_age=600).price == 1.0
+    reader.close()
+
+
+def test_rejects_overlong_slugs(writer):
+    assert not writer.publish("x" * (priceboard.MAX_SLUG_BYTES + 1), 1.0, 1.0, 1)
+
+
+def test_full_board_refuses_new_collections(writer):
+    for i in range(16):
+        assert writer.publish(f"collection-{i}", 1.0, 1.0, 1)
+    assert not writer.publish("one-more", 1.0, 1.0, 1)
+    assert writer.read("collection-15").price == 1.0
+
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX permissions only")
+def test_ignores_a_board_others_can_write(writer, board_path):
+    writer.publish("azuki", 6.5, 0.9, 3)
+    os.chmod(board_path, 0o666)
+
+    reader = reader_for(board_path)
+    assert reader.read("azuki") is None
+    reader.close()
+
+
+def test_disabled_board():
+    board = PriceBoard("", slots=16)
+    assert not board.publish("azuki", 1.0, 1.0, 1)
+    assert board.read("azuki") is None
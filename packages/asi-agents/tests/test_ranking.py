@@ -0,0 +1,68 @@
+"""
+Incremental top-K ranking (common/ranking.py)
+"""
+
+import random
+
+from common.ranking import Ranking
+
+
+def test_top_is_highest_first():
+    ranking = Ranking()
+    for key, score in [("a", 1.0), ("b", 3.0), ("c", 2.0)]:
+        ranking.update(key, score, key.upper())
+
+    assert ranking.top(2) == [(3.0, "B"), (2.0, "C")]
+    assert len(ranking) == 3
+
+
+def test_update_moves_and_replaces():
+    ranking = Ranking()
+    ranking.update("a", 1.0, "old")
+    ranking.update("b", 2.0, "b")
+    ranking.update("a", 5.0, "new")
+
+    assert ranking.top(1) == [(5.0, "new")]
+    assert ranking.get("a") == "new"
+
+    ranking.update("a", 5.0, "same score")
+    assert ranking.top(3) == [(5.0, "same score"), (2.0, "b")]
+
+
+def test_remove():
+    ranking = Ranking()
+    ranking.update("a", 1.0, "a")
+    ranking.update("b", 2.0, "b")
+    ranking.remove("b")
+    ranking.remove("missing")
+
+    assert "b" not in ranking
+    assert ranking.top(5) == [(1.0, "a")]
+    assert ranking.keys() == ["a"]
+
+
+def test_equal_scores_order_by_key():
+    ranking = Ranking()
+    for key in ("c", "a", "b"):
+        ranking.update(key, 1.0, key)
+
+    assert [item for _, item in ranking.top(3)] == ["a", "b", "c"]
+
+
+def test_matches_a_full_sort_after_random_updates():
+    rng = random.Random(3)
+    ranking = Ranking()
+    expected = {}
+    for _ in range(2000):
+        key = f"m{rng.randrange(200)}"
+        if rng.random() < 0.1:
+            ranking.remove(key)
+            expected.pop(key, None)
+        else:
+            score = round(rng.uniform(-1, 1), 2)
+            ranking.update(key, score, key)
+            expected[key] = score
+
+    ordered = sorted(expected.items(), key=lambda item: (-item[1], item[0]))
+    assert ranking.top(20) == [(score, key) for key, score in ordered[:20]]
+    assert len(ranking) == len(expected)
@@ -0,0 +1,193 @@
+"""
+CircuitBreaker, StaleCache and VersionedCache (common/resilience.py)
+"""
+
+import asyncio
+
+import pytest
+
+from common.resilience import CircuitBreaker, CircuitOpenError, StaleCache, VersionedCache
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def succeed():
+    return "ok"
+
+
+async def fail():
+    raise RuntimeError("upstream down")
+
+
+# CircuitBreaker
+
+def test_breaker_opens_after_threshold_failures():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60, timeout=1)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            run(breaker.call(fail))
+
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        run(breaker.call(succeed))
+
+
+def test_breaker_success_resets_failure_count():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60, timeout=1)
+    with pytest.raises(RuntimeError):
+        run(breaker.call(fail))
+    assert run(breaker.call(succeed)) == "ok"
+    with pytest.raises(RuntimeError):
+        run(breaker.call(fail))
+
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0, timeout=1)
+    breaker.record_failure()
+
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.check()
+
+
+def test_breaker_failed_trial_reopens():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=0, timeout=1)
+    for _ in range(3):
+        breaker.record_failure()
+    breaker.before_call()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_breaker_release_frees_the_trial():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0, timeout=1)
+    breaker.record_failure()
+    breaker.before_call()
+
+    breaker.release()
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_breaker_times_out_slow_calls():
+    breaker = CircuitBreaker("test", failure_threshold=5, reset_timeout=60, timeout=0.01)
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        run(breaker.call(slow))
+    assert breaker.failures == 1
+
+
+# StaleCache
+
+def age(cache: StaleCache, key, seconds: float):
+    cache._entries[key].fetched_at -= seconds
+
+
+def test_stale_cache_serves_fresh_values_without_fetching():
+    cache = StaleCache("test", fresh_ttl=60, max_stale=600)
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        return 42
+
+    async def scenario():
+        first = await cache.get("k", fetch)
+        second = await cache.get("k", fetch)
+        return first, second
+
+    first, second = run(scenario())
+    assert (first.value, first.stale) == (42, False)
+    assert (second.value, second.stale) == (42, False)
+    assert len(calls) == 1
+
+
+def test_stale_cache_serves_stale_value_and_revalidates():
+    cache = StaleCache("test", fresh_ttl=60, max_stale=600)
+    values = iter([1, 2])
+
+    async def fetch():
+        return next(values)
+
+    async def scenario():
+        await cache.get("k", fetch)
+        age(cache, "k", 120)
+        stale = await cache.get("k", fetch)
+        await asyncio.sleep(0)  # Let the background refresh run
+        return stale, await cache.get("k", fetch)
+
+    stale, refreshed = run(scenario())
+    assert (stale.value, stale.stale) == (1, True)
+    assert (refreshed.value, refreshed.stale) == (2, False)
+
+
+def test_stale_cache_falls_back_to_last_good_value():
+    cache = StaleCache("test", fresh_ttl=60, max_stale=600)
+
+    async def scenario():
+        await cache.get("k", succeed)
+        age(cache, "k", 1000)  # Past max_stale: must fetch
+        return await cache.get("k", fail)
+
+    result = run(scenario())
+    assert (result.value, result.stale) == ("ok", True)
+    assert "upstream down" in result.error
+
+
+def test_stale_cache_miss_with_failed_fetch():
+    result = run(StaleCache("test", fresh_ttl=60, max_stale=600).get("k", fail))
+    assert (result.value, result.stale) == (None, True)
+
+
+def test_stale_cache_peek_never_fetches():
+    cache = StaleCache("test", fresh_ttl=60, max_stale=600)
+    assert cache.peek("k") is None
+
+    run(cache.get("k", succeed))
+    assert (cache.peek("k").value, cache.peek("k").stale) == ("ok", False)
+    age(cache, "k", 120)
+    assert cache.peek("k").stale
+    age(cache, "k", 1000)
+    assert cache.peek("k") is None
+
+
+def test_stale_cache_snapshot_round_trip():
+    cache = StaleCache("test", fresh_ttl=60, max_stale=600)
+    run(cache.get(("a", 1), succeed))
+
+    restored = StaleCache("test", fresh_ttl=60, max_stale=600)
+    restored.restore(cache.snapshot())
+    assert restored.peek(("a", 1)).value == "ok"
+
+
+def test_stale_cache_evicts_least_recently_used():
+    cache = StaleCache("test", fresh_ttl=60, max_stale=600, max_entries=2)
+    for key in ("a", "b", "c"):
+        run(cache.get(key, succeed))
+    assert cache.peek("a") is None
+    assert cache.peek("c") is not None
+
+
+# VersionedCache
+
+def test_versioned_cache_misses_on_new_version():
+    cache = VersionedCache("test", ttl=60)
+    cache.put("k", 1, "result")
+
+    assert cache.get("k", 1) == "result"
+    assert cache.get("k", 2) is None
@@ -0,0 +1,74 @@
+"""
+Collection return covariance (common/riskmodel.py)
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from common.riskmodel import CovarianceTracker  # noqa: E402
+
+
+def price_paths(samples: int, collections: int, seed: int = 11) -> np.ndarray:
+    """Correlated random-walk floor prices, one row per sample"""
+    rng = np.random.default_rng(seed)
+    common = rng.normal(0, 0.02, (samples, 1))
+    returns = common + rng.normal(0, 0.01, (samples, collections))
+    return np.exp(np.cumsum(returns, axis=0))
+
+
+def feed(tracker: CovarianceTracker, prices: np.ndarray, slugs):
+    for row in prices:
+        tracker.update(dict(zip(slugs, row)))
+
+
+def test_matches_numpy_cov_while_equally_weighted():
+    slugs = [f"c{i}" for i in range(5)]
+    prices = price_paths(200, len(slugs))
+    tracker = CovarianceTracker(half_life=1e9, min_samples=1)
+    feed(tracker, prices, slugs)
+
+    returns = np.diff(np.log(prices), axis=0)
+    assert tracker.samples == len(returns)
+    np.testing.assert_allclose(tracker.covariance(slugs), np.cov(returns, rowvar=False, bias=True), rtol=1e-9, atol=1e-15)
+
+
+def test_correlation_matches_numpy():
+    slugs = ["a", "b"]
+    prices = price_paths(300, 2, seed=5)
+    tracker = CovarianceTracker(half_life=1e9, min_samples=1)
+    feed(tracker, prices, slugs)
+
+    returns = np.diff(np.log(prices), axis=0)
+    assert tracker.correlation("a", "b") == pytest.approx(np.corrcoef(returns, rowvar=False)[0, 1])
+
+
+def test_grows_past_initial_capacity():
+    slugs = [f"c{i}" for i in range(100)]
+    prices = price_paths(20, len(slugs))
+    tracker = CovarianceTracker(half_life=1e9, min_samples=1)
+    feed(tracker, prices, slugs)
+
+    returns = np.diff(np.log(prices), axis=0)
+    assert len(tracker) == 100
+    np.testing.assert_allclose(tracker.covariance(slugs), np.cov(returns, rowvar=False, bias=True), rtol=1e-9, atol=1e-15)
+
+
+def test_unknown_and_young_collections():
+    tracker = CovarianceTracker(min_samples=5)
+    feed(tracker, price_paths(3, 2), ["a", "b"])
+
+    assert not tracker.covariance(["a", "missing"])[:, 1].any()
+    assert not tracker.is_modelled("a")
+    assert tracker.correlation("a", "b") is None
+
+
+def test_snapshot_round_trip():
+    slugs = ["a", "b", "c"]
+    tracker = CovarianceTracker(half_life=1e9, min_samples=1)
+    feed(tracker, price_paths(50, 3), slugs)
+
+    restored = CovarianceTracker(half_life=1e9, min_samples=1)
+    restored.restore(tracker.snapshot())
+    np.testing.assert_allclose(restored.covariance(slugs), tracker.covariance(slugs))
+    assert restored.samples == tracker.samples